@@ -0,0 +1,160 @@
+"""Before/after benchmark for the DatabaseManager connection profile and indexes.
+
+"Before" is the original setup: default rollback journal, a fresh
+connection per operation and no secondary indexes. "After" is the
+current DatabaseManager: WAL, tuned pragmas, a long-lived per-thread
+connection and the indexes created by _init_db.
+
+    python benchmarks/db_profile_benchmark.py --match-ids 1000000
+"""
+import argparse
+import json
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from database.db_manager import DatabaseManager  # noqa: E402
+from synthetic_data import generate  # noqa: E402
+
+NEW_INDEXES = [
+    "idx_summoners_puuid",
+    "idx_matchids_summoner_puuid",
+    "idx_matchids_region",
+    "idx_matchmetadata_game_start",
+]
+
+SUMMONERS_FOR_MATCH_FETCH = """
+    SELECT s.puuid, s.region, COALESCE(MAX(m.created_at), s.created_at)
+    FROM Summoners s
+    LEFT JOIN MatchIDs m ON s.puuid = m.summoner_puuid
+    WHERE s.puuid IS NOT NULL
+    GROUP BY s.puuid, s.region, s.created_at
+"""
+
+MATCHES_NEEDING_METADATA = """
+    SELECT m.match_id, m.region
+    FROM MatchIDs m
+    LEFT JOIN MatchMetadata mm ON m.match_id = mm.match_id
+    WHERE mm.match_id IS NULL
+"""
+
+MATCHES_FOR_PUUID = "SELECT match_id FROM MatchIDs WHERE summoner_puuid = ?"
+
+MATCHES_IN_WINDOW = """
+    SELECT COUNT(*) FROM MatchMetadata
+    WHERE game_start_timestamp BETWEEN ? AND ?
+"""
+
+
+def _timed(fn, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_suite(get_connection, release, puuids, lookups, commits):
+    """Time the fetchers' hot queries using the given connection strategy."""
+    rng = random.Random(1)
+    sample = [rng.choice(puuids) for _ in range(lookups)]
+
+    def one_query(sql, params=()):
+        conn = get_connection()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            release(conn)
+
+    def puuid_lookups():
+        for puuid in sample:
+            one_query(MATCHES_FOR_PUUID, (puuid,))
+
+    def window_counts():
+        for i in range(lookups):
+            start = 1_704_067_200_000 + i * 3_600_000
+            one_query(MATCHES_IN_WINDOW, (start, start + 86_400_000))
+
+    def small_commits():
+        # The fetchers commit every result as it arrives
+        for i in range(commits):
+            conn = get_connection()
+            try:
+                conn.execute(
+                    "INSERT INTO JobState (stage, last_cursor) VALUES ('bench', ?) "
+                    "ON CONFLICT(stage) DO UPDATE SET last_cursor = excluded.last_cursor",
+                    (i,)
+                )
+                conn.commit()
+            finally:
+                release(conn)
+
+    return {
+        "get_summoners_for_match_fetch": _timed(lambda: one_query(SUMMONERS_FOR_MATCH_FETCH)),
+        "get_matches_needing_metadata": _timed(lambda: one_query(MATCHES_NEEDING_METADATA)),
+        f"matches_by_puuid_x{lookups}": _timed(puuid_lookups),
+        f"matches_in_time_window_x{lookups}": _timed(window_counts),
+        f"single_row_commits_x{commits}": _timed(small_commits),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--summoners", type=int, default=50_000)
+    parser.add_argument("--match-ids", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000)
+    parser.add_argument("--commits", type=int, default=500)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="riot_db_bench_"))
+    try:
+        after_path = workdir / "after.db"
+        before_path = workdir / "before.db"
+
+        start = time.perf_counter()
+        counts = generate(after_path, summoners=args.summoners, match_ids=args.match_ids)
+        print(f"Generated {counts} in {time.perf_counter() - start:.1f}s")
+
+        shutil.copy(after_path, before_path)
+        conn = sqlite3.connect(before_path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        for index in NEW_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+        conn.commit()
+        conn.close()
+
+        conn = sqlite3.connect(after_path)
+        puuids = [row[0] for row in conn.execute("SELECT puuid FROM Summoners WHERE puuid IS NOT NULL")]
+        conn.close()
+
+        before = run_suite(
+            lambda: sqlite3.connect(before_path), lambda conn: conn.close(),
+            puuids, args.lookups, args.commits
+        )
+        db = DatabaseManager(str(after_path))
+        after = run_suite(db.get_connection, lambda conn: None, puuids, args.lookups, args.commits)
+        db.close()
+
+        print(f"\n{'benchmark':<36}{'before (s)':>12}{'after (s)':>12}{'speedup':>10}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float("inf")
+            print(f"{name:<36}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>9.1f}x")
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"rows": counts, "before": before, "after": after}, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
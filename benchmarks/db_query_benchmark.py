@@ -0,0 +1,205 @@
+"""Timings of the SQL paths that dominate a run, at production scale.
+
+Generates (or reuses, with --db) a synthetic riot_data.db with 1M
+Summoners, 10M MatchIDs and ~7M MatchMetadata rows by default, then times
+the fetchers' work-list queries, the query_summoners report, the game
+duration report (a full fold and an incremental no-op) and a full ladder
+refresh through update_summoners. Results are written as JSON; with
+--baseline, each benchmark is compared against an earlier results file
+and the script exits non-zero when one got slower than the tolerance.
+
+    python benchmarks/db_query_benchmark.py --output before.json
+    python benchmarks/db_query_benchmark.py --baseline before.json --output after.json
+    python benchmarks/db_query_benchmark.py --summoners 50000 --match-ids 500000  # quick run
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from synthetic_data import REGIONS, generate  # noqa: E402
+
+# Differences below this many seconds are treated as noise, whatever the ratio
+NOISE_FLOOR = 0.005
+
+
+def _timed(fn, repeat=1):
+    """Best wall time of `repeat` calls, with the function's printed output discarded."""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def ladder_refresh(conn, seed=0, changed=0.05, dropped=0.01, added=0.01):
+    """A full-ladder update_summoners payload: most rows unchanged, some moved, dropped or new."""
+    rng = random.Random(seed)
+    summoners = []
+    for summoner_id, rank, region, puuid, lp, wins, losses in conn.execute(
+        "SELECT summonerID, rank, region, puuid, league_points, wins, losses FROM Summoners"
+    ):
+        roll = rng.random()
+        if roll < dropped:
+            continue
+        if roll < dropped + changed:
+            lp, wins = rng.randrange(2000), (wins or 0) + 1
+        summoners.append({
+            "summonerID": summoner_id, "rank": rank, "region": region, "puuid": puuid,
+            "league_points": lp, "wins": wins, "losses": losses,
+        })
+    for i in range(int(len(summoners) * added)):
+        summoners.append({
+            "summonerID": f"new-summoner-{i:08d}", "rank": "Challenger", "region": rng.choice(REGIONS),
+            "puuid": f"new-puuid-{i:08d}", "league_points": rng.randrange(2000), "wins": 100, "losses": 90,
+        })
+    return summoners
+
+
+def run_suite(repeat):
+    """Time every benchmark against riot_data.db in the current directory."""
+    # The fetchers build a client on construction; no request is made here
+    os.environ.setdefault("RIOT_API_KEY", "benchmark")
+    from analysis.game_duration_analysis import analyze_game_durations
+    from database.db_manager import DatabaseManager
+    from fetch_match_ids import MatchIDFetcher
+    from fetch_match_metadata import MatchMetadataFetcher
+    from fetch_puuids import PUUIDFetcher
+    from query_summoners import query_summoner_stats
+    logging.getLogger().setLevel(logging.WARNING)
+
+    db = DatabaseManager()
+    puuid_fetcher = PUUIDFetcher(db)
+    match_id_fetcher = MatchIDFetcher(db)
+    metadata_fetcher = MatchMetadataFetcher(db)
+
+    results = {
+        "get_summoners_without_puuid": _timed(puuid_fetcher.get_summoners_without_puuid, repeat),
+        "get_summoners_for_match_fetch": _timed(match_id_fetcher.get_summoners_for_match_fetch, repeat),
+        "get_matches_needing_metadata": _timed(metadata_fetcher.get_matches_needing_metadata, repeat),
+        "query_summoner_stats": _timed(query_summoner_stats, repeat),
+        "get_summoner_counts": _timed(db.get_summoner_counts, repeat),
+        "get_match_coverage": _timed(db.get_match_coverage, repeat),
+        # The first report folds every stored match into DurationStats,
+        # later ones only what was stored since
+        "analyze_game_durations_full": _timed(analyze_game_durations),
+        "analyze_game_durations_incremental": _timed(analyze_game_durations, repeat),
+    }
+
+    # Runs last: it rewrites Summoners and creates a backup
+    summoners = ladder_refresh(db.get_connection())
+    results["update_summoners_full_ladder"] = _timed(lambda: db.update_summoners(summoners))
+    db.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Per-benchmark ratio against the baseline; regressed if slower than `tolerance` allows."""
+    comparison = {}
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        comparison[name] = {
+            "baseline": before,
+            "ratio": seconds / before if before else float("inf"),
+            "regressed": seconds > before * (1 + tolerance) and seconds - before > NOISE_FLOOR,
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--summoners", type=int, default=1_000_000)
+    parser.add_argument("--match-ids", type=int, default=10_000_000)
+    parser.add_argument("--metadata-fraction", type=float, default=0.7)
+    parser.add_argument("--db", help="Reuse this generated database (copied, never modified)")
+    parser.add_argument("--save-db", help="Keep a copy of the generated database here for later --db runs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per read-only benchmark; the best is kept")
+    parser.add_argument("--output", default="db_query_benchmark.json", help="Results file (JSON)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline before a benchmark counts as regressed")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    workdir = Path(tempfile.mkdtemp(prefix="riot_db_query_bench_"))
+    cwd = os.getcwd()
+    try:
+        db_path = workdir / "riot_data.db"
+        start = time.perf_counter()
+        if args.db:
+            shutil.copy(args.db, db_path)
+        else:
+            generate(db_path, summoners=args.summoners, match_ids=args.match_ids,
+                     metadata_fraction=args.metadata_fraction)
+            if args.save_db:
+                shutil.copy(db_path, args.save_db)
+        conn = sqlite3.connect(db_path)
+        rows = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("Summoners", "MatchIDs", "MatchMetadata")
+        }
+        conn.close()
+        print(f"Prepared {rows} in {time.perf_counter() - start:.1f}s")
+
+        os.chdir(workdir)  # DatabaseManager, RawMatchStore and backups use relative paths
+        results = run_suite(args.repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    comparison = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["rows"] != rows:
+            print(f"Warning: baseline was measured on {baseline['rows']}, ratios are not comparable")
+        comparison = compare(results, baseline["results"], args.tolerance)
+
+    print(f"\n{'benchmark':<38}{'seconds':>10}{'baseline':>10}{'ratio':>8}")
+    for name, seconds in results.items():
+        line = f"{name:<38}{seconds:>10.3f}"
+        if name in comparison:
+            entry = comparison[name]
+            line += f"{entry['baseline']:>10.3f}{entry['ratio']:>7.2f}x"
+            if entry["regressed"]:
+                line += "  REGRESSED"
+        print(line)
+
+    with open(output, "w") as f:
+        json.dump({
+            "rows": rows,
+            "repeat": args.repeat,
+            "environment": {
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+            },
+            "results": results,
+            "tolerance": args.tolerance if args.baseline else None,
+            "comparison": comparison,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if any(entry["regressed"] for entry in comparison.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""End-to-end ingestion throughput against the local Riot API stand-in.
+
+Starts benchmarks/mock_riot_server.py in-process, points the clients at
+it through RIOT_API_BASE_URL and ingests ladders, PUUIDs, match IDs and
+match metadata into a fresh database in a temporary directory, either
+with the streaming pipeline (run_pipeline.py) or with the stage scripts
+one after another. Reports API calls per second, rows per second per
+table, client-side call latency, 429s and how much of each host's
+advertised quota was used.
+
+    python benchmarks/ingestion_benchmark.py --mode pipeline --latency-ms 30
+    python benchmarks/ingestion_benchmark.py --mode sequential --output sequential.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from mock_riot_server import add_config_arguments, config_from_args, start_server  # noqa: E402
+
+TABLES = ["Summoners", "MatchIDs", "MatchMetadata", "MatchParticipants"]
+
+
+class LatencyRecorder:
+    """Wraps RiotClient._get to time every call per host, retries and rate-limit waits included."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def install(self, client_class) -> None:
+        original = client_class._get
+        recorder = self
+
+        def timed_get(client, host, method, path, params=None):
+            start = time.perf_counter()
+            try:
+                return original(client, host, method, path, params)
+            finally:
+                with recorder._lock:
+                    recorder.samples[host].append(time.perf_counter() - start)
+
+        client_class._get = timed_get
+
+    def summary(self):
+        result = {}
+        with self._lock:
+            for host, samples in sorted(self.samples.items()):
+                values = np.array(samples) * 1000
+                result[host] = {
+                    "calls": len(values),
+                    "p50_ms": float(np.percentile(values, 50)),
+                    "p99_ms": float(np.percentile(values, 99)),
+                }
+        return result
+
+
+def quota_capacity(limits, elapsed: float) -> int:
+    """Requests the tightest advertised window allows in `elapsed` seconds."""
+    return min(count * max(1, math.ceil(elapsed / seconds)) for count, seconds in limits)
+
+
+def run_pipeline(workers: int, queue_size: int):
+    from run_pipeline import IngestionPipeline
+
+    pipeline = IngestionPipeline(workers_per_host=workers, queue_size=queue_size)
+    pipeline.run(refresh_ladder=True)
+    return pipeline.riot_client.connection_stats()
+
+
+def run_sequential():
+    from api.riot_client import RiotClient
+    from database.db_manager import DatabaseManager
+    from fetch_match_ids import MatchIDFetcher
+    from fetch_match_metadata import MatchMetadataFetcher
+    from fetch_puuids import PUUIDFetcher
+
+    client = RiotClient()
+    db = DatabaseManager()
+    db.update_summoners(client.fetch_top_summoners())
+
+    fetchers = [PUUIDFetcher(db, client), MatchIDFetcher(db, client), MatchMetadataFetcher(db, client)]
+    fetchers[0].process_summoners()
+    fetchers[1].process_summoners()
+    fetchers[2].process_matches()
+    return client.connection_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["pipeline", "sequential"], default="pipeline")
+    parser.add_argument("--workers", type=int, default=4, help="Pipeline worker threads per API host")
+    parser.add_argument("--queue-size", type=int, default=500)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the fetchers' INFO logs")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    config = config_from_args(args)
+    server = start_server(config)
+    os.environ["RIOT_API_BASE_URL"] = server.base_url
+    os.environ.setdefault("RIOT_API_KEY", "mock")
+
+    from api.riot_client import RiotClient
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    recorder = LatencyRecorder()
+    recorder.install(RiotClient)
+
+    workdir = Path(tempfile.mkdtemp(prefix="riot_ingest_bench_"))
+    cwd = os.getcwd()
+    os.chdir(workdir)  # riot_data.db, raw match files and backups land here
+    try:
+        start = time.perf_counter()
+        if args.mode == "pipeline":
+            client_stats = run_pipeline(args.workers, args.queue_size)
+        else:
+            client_stats = run_sequential()
+        elapsed = time.perf_counter() - start
+
+        from database.db_manager import DatabaseManager
+        conn = DatabaseManager().get_connection()
+        rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    server_stats = server.snapshot()
+    capacity = quota_capacity(config.app_limits, elapsed)
+    hosts = {}
+    latency = recorder.summary()
+    for host, counts in sorted(server_stats["hosts"].items()):
+        admitted = sum(n for outcome, n in counts.items() if outcome != "rate_limited")
+        hosts[host] = {
+            **counts,
+            **latency.get(host, {}),
+            "quota_used": admitted / capacity,
+        }
+    total_calls = sum(sum(counts.values()) for counts in server_stats["hosts"].values())
+
+    results = {
+        "mode": args.mode,
+        "elapsed_s": elapsed,
+        "calls": total_calls,
+        "calls_per_s": total_calls / elapsed,
+        "rows": rows,
+        "rows_per_s": {table: n / elapsed for table, n in rows.items()},
+        "hosts": hosts,
+        "client": client_stats,
+        "config": {
+            "ladder_sizes": config.ladder_sizes,
+            "matches_per_player": config.matches_per_player,
+            "latency_ms": config.latency_ms,
+            "error_rate": config.error_rate,
+            "app_limits": config.app_limits,
+            "method_limits": config.method_limits,
+            "workers": args.workers,
+        },
+    }
+
+    print(f"{args.mode}: {total_calls} calls in {elapsed:.1f}s ({results['calls_per_s']:.0f} calls/s)")
+    for table in TABLES:
+        print(f"  {table:<20}{rows[table]:>10} rows{results['rows_per_s'][table]:>10.0f} rows/s")
+    print(f"\n{'host':<10}{'calls':>8}{'429s':>7}{'p50 ms':>9}{'p99 ms':>9}{'quota':>8}")
+    for host, stats in hosts.items():
+        print(f"{host:<10}{stats.get('calls', 0):>8}{stats.get('rate_limited', 0):>7}"
+              f"{stats.get('p50_ms', 0):>9.1f}{stats.get('p99_ms', 0):>9.1f}{stats['quota_used']:>8.0%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
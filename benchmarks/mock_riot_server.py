@@ -0,0 +1,406 @@
+"""Local stand-in for the Riot API endpoints the fetchers use.
+
+Serves deterministic synthetic ladders (league-v4), summoners
+(summoner-v4), match lists, matches and timelines (match-v5) under
+http://127.0.0.1:PORT/{host}/..., so clients started with
+
+    RIOT_API_BASE_URL=http://127.0.0.1:PORT/{host}
+
+need neither a key nor the network. Every response carries Riot-style
+X-App-Rate-Limit / X-Method-Rate-Limit headers with counts, requests over
+the advertised limits get a 429 with Retry-After and X-Rate-Limit-Type,
+and latency and 5xx errors can be injected. GET /_stats returns per-host
+request counts.
+
+startTime on match lists is ignored unless --honor-start-time is given:
+the synthetic history exists from startup, and the fetchers' first crawl
+of a new summoner asks for matches after the summoner was stored.
+
+    python benchmarks/mock_riot_server.py --port 8123 --latency-ms 30
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+PLATFORMS = {"euw1": "europe", "eun1": "europe", "kr": "asia", "na1": "americas"}
+TIERS = ("challenger", "grandmaster", "master")
+POSITIONS = ("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY")
+PATCHES = ("14.1", "14.2", "14.3", "14.4", "14.5", "14.6")
+
+LEAGUE = re.compile(r"^/lol/league/v4/(challenger|grandmaster|master)leagues/by-queue/RANKED_SOLO_5x5$")
+SUMMONER = re.compile(r"^/lol/summoner/v4/summoners/([^/]+)$")
+MATCH_IDS = re.compile(r"^/lol/match/v5/matches/by-puuid/([^/]+)/ids$")
+MATCH = re.compile(r"^/lol/match/v5/matches/([^/]+)$")
+TIMELINE = re.compile(r"^/lol/match/v5/matches/([^/]+)/timeline$")
+
+
+def parse_limits(value: str) -> List[Tuple[int, int]]:
+    """'500:1,30000:600' -> [(500, 1), (30000, 600)]"""
+    return [tuple(int(part) for part in pair.split(":")) for pair in value.split(",") if pair]
+
+
+def _puuid(summoner_id: str) -> str:
+    return hashlib.sha256(summoner_id.encode()).hexdigest() + "-mock"
+
+
+class MockRiotConfig:
+    def __init__(self, ladder_sizes: Dict[str, int] = None, matches_per_player: int = 40,
+                 missing_puuid_fraction: float = 0.0, latency_ms: float = 0.0, latency_jitter: float = 0.5,
+                 error_rate: float = 0.0, app_limits: str = "500:1,30000:600",
+                 method_limits: str = "2000:10", honor_start_time: bool = False, seed: int = 0):
+        self.ladder_sizes = ladder_sizes or {"challenger": 300, "grandmaster": 700}
+        self.matches_per_player = matches_per_player
+        self.missing_puuid_fraction = missing_puuid_fraction
+        self.latency_ms = latency_ms
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.app_limits = parse_limits(app_limits)
+        self.method_limits = parse_limits(method_limits)
+        self.honor_start_time = honor_start_time
+        self.seed = seed
+
+
+class SyntheticWorld:
+    """Deterministic ladders and match histories built once at startup."""
+
+    def __init__(self, config: MockRiotConfig):
+        self.config = config
+        self.leagues: Dict[Tuple[str, str], List[Dict]] = {}
+        self.summoners: Dict[str, Dict] = {}
+        self.histories: Dict[str, List[str]] = defaultdict(list)
+        self.match_players: Dict[str, List[str]] = {}
+        self.match_start: Dict[str, int] = {}
+        now_ms = int(time.time() * 1000)
+
+        for platform in PLATFORMS:
+            rng = random.Random(f"{config.seed}-{platform}")
+            players = []
+            for tier, size in config.ladder_sizes.items():
+                entries = []
+                for i in range(size):
+                    summoner_id = f"{platform}.{tier}.{i}"
+                    puuid = _puuid(summoner_id)
+                    wins = rng.randint(50, 400)
+                    entry = {
+                        "summonerId": summoner_id,
+                        "leaguePoints": rng.randint(0, 2000),
+                        "rank": "I",
+                        "wins": wins,
+                        "losses": wins - rng.randint(-20, 60),
+                    }
+                    if rng.random() >= config.missing_puuid_fraction:
+                        entry["puuid"] = puuid
+                    entries.append(entry)
+                    self.summoners[summoner_id] = {"id": summoner_id, "puuid": puuid, "summonerLevel": 500}
+                    players.append(puuid)
+                self.leagues[(platform, tier)] = entries
+
+            # Ten players per game, so every player appears in ~matches_per_player games
+            games = len(players) * config.matches_per_player // 10
+            for n in range(games):
+                match_id = f"{platform.upper()}_{7_000_000_000 + n}"
+                participants = rng.sample(players, 10)
+                self.match_players[match_id] = participants
+                self.match_start[match_id] = now_ms - (games - n) * 60_000
+                for puuid in participants:
+                    self.histories[puuid].append(match_id)
+
+        for history in self.histories.values():
+            history.reverse()  # newest first, like match-v5
+
+    def league(self, platform: str, tier: str) -> Dict:
+        return {
+            "tier": tier.upper(),
+            "queue": "RANKED_SOLO_5x5",
+            "name": f"Mock {tier.title()}",
+            "entries": self.leagues.get((platform, tier), []),
+        }
+
+    def match_ids(self, puuid: str, start: int, count: int, start_time: Optional[int]) -> List[str]:
+        history = self.histories.get(puuid, [])
+        if start_time is not None and self.config.honor_start_time:
+            history = [m for m in history if self.match_start[m] >= start_time * 1000]
+        return history[start:start + count]
+
+    def match(self, match_id: str) -> Optional[Dict]:
+        players = self.match_players.get(match_id)
+        if players is None:
+            return None
+        rng = random.Random(f"{self.config.seed}-{match_id}")
+        blue_wins = rng.random() < 0.5
+        participants = []
+        for index, puuid in enumerate(players):
+            team_id = 100 if index < 5 else 200
+            champion_id = rng.randint(1, 950)
+            participants.append({
+                "participantId": index + 1,
+                "puuid": puuid,
+                "championId": champion_id,
+                "championName": f"Champion{champion_id}",
+                "teamId": team_id,
+                "teamPosition": POSITIONS[index % 5],
+                "win": (team_id == 100) == blue_wins,
+                "kills": rng.randint(0, 20),
+                "deaths": rng.randint(0, 15),
+                "assists": rng.randint(0, 25),
+                "goldEarned": rng.randint(6000, 22000),
+                "totalDamageDealtToChampions": rng.randint(5000, 60000),
+            })
+        return {
+            "metadata": {"matchId": match_id, "participants": players},
+            "info": {
+                "gameDuration": max(600, int(rng.gauss(1800, 360))),
+                "gameVersion": f"{rng.choice(PATCHES)}.{rng.randint(100, 999)}.{rng.randint(1000, 9999)}",
+                "queueId": 420,
+                "gameStartTimestamp": self.match_start[match_id],
+                "teams": [
+                    {"teamId": 100, "win": blue_wins, "earlyRendered": False},
+                    {"teamId": 200, "win": not blue_wins, "earlyRendered": False},
+                ],
+                "participants": participants,
+            },
+        }
+
+    def timeline(self, match_id: str) -> Optional[Dict]:
+        match = self.match(match_id)
+        if match is None:
+            return None
+        rng = random.Random(f"{self.config.seed}-{match_id}-timeline")
+        rates = [(rng.uniform(300, 450), rng.uniform(350, 500), rng.uniform(4, 8)) for _ in range(10)]
+        frames = []
+        # A frame every minute from 0, plus one at the end of the game
+        for minute in range(match["info"]["gameDuration"] // 60 + 2):
+            participant_frames = {}
+            for index, (gold, xp, cs) in enumerate(rates):
+                total_xp = int(xp * minute * rng.uniform(0.9, 1.1))
+                participant_frames[str(index + 1)] = {
+                    "participantId": index + 1,
+                    "totalGold": 500 + int(gold * minute * rng.uniform(0.9, 1.1)),
+                    "xp": total_xp,
+                    "minionsKilled": int(cs * minute * (0.2 if index % 5 == 1 else 1)),
+                    "jungleMinionsKilled": int(cs * minute * 0.8) if index % 5 == 1 else 0,
+                    "level": min(18, 1 + total_xp // 1000),
+                }
+            frames.append({"timestamp": minute * 60_000, "participantFrames": participant_frames, "events": []})
+        return {
+            "metadata": {"matchId": match_id, "participants": match["metadata"]["participants"]},
+            "info": {"frameInterval": 60_000, "frames": frames},
+        }
+
+
+class RateLimits:
+    """Server-side sliding windows per host (app) and per host+method."""
+
+    def __init__(self, app_limits, method_limits):
+        self.app_limits = app_limits
+        self.method_limits = method_limits
+        self._lock = threading.Lock()
+        self._logs = defaultdict(deque)
+
+    @staticmethod
+    def _header(limits) -> str:
+        return ",".join(f"{count}:{seconds}" for count, seconds in limits)
+
+    def admit(self, host: str, method: str) -> Tuple[Optional[Tuple[str, float]], Dict[str, str]]:
+        """Record a request; returns ((limit type, retry after) or None, headers)."""
+        now = time.monotonic()
+        buckets = [("application", (host,), self.app_limits), ("method", (host, method), self.method_limits)]
+        with self._lock:
+            rejected = None
+            for limit_type, key, limits in buckets:
+                for count, seconds in limits:
+                    log = self._logs[key + (seconds,)]
+                    while log and log[0] <= now - seconds:
+                        log.popleft()
+                    if len(log) >= count and rejected is None:
+                        rejected = (limit_type, log[len(log) - count] + seconds - now)
+            if rejected is None:
+                for _, key, limits in buckets:
+                    for _, seconds in limits:
+                        self._logs[key + (seconds,)].append(now)
+
+            headers = {
+                "X-App-Rate-Limit": self._header(self.app_limits),
+                "X-App-Rate-Limit-Count": ",".join(
+                    f"{len(self._logs[(host, seconds)])}:{seconds}" for _, seconds in self.app_limits
+                ),
+                "X-Method-Rate-Limit": self._header(self.method_limits),
+                "X-Method-Rate-Limit-Count": ",".join(
+                    f"{len(self._logs[(host, method, seconds)])}:{seconds}" for _, seconds in self.method_limits
+                ),
+            }
+        return rejected, headers
+
+
+class MockRiotServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: MockRiotConfig, port: int = 0):
+        self.config = config
+        self.world = SyntheticWorld(config)
+        self.limits = RateLimits(config.app_limits, config.method_limits)
+        self.stats = defaultdict(lambda: defaultdict(int))
+        self.stats_lock = threading.Lock()
+        self.started = time.monotonic()
+        super().__init__(("127.0.0.1", port), _Handler)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/{{host}}"
+
+    def count(self, host: str, outcome: str) -> None:
+        with self.stats_lock:
+            self.stats[host][outcome] += 1
+
+    def snapshot(self) -> Dict:
+        with self.stats_lock:
+            hosts = {host: dict(counts) for host, counts in self.stats.items()}
+        return {
+            "uptime": time.monotonic() - self.started,
+            "app_limits": self.config.app_limits,
+            "method_limits": self.config.method_limits,
+            "hosts": hosts,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, keep-alive
+    # clients would wait on delayed ACKs for every response
+    disable_nagle_algorithm = True
+    server: MockRiotServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body, headers: Dict[str, str] = None) -> None:
+        payload = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self, host: str, path: str, query: Dict):
+        world = self.server.world
+        if match := LEAGUE.match(path):
+            return "league-v4", lambda: world.league(host, match.group(1))
+        if match := SUMMONER.match(path):
+            return "summoner-v4", lambda: world.summoners.get(match.group(1))
+        if match := MATCH_IDS.match(path):
+            def ids():
+                start_time = query.get("startTime", [None])[0]
+                return world.match_ids(
+                    match.group(1),
+                    int(query.get("start", ["0"])[0]),
+                    min(int(query.get("count", ["20"])[0]), 100),
+                    int(start_time) if start_time else None,
+                )
+            return "match-v5.ids", ids
+        if match := MATCH.match(path):
+            return "match-v5.match", lambda: world.match(match.group(1))
+        if match := TIMELINE.match(path):
+            return "match-v5.timeline", lambda: world.timeline(match.group(1))
+        return None, None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/_stats":
+            self._send(200, self.server.snapshot())
+            return
+
+        _, host, path = url.path.split("/", 2) if url.path.count("/") >= 2 else ("", "", "")
+        method, handler = self._route(host, "/" + path, parse_qs(url.query))
+        if handler is None:
+            self.server.count(host, "not_found")
+            self._send(404, {"status": {"message": "Not found", "status_code": 404}})
+            return
+
+        config = self.server.config
+        rejected, headers = self.server.limits.admit(host, method)
+        if rejected:
+            limit_type, retry_after = rejected
+            self.server.count(host, "rate_limited")
+            headers.update({"Retry-After": str(max(1, math.ceil(retry_after))), "X-Rate-Limit-Type": limit_type})
+            self._send(429, {"status": {"message": "Rate limit exceeded", "status_code": 429}}, headers)
+            return
+
+        if config.latency_ms:
+            jitter = config.latency_ms * config.latency_jitter
+            time.sleep(max(0.0, random.uniform(config.latency_ms - jitter, config.latency_ms + jitter)) / 1000)
+        if config.error_rate and random.random() < config.error_rate:
+            self.server.count(host, "server_errors")
+            self._send(503, {"status": {"message": "Service unavailable", "status_code": 503}}, headers)
+            return
+
+        body = handler()
+        if body is None:
+            self.server.count(host, "not_found")
+            self._send(404, {"status": {"message": "Data not found", "status_code": 404}}, headers)
+            return
+        self.server.count(host, "ok")
+        self._send(200, body, headers)
+
+
+def start_server(config: MockRiotConfig, port: int = 0) -> MockRiotServer:
+    """Start the server on a background thread; port 0 picks a free port."""
+    server = MockRiotServer(config, port)
+    threading.Thread(target=server.serve_forever, name="mock-riot", daemon=True).start()
+    return server
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--challenger", type=int, default=300, help="Challenger entries per platform")
+    parser.add_argument("--grandmaster", type=int, default=700, help="Grandmaster entries per platform")
+    parser.add_argument("--matches-per-player", type=int, default=40)
+    parser.add_argument("--missing-puuid-fraction", type=float, default=0.0,
+                        help="Share of league entries served without a puuid")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean added latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--app-limits", default="500:1,30000:600", help="Per-host limits, Riot header format")
+    parser.add_argument("--method-limits", default="2000:10", help="Per-host-and-method limits")
+    parser.add_argument("--honor-start-time", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args) -> MockRiotConfig:
+    return MockRiotConfig(
+        ladder_sizes={"challenger": args.challenger, "grandmaster": args.grandmaster},
+        matches_per_player=args.matches_per_player,
+        missing_puuid_fraction=args.missing_puuid_fraction,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        app_limits=args.app_limits,
+        method_limits=args.method_limits,
+        honor_start_time=args.honor_start_time,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8123)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockRiotServer(config_from_args(args), args.port)
+    print(f"Serving mock Riot API; set RIOT_API_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
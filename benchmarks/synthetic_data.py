@@ -0,0 +1,96 @@
+"""Synthetic riot_data.db generator for benchmarks."""
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from database.db_manager import DatabaseManager  # noqa: E402
+
+REGIONS = ["euw1", "eun1", "kr", "na1"]
+RANKS = ["Challenger", "Grandmaster"]
+PATCHES = ["14.1", "14.2", "14.3", "14.4", "14.5", "14.6"]
+GAME_START_BASE = 1_704_067_200_000  # 2024-01-01 in ms
+
+
+def generate(db_path, summoners=50_000, match_ids=1_000_000, metadata_fraction=0.7,
+             puuid_fraction=0.9, seed=0):
+    """Create a database at db_path with the real schema and synthetic rows.
+
+    Returns a dict with the generated row counts.
+    """
+    Path(db_path).unlink(missing_ok=True)
+    DatabaseManager(db_path).close()
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        conn.executemany(
+            """
+            INSERT INTO Summoners (summonerID, rank, region, puuid, league_points, wins, losses)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    f"summoner-{i:08d}",
+                    rng.choice(RANKS),
+                    rng.choice(REGIONS),
+                    f"puuid-{i:08d}" if rng.random() < puuid_fraction else None,
+                    rng.randrange(2000),
+                    rng.randrange(50, 400),
+                    rng.randrange(50, 400),
+                )
+                for i in range(summoners)
+            )
+        )
+
+        puuids = [
+            (puuid, region) for puuid, region in
+            conn.execute("SELECT puuid, region FROM Summoners WHERE puuid IS NOT NULL")
+        ]
+
+        metadata_count = 0
+        for chunk_start in range(0, match_ids, 50_000):
+            match_chunk = []
+            metadata_chunk = []
+            for i in range(chunk_start, min(chunk_start + 50_000, match_ids)):
+                puuid, region = puuids[rng.randrange(len(puuids))]
+                match_id = f"{region.upper()}_{i:010d}"
+                match_chunk.append((match_id, puuid, region))
+                if rng.random() < metadata_fraction:
+                    metadata_chunk.append((
+                        match_id,
+                        max(180, int(rng.gauss(1800, 360))),
+                        f"{rng.choice(PATCHES)}.{rng.randrange(600)}.1234",
+                        420,
+                        rng.choice([100, 200]),
+                        rng.random() < 0.03,
+                        GAME_START_BASE + i * 60_000,
+                    ))
+
+            conn.executemany(
+                "INSERT INTO MatchIDs (match_id, summoner_puuid, region) VALUES (?, ?, ?)", match_chunk
+            )
+            conn.executemany("""
+                INSERT INTO MatchMetadata (
+                    match_id, game_duration, game_version, queue_id,
+                    winner_team_id, early_surrender, game_start_timestamp
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, metadata_chunk)
+            metadata_count += len(metadata_chunk)
+
+        # Every generated match history counts as crawled once
+        conn.execute("""
+            INSERT INTO MatchHistoryWatermarks (puuid, listed_until, last_match_id)
+            SELECT summoner_puuid, CAST(strftime('%s', 'now') AS INTEGER), MAX(match_id)
+            FROM MatchIDs
+            GROUP BY summoner_puuid
+        """)
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    return {"summoners": summoners, "match_ids": match_ids, "match_metadata": metadata_count}
@@ -0,0 +1,278 @@
+"""Incremental game-duration statistics.
+
+Each (region, patch, queue) group keeps a DurationSummary: count, sum,
+sum of squares, min/max, a fixed-bin histogram for quantiles and
+counters for the reporting thresholds. Summaries merge by addition, so
+update_duration_stats only reads MatchMetadata rows past the rowid
+watermark in JobState and folds them into the stored summaries. Rows
+already exported to the columnar store are read from its memory-mapped
+queue_id/game_duration columns, the rest from SQLite. Memory is bounded
+by the number of groups, not the number of matches.
+"""
+import json
+import logging
+import math
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from data_processing.columnar_store import ColumnarStore, patch_of
+
+STAGE = "duration_stats"
+
+BIN_SECONDS = 10
+MAX_SECONDS = 7200  # Longer games share the last bin
+THRESHOLD_MINUTES = (20, 25, 30)
+
+GroupKey = Tuple[str, str, int]
+
+
+class DurationSummary:
+    """Mergeable summary of game durations in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = None
+        self.max = None
+        self.bins = [0] * (MAX_SECONDS // BIN_SECONDS + 1)
+        self.below = {minutes: 0 for minutes in THRESHOLD_MINUTES}
+
+    def add(self, seconds: int) -> None:
+        self.count += 1
+        self.total += seconds
+        self.total_sq += seconds * seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.bins[min(max(seconds, 0) // BIN_SECONDS, len(self.bins) - 1)] += 1
+        for minutes in THRESHOLD_MINUTES:
+            if seconds < minutes * 60:
+                self.below[minutes] += 1
+
+    def add_many(self, seconds: np.ndarray) -> None:
+        """add() for a whole array of durations at once."""
+        if not len(seconds):
+            return
+        seconds = np.asarray(seconds, dtype=np.int64)
+        self.count += len(seconds)
+        self.total += float(seconds.sum())
+        self.total_sq += float(np.square(seconds, dtype=np.float64).sum())
+        low, high = int(seconds.min()), int(seconds.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        counts = np.bincount(np.minimum(np.maximum(seconds, 0) // BIN_SECONDS, len(self.bins) - 1),
+                             minlength=len(self.bins))
+        self.bins = [a + int(b) for a, b in zip(self.bins, counts)]
+        for minutes in THRESHOLD_MINUTES:
+            self.below[minutes] += int((seconds < minutes * 60).sum())
+
+    def merge(self, other: "DurationSummary") -> "DurationSummary":
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.bins = [a + b for a, b in zip(self.bins, other.bins)]
+        for minutes in THRESHOLD_MINUTES:
+            self.below[minutes] += other.below[minutes]
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        if self.count < 2:
+            return math.nan
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def quantile(self, q: float) -> float:
+        """Quantile in seconds, interpolated within a histogram bin (error < BIN_SECONDS)."""
+        if not self.count:
+            return math.nan
+        target = q * self.count
+        seen = 0
+        for index, n in enumerate(self.bins):
+            if n and seen + n >= target:
+                low = index * BIN_SECONDS
+                high = self.max + 1 if index == len(self.bins) - 1 else low + BIN_SECONDS
+                value = low + (target - seen) / n * (high - low)
+                return min(max(value, self.min), self.max)
+            seen += n
+        return float(self.max)
+
+    def count_outside(self, low: float, high: float) -> int:
+        """Approximate number of durations below `low` or above `high` seconds (by bin midpoint)."""
+        return sum(
+            n for index, n in enumerate(self.bins)
+            if n and not low <= min(max(index * BIN_SECONDS + BIN_SECONDS / 2, self.min), self.max) <= high
+        )
+
+    def pct_below(self, minutes: int) -> float:
+        return self.below[minutes] / self.count * 100 if self.count else math.nan
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "count": self.count,
+            "total": self.total,
+            "total_sq": self.total_sq,
+            "min": self.min,
+            "max": self.max,
+            "bin_seconds": BIN_SECONDS,
+            "bins": self.bins,
+            "below": self.below,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str) -> "DurationSummary":
+        data = json.loads(text)
+        if data["bin_seconds"] != BIN_SECONDS or len(data["bins"]) != MAX_SECONDS // BIN_SECONDS + 1:
+            raise ValueError("Stored summary uses a different histogram layout; rebuild with --rebuild")
+        summary = cls()
+        summary.count = data["count"]
+        summary.total = data["total"]
+        summary.total_sq = data["total_sq"]
+        summary.min = data["min"]
+        summary.max = data["max"]
+        summary.bins = data["bins"]
+        summary.below = {int(minutes): n for minutes, n in data["below"].items()}
+        return summary
+
+
+def load_summaries(conn, regions: List[str] = None, patches: List[str] = None,
+                   queues: List[int] = None) -> Dict[GroupKey, DurationSummary]:
+    """Stored summaries, optionally filtered by region, patch and queue."""
+    summaries = {}
+    for region, patch, queue_id, summary in conn.execute(
+        "SELECT region, patch, queue_id, summary FROM DurationStats"
+    ):
+        if (regions and region not in regions) or (patches and patch not in patches) \
+                or (queues and queue_id not in queues):
+            continue
+        summaries[(region, patch, queue_id)] = DurationSummary.from_json(summary)
+    return summaries
+
+
+def _store_chunk(conn, chunk: Dict[GroupKey, DurationSummary]) -> None:
+    """Merge chunk summaries into the stored ones."""
+    stored = {
+        key: summary for key, summary in load_summaries(conn).items() if key in chunk
+    }
+    conn.executemany("""
+        INSERT INTO DurationStats (region, patch, queue_id, summary, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(region, patch, queue_id) DO UPDATE SET
+            summary = excluded.summary,
+            updated_at = CURRENT_TIMESTAMP
+    """, [
+        (*key, stored.get(key, DurationSummary()).merge(summary).to_json())
+        for key, summary in chunk.items()
+    ])
+
+
+def _fold_columnar(store: ColumnarStore, watermark: int) -> Tuple[Dict[GroupKey, DurationSummary], int]:
+    """Summaries of exported MatchMetadata rows past `watermark`, and the number of rows read."""
+    chunk = defaultdict(DurationSummary)
+    rows = 0
+    for region, patch, arrays in store.iter_partitions(
+        "MatchMetadata", ["queue_id", "game_duration"], after_rowid=watermark
+    ):
+        queues, durations = arrays["queue_id"], arrays["game_duration"]
+        rows += len(durations)
+        present = durations > 0  # Missing durations are exported as 0
+        for queue_id in np.unique(queues[present]):
+            chunk[(region, patch, int(queue_id))].add_many(durations[present & (queues == queue_id)])
+    return chunk, rows
+
+
+def update_duration_stats(db, chunk_size: int = 50_000, rebuild: bool = False,
+                          store: ColumnarStore = None) -> int:
+    """Fold MatchMetadata rows added since the last update into DurationStats.
+
+    Each chunk is merged and committed together with the watermark, so an
+    interrupted update resumes without double counting. With a store,
+    rows it has already exported are read from its column files in one
+    chunk; SQLite is only queried for the rows exported after them.
+    """
+    conn = db.get_connection()
+    if rebuild:
+        conn.execute("DELETE FROM DurationStats")
+        db.save_job_state(conn, STAGE, 0, status='idle')
+        conn.commit()
+
+    watermark = db.get_job_state(STAGE)['last_cursor']
+    added = 0
+    try:
+        exported = store.exported_rowid("MatchMetadata") if store else 0
+        if exported > watermark:
+            chunk, added = _fold_columnar(store, watermark)
+            _store_chunk(conn, chunk)
+            watermark = exported
+            db.save_job_state(conn, STAGE, watermark, processed=added, status='complete')
+            conn.commit()
+            logging.info(f"Duration stats: folded in {added} exported matches")
+
+        while True:
+            rows = conn.execute("""
+                SELECT mm.rowid, COALESCE(m.region, 'unknown'), mm.game_version,
+                       COALESCE(mm.queue_id, 0), mm.game_duration
+                FROM MatchMetadata mm
+                LEFT JOIN MatchIDs m ON m.match_id = mm.match_id
+                WHERE mm.rowid > ?
+                ORDER BY mm.rowid
+                LIMIT ?
+            """, (watermark, chunk_size)).fetchall()
+            if not rows:
+                break
+
+            chunk = defaultdict(DurationSummary)
+            for _, region, game_version, queue_id, duration in rows:
+                if duration is not None:
+                    chunk[(region, patch_of(game_version), queue_id)].add(duration)
+
+            _store_chunk(conn, chunk)
+            watermark = rows[-1][0]
+            db.save_job_state(conn, STAGE, watermark, processed=len(rows), status='complete')
+            conn.commit()
+            added += len(rows)
+            logging.info(f"Duration stats: folded in {added} new matches")
+    except Exception:
+        conn.rollback()
+        raise
+    return added
+
+
+def combined_summary(summaries: Dict[GroupKey, DurationSummary]) -> DurationSummary:
+    total = DurationSummary()
+    for summary in summaries.values():
+        total.merge(summary)
+    return total
+
+
+def find_outlier_examples(conn, low: float, high: float, regions: List[str] = None,
+                          patches: List[str] = None, queues: List[int] = None, limit: int = 5) -> List[Tuple]:
+    """A few MatchMetadata rows outside [low, high] seconds, for the report."""
+    query = """
+        SELECT mm.match_id, mm.game_duration, ROUND(mm.game_duration / 60.0, 2)
+        FROM MatchMetadata mm
+        LEFT JOIN MatchIDs m ON m.match_id = mm.match_id
+        WHERE (mm.game_duration < ? OR mm.game_duration > ?)
+    """
+    params = [low, high]
+    if regions:
+        query += f" AND COALESCE(m.region, 'unknown') IN ({','.join('?' * len(regions))})"
+        params.extend(regions)
+    if patches:
+        query += " AND (" + " OR ".join("mm.game_version LIKE ?" for _ in patches) + ")"
+        params.extend(f"{patch}.%" for patch in patches)
+    if queues:
+        query += f" AND mm.queue_id IN ({','.join('?' * len(queues))})"
+        params.extend(queues)
+    query += " LIMIT ?"
+    params.append(limit)
+    return conn.execute(query, params).fetchall()
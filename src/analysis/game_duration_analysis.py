@@ -1,49 +1,64 @@
-import sqlite3
-import pandas as pd
-
-def analyze_game_durations(db_path="riot_data.db"):
-    # 1) Connect to the database
-    conn = sqlite3.connect(db_path)
-    try:
-        # 2) Fetch all game durations from MatchMetadata
-        query = "SELECT game_duration FROM MatchMetadata"
-        df = pd.read_sql_query(query, conn)
-    finally:
-        conn.close()
-
-    # 3) Convert durations to minutes
-    df['duration_mins'] = df['game_duration'] / 60.0
-
-    # Basic stats
-    avg_duration = df['duration_mins'].mean()
-    median_duration = df['duration_mins'].median()
-    q1 = df['duration_mins'].quantile(0.25)
-    q3 = df['duration_mins'].quantile(0.75)
+import argparse
+from analysis.duration_stats import (
+    THRESHOLD_MINUTES, combined_summary, find_outlier_examples, load_summaries, update_duration_stats
+)
+from data_processing.columnar_store import ColumnarStore
+from database.db_manager import DatabaseManager
+
+
+def analyze_game_durations(db_path="riot_data.db", regions=None, patches=None, queues=None, rebuild=False,
+                           columnar_root="columnar"):
+    # 1) Fold matches stored since the last run into the persisted summaries
+    db = DatabaseManager(db_path)
+    new_matches = update_duration_stats(db, rebuild=rebuild, store=ColumnarStore(columnar_root))
+
+    # 2) Merge the (region, patch, queue) groups that were asked for
+    summary = combined_summary(load_summaries(db.get_connection(), regions, patches, queues))
+    if not summary.count:
+        print("No matches to analyze.")
+        return
+
+    # 3) Durations are stored in seconds; report in minutes
+    avg_duration = summary.mean / 60
+    median_duration = summary.quantile(0.5) / 60
+    q1 = summary.quantile(0.25) / 60
+    q3 = summary.quantile(0.75) / 60
 
     # Define IQR-based outliers
     iqr = q3 - q1
     lower_bound = q1 - 1.5 * iqr
     upper_bound = q3 + 1.5 * iqr
-    outliers = df[(df['duration_mins'] < lower_bound) | (df['duration_mins'] > upper_bound)]
-
-    # Percentages below certain time thresholds
-    total = len(df)
-    pct_below_20 = (df[df['duration_mins'] < 20].shape[0] / total) * 100
-    pct_below_25 = (df[df['duration_mins'] < 25].shape[0] / total) * 100
-    pct_below_30 = (df[df['duration_mins'] < 30].shape[0] / total) * 100
+    outliers = summary.count_outside(lower_bound * 60, upper_bound * 60)
 
-    print(f"Total matches: {total}")
+    print(f"Total matches: {summary.count} ({new_matches} new since last run)")
     print(f"Average duration: {avg_duration:.2f} min")
     print(f"Median duration: {median_duration:.2f} min")
     print(f"25th quartile: {q1:.2f} min  |  75th quartile: {q3:.2f} min")
 
-    print(f"\nEstimated outliers using IQR (below {lower_bound:.2f} or above {upper_bound:.2f}): {len(outliers)}")
+    print(f"\nEstimated outliers using IQR (below {lower_bound:.2f} or above {upper_bound:.2f}): {outliers}")
     print("A few outlier examples:")
-    print(outliers.head())  # Show a few outlier rows
+    for match_id, duration, minutes in find_outlier_examples(
+        db.get_connection(), lower_bound * 60, upper_bound * 60, regions, patches, queues
+    ):
+        print(f"  {match_id}: {duration}s ({minutes} min)")
+
+    # Percentages below certain time thresholds
+    print()
+    for minutes in THRESHOLD_MINUTES:
+        print(f"Pct below {minutes} min: {summary.pct_below(minutes):.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Game duration report, updated incrementally from new matches.")
+    parser.add_argument("--region", nargs="+", help="Only include these regions")
+    parser.add_argument("--patch", nargs="+", help="Only include these patches (e.g. 14.2)")
+    parser.add_argument("--queue", nargs="+", type=int, help="Only include these queue IDs")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the stored summaries from scratch")
+    parser.add_argument("--columnar-root", default="columnar", help="Columnar export to read exported matches from")
+    args = parser.parse_args()
+    analyze_game_durations(regions=args.region, patches=args.patch, queues=args.queue, rebuild=args.rebuild,
+                           columnar_root=args.columnar_root)
 
-    print(f"\nPct below 20 min: {pct_below_20:.2f}%")
-    print(f"Pct below 25 min: {pct_below_25:.2f}%")
-    print(f"Pct below 30 min: {pct_below_30:.2f}%")
 
 if __name__ == "__main__":
-    analyze_game_durations()
\ No newline at end of file
+    main()
@@ -0,0 +1,198 @@
+"""Incrementally maintained per-player form.
+
+PlayerStats holds one row per PUUID seen in MatchParticipants, so every
+participant of a match counts, not only the player whose history listed
+it. A row keeps all-time totals, the last RECENT_GAMES results (for
+streaks and recent form) and per-day buckets for the last WINDOW_DAYS
+days (for rolling N-day win rates and durations). update_player_stats
+only reads MatchParticipants rows past the rowid watermark in JobState,
+so keeping the index current costs O(new matches), and player_form
+answers with one primary-key lookup.
+"""
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+STAGE = "player_stats"
+
+DAY_MS = 86_400_000
+WINDOW_DAYS = 30
+RECENT_GAMES = 20
+
+
+class PlayerSummary:
+    """Totals, recent results and daily buckets for one player."""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.duration_total = 0
+        self.last_game_start = None
+        self.recent = []  # [game_start, win, duration], oldest first
+        self.daily = {}  # day number -> [games, wins, duration]
+
+    def add(self, game_start: int, win: bool, duration: Optional[int]) -> None:
+        win, duration = int(bool(win)), duration or 0
+        self.games += 1
+        self.wins += win
+        self.duration_total += duration
+        self.last_game_start = game_start if self.last_game_start is None else max(self.last_game_start, game_start)
+
+        # Matches can arrive out of order (history backfills), so both lists stay sorted by game start
+        self.recent.append([game_start, win, duration])
+        self.recent.sort(key=lambda game: game[0])
+        del self.recent[:-RECENT_GAMES]
+
+        day = game_start // DAY_MS
+        if day > self.last_game_start // DAY_MS - WINDOW_DAYS:
+            bucket = self.daily.setdefault(day, [0, 0, 0])
+            bucket[0] += 1
+            bucket[1] += win
+            bucket[2] += duration
+        cutoff = self.last_game_start // DAY_MS - WINDOW_DAYS
+        for old in [day for day in self.daily if day <= cutoff]:
+            del self.daily[old]
+
+    @property
+    def streak(self) -> int:
+        """Current run of wins (positive) or losses (negative), within the last RECENT_GAMES."""
+        if not self.recent:
+            return 0
+        last = self.recent[-1][1]
+        run = 0
+        for _, win, _ in reversed(self.recent):
+            if win != last:
+                break
+            run += 1
+        return run if last else -run
+
+    def window(self, days: int, now_ms: int) -> Dict[str, float]:
+        """Games, wins and duration over the `days` days up to `now_ms` (days <= WINDOW_DAYS)."""
+        if days > WINDOW_DAYS:
+            raise ValueError(f"PlayerStats keeps {WINDOW_DAYS} days of buckets, asked for {days}")
+        first = now_ms // DAY_MS - days + 1
+        games = wins = duration = 0
+        for day, (n, w, d) in self.daily.items():
+            if day >= first:
+                games, wins, duration = games + n, wins + w, duration + d
+        return {"games": games, "wins": wins, "duration": duration}
+
+    def to_row(self, puuid: str) -> tuple:
+        return (
+            puuid, self.games, self.wins, self.duration_total, self.last_game_start, self.streak,
+            json.dumps(self.recent, separators=(",", ":")),
+            json.dumps({str(day): bucket for day, bucket in sorted(self.daily.items())}, separators=(",", ":")),
+        )
+
+    @classmethod
+    def from_row(cls, games, wins, duration_total, last_game_start, recent, daily) -> "PlayerSummary":
+        summary = cls()
+        summary.games = games
+        summary.wins = wins
+        summary.duration_total = duration_total
+        summary.last_game_start = last_game_start
+        summary.recent = json.loads(recent)
+        summary.daily = {int(day): bucket for day, bucket in json.loads(daily).items()}
+        return summary
+
+
+def load_player_summaries(conn, puuids: List[str]) -> Dict[str, PlayerSummary]:
+    """Stored summaries of `puuids`; players without a row are left out."""
+    summaries = {}
+    puuids = list(puuids)
+    for start in range(0, len(puuids), 500):
+        batch = puuids[start:start + 500]
+        for puuid, *row in conn.execute(f"""
+            SELECT puuid, games, wins, duration_total, last_game_start, recent, daily
+            FROM PlayerStats
+            WHERE puuid IN ({','.join('?' * len(batch))})
+        """, batch):
+            summaries[puuid] = PlayerSummary.from_row(*row)
+    return summaries
+
+
+def update_player_stats(db, chunk_size: int = 50_000, rebuild: bool = False, commit: bool = True) -> int:
+    """Fold MatchParticipants rows added since the last update into PlayerStats.
+
+    Each chunk is merged and committed together with the watermark, so an
+    interrupted update resumes without double counting. With
+    `commit=False` the chunks are written on the caller's open
+    transaction and left for the caller to commit or roll back, so the
+    index moves in the same commit as the matches that fed it. Returns
+    the number of participant rows folded in.
+    """
+    conn = db.get_connection()
+    if rebuild:
+        conn.execute("DELETE FROM PlayerStats")
+        db.save_job_state(conn, STAGE, 0, status='idle')
+        conn.commit()
+
+    watermark = db.get_job_state(STAGE)['last_cursor']
+    added = 0
+    try:
+        while True:
+            rows = conn.execute("""
+                SELECT mp.rowid, mp.puuid, COALESCE(mp.game_start_timestamp, mm.game_start_timestamp, 0),
+                       mp.win, mm.game_duration
+                FROM MatchParticipants mp
+                LEFT JOIN MatchMetadata mm ON mm.match_id = mp.match_id
+                WHERE mp.rowid > ?
+                ORDER BY mp.rowid
+                LIMIT ?
+            """, (watermark, chunk_size)).fetchall()
+            if not rows:
+                break
+
+            summaries = load_player_summaries(conn, {row[1] for row in rows})
+            for _, puuid, game_start, win, duration in rows:
+                summaries.setdefault(puuid, PlayerSummary()).add(game_start, win, duration)
+            conn.executemany("""
+                INSERT INTO PlayerStats (
+                    puuid, games, wins, duration_total, last_game_start, streak, recent, daily, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(puuid) DO UPDATE SET
+                    games = excluded.games,
+                    wins = excluded.wins,
+                    duration_total = excluded.duration_total,
+                    last_game_start = excluded.last_game_start,
+                    streak = excluded.streak,
+                    recent = excluded.recent,
+                    daily = excluded.daily,
+                    updated_at = CURRENT_TIMESTAMP
+            """, [summary.to_row(puuid) for puuid, summary in summaries.items()])
+            watermark = rows[-1][0]
+            db.save_job_state(conn, STAGE, watermark, processed=len(rows), status='complete')
+            if commit:
+                conn.commit()
+                logging.info(f"Player stats: folded in {added + len(rows)} new participant rows")
+            added += len(rows)
+    except Exception:
+        if commit:
+            conn.rollback()
+        raise
+    return added
+
+
+def player_form(conn, puuid: str, days: int = 7, now_ms: int = None) -> Optional[Dict]:
+    """A player's form from PlayerStats, or None if they have no stored games."""
+    row = conn.execute("""
+        SELECT games, wins, duration_total, last_game_start, recent, daily
+        FROM PlayerStats
+        WHERE puuid = ?
+    """, (puuid,)).fetchone()
+    if row is None:
+        return None
+    summary = PlayerSummary.from_row(*row)
+    window = summary.window(days, now_ms if now_ms is not None else int(time.time() * 1000))
+    return {
+        "games": summary.games,
+        "win_rate": summary.wins / summary.games if summary.games else None,
+        "avg_duration": summary.duration_total / summary.games if summary.games else None,
+        "last_game_start": summary.last_game_start,
+        "streak": summary.streak,
+        "recent": "".join("W" if win else "L" for _, win, _ in summary.recent),
+        f"games_last_{days}d": window["games"],
+        f"win_rate_last_{days}d": window["wins"] / window["games"] if window["games"] else None,
+        f"avg_duration_last_{days}d": window["duration"] / window["games"] if window["games"] else None,
+    }
@@ -0,0 +1,196 @@
+import os
+import asyncio
+import logging
+import time
+from typing import List, Dict, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from api.riot_client import (
+    RateLimiter, RetryPolicy, api_base_url, shared_rate_limiter, get_region_routing, league_entry_to_summoner,
+    record_response
+)
+from utils.metrics import metrics
+from utils.run_budget import RunBudget
+
+load_dotenv()
+
+
+class RiotAPIError(Exception):
+    """Non-success response from the Riot API."""
+
+    def __init__(self, status: int, url: str, body: str = ""):
+        super().__init__(f"{status} error for url: {url}")
+        self.status = status
+        self.url = url
+        self.body = body
+
+
+class AsyncRiotClient:
+    """asyncio counterpart of RiotClient.
+
+    Each routing host (euw1, eun1, kr, na1, europe, asia, americas) gets its
+    own concurrency pool, so a backlog on one cluster never holds back the
+    others. All requests still go through the shared RateLimiter, and
+    each one sent, retries included, is spent from `budget`.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter = None, retry_policy: RetryPolicy = None,
+                 max_concurrency_per_host: int = 10, timeout: float = 10, base_url: str = None,
+                 budget: RunBudget = None):
+        self.api_key = os.getenv('RIOT_API_KEY')
+        if not self.api_key:
+            raise ValueError("RIOT_API_KEY not found in environment variables")
+
+        self.headers = {"X-Riot-Token": self.api_key}
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self.base_url = base_url or api_base_url()
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.budget = budget or RunBudget()
+        self.regions = ["euw1", "eun1", "kr", "na1"]
+        self.ranks = [
+            ("challenger", "Challenger"),
+            ("grandmaster", "Grandmaster"),
+        ]
+        self.queues = ["RANKED_SOLO_5x5"]
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_pools: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "server_errors": 0, "timeouts": 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrency_per_host)
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _host_pool(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_pools:
+            self._host_pools[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self._host_pools[host]
+
+    async def _get(self, host: str, method: str, path: str, params: Dict = None):
+        """Rate-limited GET returning the decoded JSON body.
+
+        Uses the same bounded RetryPolicy as RiotClient: 429s wait for
+        Retry-After, 5xx and timeouts back off with jitter.
+        """
+        url = self.base_url.format(host=host) + path
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+        policy = self.retry_policy
+
+        for attempt in range(policy.max_retries + 1):
+            if attempt > 0:
+                self.stats["retries"] += 1
+            last_attempt = attempt == policy.max_retries
+            delay = None
+
+            # The host slot covers the request only, so backoff sleeps don't hold up the host's other requests
+            async with self._host_pool(host):
+                await self.rate_limiter.acquire_async(host, method)
+                self.stats["requests"] += 1
+                self.budget.spend()
+                start = time.perf_counter()
+                try:
+                    async with self._get_session().get(url, params=params) as response:
+                        record_response(host, method, response.status, time.perf_counter() - start)
+                        self.rate_limiter.update_from_headers(host, method, response.headers)
+
+                        if response.status == 429:  # Rate limit exceeded
+                            self.stats["rate_limited"] += 1
+                            retry_after = policy.retry_after(response.headers)
+                            limit_type = response.headers.get("X-Rate-Limit-Type")
+                            self.rate_limiter.penalize(host, method, retry_after, limit_type)
+                            if not last_attempt:
+                                logging.warning(f"Rate limit exceeded ({limit_type or 'unknown'}) on {host}. Retrying after {retry_after:.0f} seconds...")
+                                continue
+                        elif response.status >= 500:
+                            self.stats["server_errors"] += 1
+                            if not last_attempt:
+                                delay = policy.backoff(attempt)
+                                logging.warning(f"Server error {response.status} from {host}. Retrying in {delay:.1f} seconds...")
+
+                        if delay is None:
+                            if response.status != 200:
+                                raise RiotAPIError(response.status, url, await response.text())
+                            return await response.json()
+                except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                    self.stats["timeouts"] += 1
+                    record_response(host, method, "timeout", time.perf_counter() - start)
+                    if last_attempt:
+                        raise
+                    delay = policy.backoff(attempt)
+                    logging.warning(f"Request to {host} failed ({e.__class__.__name__}). Retrying in {delay:.1f} seconds...")
+
+            metrics.inc("riot_api_backoff_seconds_total", delay, host=host)
+            await asyncio.sleep(delay)
+
+    async def _fetch_league(self, region: str, queue: str, api_rank: str, rank_label: str) -> List[Dict]:
+        path = f"/lol/league/v4/{api_rank}leagues/by-queue/{queue}"
+        try:
+            league_data = await self._get(region, f"league-v4.{api_rank}", path)
+        except Exception as e:
+            logging.error(f"Error fetching data for {region} {queue} {rank_label}: {str(e)}")
+            return []
+
+        if "entries" not in league_data:
+            logging.error(f"Unexpected API response format: {league_data}")
+            return []
+
+        return [league_entry_to_summoner(entry, rank_label, region, queue) for entry in league_data["entries"]]
+
+    async def fetch_top_summoners(self) -> List[Dict]:
+        """Fetch top-ranked summoners from all regions and queues concurrently."""
+        results = await asyncio.gather(*(
+            self._fetch_league(region, queue, api_rank, rank_label)
+            for region in self.regions
+            for queue in self.queues
+            for api_rank, rank_label in self.ranks
+        ))
+        return [summoner for league in results for summoner in league]
+
+    async def get_summoner_by_id(self, summoner_id: str, region: str) -> dict:
+        """Fetch summoner data by summoner ID."""
+        return await self._get(region, "summoner-v4.by-id", f"/lol/summoner/v4/summoners/{summoner_id}")
+
+    async def get_matches_by_puuid(self, puuid: str, region: str, start_time: int = None,
+                                  start: int = 0, count: int = 100) -> List[str]:
+        """Fetch one page of match IDs for a summoner, newest first."""
+        params = {
+            "startTime": start_time,
+            "queue": 420,  # Ranked Solo/Duo games only
+            "start": start,
+            "count": count  # At most 100
+        }
+        return await self._get(
+            get_region_routing(region), "match-v5.ids-by-puuid",
+            f"/lol/match/v5/matches/by-puuid/{puuid}/ids", params=params
+        )
+
+    async def get_match_metadata(self, match_id: str, region: str) -> Dict:
+        """Fetch basic match data."""
+        return await self._get(get_region_routing(region), "match-v5.match", f"/lol/match/v5/matches/{match_id}")
+
+    async def get_match_timeline(self, match_id: str, region: str) -> Dict:
+        """Fetch the per-minute frames and events of a match."""
+        return await self._get(
+            get_region_routing(region), "match-v5.timeline", f"/lol/match/v5/matches/{match_id}/timeline"
+        )
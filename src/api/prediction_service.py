@@ -0,0 +1,367 @@
+"""Local win prediction service for live lobbies.
+
+PredictionService scores lobbies (ten PUUIDs, blue side first, plus
+champions, region and patch) with the latest model version, using the
+same compute_numeric/assemble_vector code as training. Per-PUUID inputs
+(recent game times and results, rank, LP) live in an LRU-bounded
+PlayerFeatureCache:
+
+- a miss loads every missing player of a batch with one query
+- refresh() appends MatchParticipants rows past a rowid watermark to
+  cached players and picks up ladder changes, so the cache follows new
+  matches without reloading anyone
+- save_snapshot()/load_snapshot() keep the cache in one compact .npz
+  file, so a restarted service starts warm
+
+The HTTP front end (python src/serve_predictions.py) accepts
+POST /predict with {"lobbies": [...]} and serves GET /stats (p50/p99
+latency, cache hit rate) and GET /metrics (Prometheus text).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from data_processing.features import RECENT_WINDOW_MS, assemble_vector, compute_numeric, load_player_data
+from database.db_manager import connect
+from ml.win_model import ModelRegistry
+from utils.metrics import metrics
+
+
+class _Player:
+    """One player's cached inputs.
+
+    Never modified once cached: refresh() swaps in a new entry, so a
+    request reading it outside the lock always sees matching arrays.
+    """
+
+    __slots__ = ("game_start", "wins", "rank", "league_points")
+
+    def __init__(self, game_start: np.ndarray, wins: np.ndarray, rank: str = "", league_points: int = 0):
+        self.game_start = game_start
+        self.wins = wins
+        self.rank = rank
+        self.league_points = league_points
+
+
+class PlayerFeatureCache:
+    """LRU cache of the per-PUUID inputs to compute_numeric.
+
+    Request threads and the refresh thread share one loader connection,
+    used under _db_lock, instead of each opening its own.
+    """
+
+    def __init__(self, db, max_players: int = 200_000):
+        self.db = db
+        self.max_players = max_players
+        self._players: "OrderedDict[str, _Player]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = connect(db.db_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        # Everything up to this MatchParticipants rowid is reflected in the cache
+        self.watermark = self._max_participant_rowid()
+        self.ranks_updated_at = self._max_summoner_update()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _max_participant_rowid(self) -> int:
+        return self._query("SELECT MAX(rowid) FROM MatchParticipants")[0][0] or 0
+
+    def _max_summoner_update(self) -> str:
+        return self._query("SELECT MAX(updated_at) FROM Summoners")[0][0] or ""
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+    def _put(self, puuid: str, player: _Player) -> None:
+        self._players[puuid] = player
+        self._players.move_to_end(puuid)
+        while len(self._players) > self.max_players:
+            self._players.popitem(last=False)
+
+    def get_many(self, puuids: Sequence[str], now_ms: int) -> Dict[str, _Player]:
+        """Players for `puuids`, loading all misses with one query."""
+        with self._lock:
+            found, missing = {}, []
+            for puuid in set(puuids):
+                player = self._players.get(puuid)
+                if player is None:
+                    missing.append(puuid)
+                else:
+                    self._players.move_to_end(puuid)
+                    found[puuid] = player
+            self.hits += len(found)
+            self.misses += len(missing)
+            metrics.inc("prediction_cache_lookups_total", len(found), result="hit")
+            metrics.inc("prediction_cache_lookups_total", len(missing), result="miss")
+            if missing:
+                with self._db_lock:
+                    (hist_puuid, hist_ts, hist_win), ranks = load_player_data(
+                        self._conn, missing, now_ms - RECENT_WINDOW_MS, now_ms + 1, self.watermark
+                    )
+                    # Filling the temp table opened a transaction; left open, its snapshot would hide new matches
+                    self._conn.commit()
+                order = np.argsort(hist_puuid, kind="stable")
+                hist_puuid, hist_ts, hist_win = hist_puuid[order], hist_ts[order], hist_win[order]
+                for puuid in missing:
+                    lo, hi = np.searchsorted(hist_puuid, puuid, "left"), np.searchsorted(hist_puuid, puuid, "right")
+                    rank, league_points = ranks.get(puuid, ("", 0))
+                    found[puuid] = _Player(hist_ts[lo:hi].copy(), hist_win[lo:hi].copy(), rank or "", league_points or 0)
+                    self._put(puuid, found[puuid])
+            return found
+
+    def refresh(self, page_size: int = 50_000) -> int:
+        """Fold new matches and ladder changes into cached players; returns rows applied."""
+        applied = 0
+        while True:
+            rows = self._query("""
+                SELECT rowid, puuid, game_start_timestamp, win
+                FROM MatchParticipants
+                WHERE rowid > ?
+                ORDER BY rowid
+                LIMIT ?
+            """, (self.watermark, page_size))
+            if not rows:
+                break
+            with self._lock:
+                for _, puuid, game_start, win in rows:
+                    player = self._players.get(puuid)
+                    if player is not None and game_start is not None:
+                        self._players[puuid] = _Player(
+                            np.append(player.game_start, game_start), np.append(player.wins, np.int8(win or 0)),
+                            player.rank, player.league_points
+                        )
+                        applied += 1
+                self.watermark = rows[-1][0]
+
+        # updated_at has one-second resolution: rows from the last second seen are re-read, not missed
+        ladder = self._query("""
+            SELECT puuid, rank, league_points, updated_at
+            FROM Summoners
+            WHERE updated_at >= ? AND puuid IS NOT NULL
+        """, (self.ranks_updated_at,))
+        with self._lock:
+            for puuid, rank, league_points, updated_at in ladder:
+                player = self._players.get(puuid)
+                if player is not None:
+                    self._players[puuid] = _Player(player.game_start, player.wins, rank or "", league_points or 0)
+                self.ranks_updated_at = max(self.ranks_updated_at, updated_at)
+
+            # Drop games that have left the window everywhere
+            cutoff = int(time.time() * 1000) - RECENT_WINDOW_MS
+            for puuid, player in self._players.items():
+                if len(player.game_start) and player.game_start.min() < cutoff:
+                    keep = player.game_start >= cutoff
+                    self._players[puuid] = _Player(
+                        player.game_start[keep], player.wins[keep], player.rank, player.league_points
+                    )
+        return applied
+
+    def save_snapshot(self, path: str) -> None:
+        """Write the cache, least recently used first, to one compressed .npz file."""
+        with self._lock:
+            puuids = list(self._players)
+            players = list(self._players.values())
+            watermark, ranks_updated_at = self.watermark, self.ranks_updated_at
+        tmp = Path(path).with_suffix(".tmp.npz")
+        np.savez_compressed(
+            tmp,
+            puuid=np.array(puuids, dtype="U78"),
+            games=np.array([len(p.game_start) for p in players], dtype=np.int32),
+            game_start=np.concatenate([p.game_start for p in players] or [np.empty(0, np.int64)]).astype(np.int64),
+            wins=np.concatenate([p.wins for p in players] or [np.empty(0, np.int8)]).astype(np.int8),
+            rank=np.array([p.rank for p in players], dtype="U16"),
+            league_points=np.array([p.league_points for p in players], dtype=np.int32),
+            watermark=np.int64(watermark),
+            ranks_updated_at=np.array(ranks_updated_at),
+        )
+        os.replace(tmp, path)
+
+    def load_snapshot(self, path: str) -> int:
+        """Warm the cache from a snapshot; refresh() then catches up from its watermark."""
+        with np.load(path) as snapshot:
+            ends = np.cumsum(snapshot["games"])
+            starts = ends - snapshot["games"]
+            game_start, wins = snapshot["game_start"], snapshot["wins"]
+            with self._lock:
+                self._players.clear()
+                for i, puuid in enumerate(snapshot["puuid"]):
+                    self._put(str(puuid), _Player(
+                        game_start[starts[i]:ends[i]], wins[starts[i]:ends[i]],
+                        str(snapshot["rank"][i]), int(snapshot["league_points"][i])
+                    ))
+                self.watermark = int(snapshot["watermark"])
+                self.ranks_updated_at = str(snapshot["ranks_updated_at"])
+        return len(self._players)
+
+
+class PredictionService:
+    def __init__(self, db, model_root="models/win_model", max_players: int = 200_000,
+                 snapshot_path: str = None, latency_window: int = 10_000):
+        self.registry = ModelRegistry(model_root)
+        self.model, self.model_metadata = self.registry.load()
+        if self.model is None:
+            raise ValueError(f"No model in {model_root}; run train_model.py first")
+        self.cache = PlayerFeatureCache(db, max_players)
+        self.snapshot_path = snapshot_path
+        if snapshot_path and Path(snapshot_path).exists():
+            loaded = self.cache.load_snapshot(snapshot_path)
+            applied = self.cache.refresh()
+            logging.info(f"Warmed player cache with {loaded} players from {snapshot_path} "
+                         f"({applied} newer games applied)")
+        self._latencies = deque(maxlen=latency_window)
+        self._latency_lock = threading.Lock()
+        self.lobbies_scored = 0
+
+    def reload_model(self) -> bool:
+        """Switch to a newer model version if one was saved."""
+        latest = self.registry.latest_version()
+        if latest is None or latest == self.model_metadata["version"]:
+            return False
+        self.model, self.model_metadata = self.registry.load(latest)
+        logging.info(f"Loaded model v{latest}")
+        return True
+
+    def predict(self, lobbies: List[Dict]) -> List[float]:
+        """Blue-side win probability for each lobby.
+
+        A lobby is {"puuids": [10], "champions": [10], "region": ..., "patch": ...}
+        with the blue side first; champions, region and patch are optional.
+        """
+        start = time.perf_counter()
+        now_ms = int(time.time() * 1000)
+        n = len(lobbies)
+        puuids = np.full((n, 10), "", dtype="U78")
+        champions = np.zeros((n, 10), dtype=np.int64)
+        for i, lobby in enumerate(lobbies):
+            if len(lobby["puuids"]) != 10:
+                raise ValueError(f"Lobby {i} has {len(lobby['puuids'])} players, expected 10")
+            puuids[i] = [p or "" for p in lobby["puuids"]]
+            if lobby.get("champions"):
+                champions[i] = lobby["champions"]
+
+        players = self.cache.get_many([p for p in np.unique(puuids) if p], now_ms)
+        history = (
+            np.concatenate([np.full(len(p.game_start), puuid, dtype="U78") for puuid, p in players.items()]
+                           or [np.empty(0, dtype="U78")]),
+            np.concatenate([p.game_start for p in players.values()] or [np.empty(0, np.int64)]),
+            np.concatenate([p.wins for p in players.values()] or [np.empty(0, np.int8)]),
+        )
+        ranks = {puuid: (p.rank, p.league_points) for puuid, p in players.items()}
+        numeric = compute_numeric(puuids, np.full(n, now_ms, dtype=np.int64), history, ranks)
+        X = assemble_vector(
+            champions, numeric,
+            [lobby.get("region", "") for lobby in lobbies],
+            [lobby.get("patch", "unknown") for lobby in lobbies],
+        )
+        probabilities = self.model.predict_proba(X)[:, 1].tolist()
+
+        elapsed = time.perf_counter() - start
+        metrics.observe("prediction_request_seconds", elapsed)
+        with self._latency_lock:
+            self._latencies.append(elapsed)
+            self.lobbies_scored += n
+        return probabilities
+
+    def stats(self) -> Dict:
+        with self._latency_lock:
+            latencies = np.array(self._latencies) * 1000
+            scored = self.lobbies_scored
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "model_version": self.model_metadata["version"],
+            "requests": len(latencies),
+            "lobbies_scored": scored,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "cached_players": len(self.cache),
+            "cache_hit_rate": self.cache.hits / lookups if lookups else None,
+            "watermark": self.cache.watermark,
+        }
+
+    def start_background_refresh(self, interval: float = 30, snapshot_every: float = 600) -> threading.Thread:
+        """Refresh the cache (and reload newer models) every `interval` seconds on a daemon thread."""
+        def loop():
+            last_snapshot = time.monotonic()
+            while True:
+                time.sleep(interval)
+                try:
+                    applied = self.cache.refresh()
+                    self.reload_model()
+                    if applied:
+                        logging.info(f"Player cache: {applied} new games applied")
+                    if self.snapshot_path and time.monotonic() - last_snapshot >= snapshot_every:
+                        self.cache.save_snapshot(self.snapshot_path)
+                        last_snapshot = time.monotonic()
+                except Exception as e:
+                    logging.error(f"Player cache refresh failed: {str(e)}")
+
+        thread = threading.Thread(target=loop, name="prediction-refresh", daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    service: PredictionService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data) -> None:
+        self._send(status, json.dumps(data).encode())
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.service.stats())
+        elif self.path == "/metrics":
+            self._send(200, metrics.to_prometheus().encode(), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            lobbies = request["lobbies"] if isinstance(request, dict) else request
+            probabilities = self.service.predict(lobbies)
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(200, {
+            "model_version": self.service.model_metadata["version"],
+            "blue_win_probability": probabilities,
+        })
+
+
+def serve(service: PredictionService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """Create the HTTP server for `service`; call serve_forever() on the result."""
+    handler = type("PredictionHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
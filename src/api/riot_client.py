@@ -1,123 +1,425 @@
 import os
 import time
+import random
+import asyncio
+import threading
+from collections import deque
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from utils.metrics import metrics
 
 logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
+# Development key limits, used until the API tells us the real ones
+DEFAULT_APP_LIMITS = [(20, 1), (100, 120)]
+
+# URL template for every request; {host} is the platform or routing host
+DEFAULT_BASE_URL = "https://{host}.api.riotgames.com"
+
+
+def api_base_url() -> str:
+    """Base URL template, overridable with RIOT_API_BASE_URL (e.g. a local stand-in server)."""
+    return os.getenv("RIOT_API_BASE_URL") or DEFAULT_BASE_URL
+
+
+def parse_rate_limit_header(value: Optional[str]) -> List[Tuple[int, int]]:
+    """Parse a Riot rate limit header like '20:1,100:120' into (count, seconds) pairs."""
+    if not value:
+        return []
+    pairs = []
+    for part in value.split(","):
+        try:
+            count, seconds = part.strip().split(":")
+            pairs.append((int(count), int(seconds)))
+        except ValueError:
+            logging.warning(f"Ignoring malformed rate limit entry: {part!r}")
+    return pairs
+
+
+class RateWindow:
+    """Sliding log of request times for a single `limit` per `seconds` window."""
+
+    def __init__(self, limit: int, seconds: int, margin: float = 0.1):
+        self.limit = limit
+        self.seconds = seconds
+        # Requests are counted by Riot when they arrive, not when we send them
+        self.span = seconds + margin
+        self.timestamps = deque()
+
+    def _prune(self, now: float) -> None:
+        while self.timestamps and self.timestamps[0] <= now - self.span:
+            self.timestamps.popleft()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until this window has room for one more request."""
+        self._prune(now)
+        if len(self.timestamps) < self.limit:
+            return 0.0
+        return self.timestamps[len(self.timestamps) - self.limit] + self.span - now
+
+    def sync_count(self, count: int, now: float) -> None:
+        """Account for requests the server has seen that we have not (e.g. other processes)."""
+        self._prune(now)
+        for _ in range(count - len(self.timestamps)):
+            self.timestamps.append(now)
+
+
+class RateLimiter:
+    """Multi-window rate limiter keyed by routing host (app limits) and by host+method.
+
+    Limits start from DEFAULT_APP_LIMITS and are replaced by whatever the
+    X-App-Rate-Limit / X-Method-Rate-Limit headers report, so callers only
+    wait when one of the real windows is actually full.
+    """
+
+    def __init__(self, default_app_limits: List[Tuple[int, int]] = None):
+        self.default_app_limits = default_app_limits or DEFAULT_APP_LIMITS
+        self._lock = threading.Lock()
+        self._app_windows: Dict[str, List[RateWindow]] = {}
+        self._method_windows: Dict[Tuple[str, str], List[RateWindow]] = {}
+        self._blocked_until: Dict[object, float] = {}
+
+    def _windows_for(self, host: str, method: str) -> List[RateWindow]:
+        if host not in self._app_windows:
+            self._app_windows[host] = [RateWindow(limit, seconds) for limit, seconds in self.default_app_limits]
+        return self._app_windows[host] + self._method_windows.get((host, method), [])
+
+    def reserve(self, host: str, method: str) -> float:
+        """Take a request slot if one is free, otherwise return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._blocked_until.get(host, 0.0) - now,
+                self._blocked_until.get((host, method), 0.0) - now,
+                0.0,
+            )
+            windows = self._windows_for(host, method)
+            for window in windows:
+                wait = max(wait, window.wait_time(now))
+            if wait > 0:
+                return wait
+            for window in windows:
+                window.timestamps.append(now)
+            return 0.0
+
+    def acquire(self, host: str, method: str) -> None:
+        """Block until a request to `host` for `method` is allowed."""
+        while True:
+            wait = self.reserve(host, method)
+            if wait <= 0:
+                return
+            metrics.inc("riot_api_rate_limit_wait_seconds_total", wait, host=host)
+            time.sleep(wait)
+
+    @staticmethod
+    def _rebuild(current: List[RateWindow], limits: List[Tuple[int, int]]) -> List[RateWindow]:
+        by_seconds = {window.seconds: window for window in current}
+        windows = []
+        for limit, seconds in limits:
+            window = by_seconds.get(seconds) or RateWindow(limit, seconds)
+            window.limit = limit
+            windows.append(window)
+        return windows
+
+    def update_from_headers(self, host: str, method: str, headers) -> None:
+        """Adopt the limits and counts reported in a response's rate limit headers."""
+        app_limits = parse_rate_limit_header(headers.get("X-App-Rate-Limit"))
+        app_counts = dict((s, c) for c, s in parse_rate_limit_header(headers.get("X-App-Rate-Limit-Count")))
+        method_limits = parse_rate_limit_header(headers.get("X-Method-Rate-Limit"))
+        method_counts = dict((s, c) for c, s in parse_rate_limit_header(headers.get("X-Method-Rate-Limit-Count")))
+
+        with self._lock:
+            now = time.monotonic()
+            if app_limits:
+                self._app_windows[host] = self._rebuild(self._app_windows.get(host, []), app_limits)
+            if method_limits:
+                key = (host, method)
+                self._method_windows[key] = self._rebuild(self._method_windows.get(key, []), method_limits)
+
+            for window in self._app_windows.get(host, []):
+                if window.seconds in app_counts:
+                    window.sync_count(app_counts[window.seconds], now)
+            for window in self._method_windows.get((host, method), []):
+                if window.seconds in method_counts:
+                    window.sync_count(method_counts[window.seconds], now)
+
+    def penalize(self, host: str, method: str, retry_after: float, limit_type: Optional[str] = None) -> None:
+        """Hold back the bucket a 429 was issued for until Retry-After has passed."""
+        key = (host, method) if limit_type in ("method", "service") else host
+        with self._lock:
+            until = time.monotonic() + retry_after
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), until)
+
+    async def acquire_async(self, host: str, method: str) -> None:
+        """asyncio variant of acquire() that yields to the event loop while waiting."""
+        while True:
+            wait = self.reserve(host, method)
+            if wait <= 0:
+                return
+            metrics.inc("riot_api_rate_limit_wait_seconds_total", wait, host=host)
+            await asyncio.sleep(wait)
+
+
+# Shared by every client in the process so all fetchers draw from one budget
+shared_rate_limiter = RateLimiter()
+
+# Platform hosts and the regional routing cluster that serves their match-v5 data
+REGION_ROUTING = {
+    'euw1': 'europe',
+    'eun1': 'europe',
+    'kr': 'asia',
+    'na1': 'americas'
+}
+
+
+def get_region_routing(region: str) -> str:
+    """Convert platform routing to region routing."""
+    return REGION_ROUTING.get(region, 'europe')
+
+
+def record_response(host: str, method: str, status, seconds: float) -> None:
+    """Count one response (or "timeout") and its latency for the endpoint and host."""
+    metrics.observe("riot_api_request_seconds", seconds, endpoint=method, host=host)
+    metrics.inc("riot_api_responses_total", endpoint=method, host=host, status=status)
+
+
+def league_entry_to_summoner(entry: Dict, rank_label: str, region: str, queue: str = "RANKED_SOLO_5x5") -> Dict:
+    """Map a league-v4 entry of `queue` to a Summoners row.
+
+    Entries carry the PUUID and standing directly, so no summoner-v4 call
+    is needed. Entries without a summonerId are keyed by PUUID instead.
+    """
+    return {
+        "summonerID": entry.get("summonerId") or entry.get("puuid"),
+        "rank": rank_label,
+        "region": region,
+        "queue": queue,
+        "puuid": entry.get("puuid"),
+        "league_points": entry.get("leaguePoints"),
+        "wins": entry.get("wins"),
+        "losses": entry.get("losses")
+    }
+
+
+class RetryPolicy:
+    """Bounded retry policy with full-jitter exponential backoff."""
+
+    def __init__(self, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, default_retry_after: int = 1):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_retry_after = default_retry_after
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based) after a 5xx or timeout."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def retry_after(self, headers) -> float:
+        """Delay requested by a 429's Retry-After header."""
+        try:
+            return float(headers.get("Retry-After", self.default_retry_after))
+        except (TypeError, ValueError):
+            return float(self.default_retry_after)
+
+
 class RiotClient:
-    def __init__(self):
+    def __init__(self, rate_limiter: RateLimiter = None, retry_policy: RetryPolicy = None,
+                 pool_maxsize: int = 10, timeout: float = 10, base_url: str = None):
         self.api_key = os.getenv('RIOT_API_KEY')
         if not self.api_key:
             raise ValueError("RIOT_API_KEY not found in environment variables")
         
         self.headers = {"X-Riot-Token": self.api_key}
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self.base_url = base_url or api_base_url()
         self.regions = ["euw1", "eun1", "kr", "na1"]
         self.ranks = [
             ("challenger", "Challenger"),
             ("grandmaster", "Grandmaster"),
         ]
+        self.queues = ["RANKED_SOLO_5x5"]
+
+        # Keep-alive session with one bounded connection pool per host
+        self.adapter = HTTPAdapter(
+            pool_connections=len(set(self.regions) | set(REGION_ROUTING.values())),
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=0,
+        )
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        # Shared by every thread using this client
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "server_errors": 0, "timeouts": 0}
+        self._stats_lock = threading.Lock()
+        self._thread_stats = threading.local()
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            self.stats[counter] += 1
+        if counter == "requests":
+            self._thread_stats.requests = self.thread_requests() + 1
+
+    def thread_requests(self) -> int:
+        """Requests sent so far by the calling thread."""
+        return getattr(self._thread_stats, "requests", 0)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Request counters plus how many connections were opened and reused."""
+        opened = 0
+        served = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                served += pool.num_requests
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "connections_opened": opened,
+            "connections_reused": max(0, served - opened),
+        }
+
+    def _get(self, host: str, method: str, path: str, params: Dict = None) -> requests.Response:
+        """Rate-limited GET against `{base_url}{path}`, by default `https://{host}.api.riotgames.com{path}`.
+
+        Retries 429s after Retry-After and 5xx/timeouts with jittered
+        backoff, up to retry_policy.max_retries. The last failed response is
+        returned (or the last network error raised) once retries run out.
+        """
+        url = self.base_url.format(host=host) + path
+        policy = self.retry_policy
+
+        for attempt in range(policy.max_retries + 1):
+            if attempt > 0:
+                self._count("retries")
+            last_attempt = attempt == policy.max_retries
+
+            self.rate_limiter.acquire(host, method)
+            self._count("requests")
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                self._count("timeouts")
+                record_response(host, method, "timeout", time.perf_counter() - start)
+                if last_attempt:
+                    raise
+                delay = policy.backoff(attempt)
+                metrics.inc("riot_api_backoff_seconds_total", delay, host=host)
+                logging.warning(f"Request to {host} failed ({e.__class__.__name__}). Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+                continue
+
+            record_response(host, method, response.status_code, time.perf_counter() - start)
+            self.rate_limiter.update_from_headers(host, method, response.headers)
+
+            if response.status_code == 429:  # Rate limit exceeded
+                self._count("rate_limited")
+                retry_after = policy.retry_after(response.headers)
+                limit_type = response.headers.get("X-Rate-Limit-Type")
+                self.rate_limiter.penalize(host, method, retry_after, limit_type)
+                if last_attempt:
+                    return response
+                logging.warning(f"Rate limit exceeded ({limit_type or 'unknown'}) on {host}. Retrying after {retry_after:.0f} seconds...")
+                continue
+
+            if response.status_code >= 500:
+                self._count("server_errors")
+                if last_attempt:
+                    return response
+                delay = policy.backoff(attempt)
+                metrics.inc("riot_api_backoff_seconds_total", delay, host=host)
+                logging.warning(f"Server error {response.status_code} from {host}. Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+                continue
+
+            return response
 
     def fetch_top_summoners(self):
-        """Fetch top-ranked summoners from all regions."""
+        """Fetch top-ranked summoners from all regions and queues."""
         summoners = []
-        base_url = "https://{region}.api.riotgames.com/lol/league/v4/{rank}leagues/by-queue/RANKED_SOLO_5x5"
 
         for region in self.regions:
-            for api_rank, rank_label in self.ranks:
-                url = base_url.format(region=region, rank=api_rank)
-                
-                try:
-                    response = requests.get(url, headers=self.headers)
-
-                    if response.status_code == 429:  # Rate limit exceeded
-                        retry_after = int(response.headers.get("Retry-After", 60))
-                        logging.warning(f"Rate limit exceeded. Retrying after {retry_after} seconds...")
-                        time.sleep(retry_after)
-                        continue
+            for queue in self.queues:
+                for api_rank, rank_label in self.ranks:
+                    path = f"/lol/league/v4/{api_rank}leagues/by-queue/{queue}"
 
-                    if response.status_code != 200:
-                        logging.error(f"Failed to fetch {rank_label} summoners for {region}: {response.text}")
-                        continue
+                    try:
+                        response = self._get(region, f"league-v4.{api_rank}", path)
 
-                    league_data = response.json()
-                    if "entries" not in league_data:
-                        logging.error(f"Unexpected API response format: {league_data}")
-                        continue
+                        if response.status_code != 200:
+                            logging.error(f"Failed to fetch {rank_label} {queue} summoners for {region}: {response.text}")
+                            continue
 
-                    for entry in league_data["entries"]:
-                        summoners.append({
-                            "summonerID": entry["summonerId"],
-                            "rank": rank_label,
-                            "region": region
-                        })
+                        league_data = response.json()
+                        if "entries" not in league_data:
+                            logging.error(f"Unexpected API response format: {league_data}")
+                            continue
 
-                except Exception as e:
-                    logging.error(f"Error fetching data for {region} {rank_label}: {str(e)}")
-                    continue
+                        for entry in league_data["entries"]:
+                            summoners.append(league_entry_to_summoner(entry, rank_label, region, queue))
+
+                    except Exception as e:
+                        logging.error(f"Error fetching data for {region} {queue} {rank_label}: {str(e)}")
+                        continue
 
         return summoners 
 
     def get_summoner_by_id(self, summoner_id: str, region: str) -> dict:
         """Fetch summoner data by summoner ID."""
-        url = f"https://{region}.api.riotgames.com/lol/summoner/v4/summoners/{summoner_id}"
-        response = requests.get(url, headers=self.headers)
-        
-        if response.status_code == 429:  # Rate limit exceeded
-            retry_after = int(response.headers.get("Retry-After", 60))
-            logging.warning(f"Rate limit exceeded. Retrying after {retry_after} seconds...")
-            time.sleep(retry_after)
-            return self.get_summoner_by_id(summoner_id, region)  # Retry the request
-        
+        response = self._get(region, "summoner-v4.by-id", f"/lol/summoner/v4/summoners/{summoner_id}")
         response.raise_for_status()
         return response.json() 
 
-    def get_matches_by_puuid(self, puuid: str, region: str, start_time: int = None) -> List[str]:
-        """Fetch match IDs for a summoner."""
+    def get_matches_by_puuid(self, puuid: str, region: str, start_time: int = None,
+                            start: int = 0, count: int = 100) -> List[str]:
+        """Fetch one page of match IDs for a summoner, newest first."""
         region_routing = self._get_region_routing(region)
-        url = f"https://{region_routing}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
-        
         params = {
             "startTime": start_time,
             "queue": 420,  # Ranked Solo/Duo games only
-            "count": 100   # Maximum allowed
+            "start": start,
+            "count": count  # At most 100
         }
         
-        response = requests.get(url, headers=self.headers, params=params)
-        if response.status_code == 429:  # Rate limit exceeded
-            retry_after = int(response.headers.get("Retry-After", 60))
-            logging.warning(f"Rate limit exceeded. Retrying after {retry_after} seconds...")
-            time.sleep(retry_after)
-            return self.get_matches_by_puuid(puuid, region, start_time)
-        
+        response = self._get(
+            region_routing, "match-v5.ids-by-puuid",
+            f"/lol/match/v5/matches/by-puuid/{puuid}/ids", params=params
+        )
         response.raise_for_status()
         return response.json()
 
     def _get_region_routing(self, region: str) -> str:
         """Convert platform routing to region routing."""
-        routing_map = {
-            'euw1': 'europe',
-            'eun1': 'europe',
-            'kr': 'asia',
-            'na1': 'americas'
-        }
-        return routing_map.get(region, 'europe') 
+        return get_region_routing(region)
 
     def get_match_metadata(self, match_id: str, region: str) -> Dict:
         """Fetch basic match data."""
         region_routing = self._get_region_routing(region)
-        url = f"https://{region_routing}.api.riotgames.com/lol/match/v5/matches/{match_id}"
-        
-        response = requests.get(url, headers=self.headers)
-        if response.status_code == 429:  # Rate limit exceeded
-            retry_after = int(response.headers.get("Retry-After", 60))
-            logging.warning(f"Rate limit exceeded. Retrying after {retry_after} seconds...")
-            time.sleep(retry_after)
-            return self.get_match_metadata(match_id, region)
-        
+        response = self._get(region_routing, "match-v5.match", f"/lol/match/v5/matches/{match_id}")
         response.raise_for_status()
-        return response.json()
\ No newline at end of file
+        return response.json()
+
+    def get_match_timeline(self, match_id: str, region: str) -> Dict:
+        """Fetch the per-minute frames and events of a match."""
+        region_routing = self._get_region_routing(region)
+        response = self._get(region_routing, "match-v5.timeline", f"/lol/match/v5/matches/{match_id}/timeline")
+        response.raise_for_status()
+        return response.json()
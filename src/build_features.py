@@ -0,0 +1,22 @@
+import argparse
+from database.db_manager import DatabaseManager
+from data_processing.features import FeatureBuilder
+from utils.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build model features for matches stored since the last run.")
+    parser.add_argument("--root", default="features", help="Output directory for the feature parts")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Matches per part")
+    parser.add_argument("--rebuild", action="store_true", help="Delete all parts and rebuild from the first match")
+    parser.add_argument("--columnar-root", default="columnar", help="Columnar export to read player history from")
+    args = parser.parse_args()
+
+    builder = FeatureBuilder(DatabaseManager(), args.root, args.workers, args.chunk_size, args.columnar_root)
+    builder.build(rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    setup_logging("build_features")
+    main()
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Per-table export definition: the query (must select rowid first, then
+# region and game_version for partitioning) and the dtype of each column.
+# The rowid is stored too, so readers can pick up where SQLite-based
+# watermarks left off.
+TABLES = {
+    "MatchMetadata": {
+        "query": """
+            SELECT mm.rowid, COALESCE(m.region, 'unknown'), mm.game_version,
+                   mm.match_id, mm.game_duration, mm.queue_id, mm.winner_team_id,
+                   mm.early_surrender, mm.game_start_timestamp
+            FROM MatchMetadata mm
+            LEFT JOIN MatchIDs m ON m.match_id = mm.match_id
+            WHERE mm.rowid > ?
+            ORDER BY mm.rowid
+            LIMIT ?
+        """,
+        "columns": {
+            "rowid": "<i8",
+            "match_id": "S24",
+            "game_duration": "<i4",
+            "queue_id": "<i4",
+            "winner_team_id": "<i2",
+            "early_surrender": "i1",
+            "game_start_timestamp": "<i8",
+        },
+    },
+    "MatchParticipants": {
+        "query": """
+            SELECT mp.rowid, COALESCE(m.region, 'unknown'), mm.game_version,
+                   mp.match_id, mp.participant_id, mp.puuid, mp.champion_id, mp.team_id,
+                   mp.team_position, mp.win, mp.kills, mp.deaths, mp.assists,
+                   mp.gold_earned, mp.total_damage_dealt_to_champions, mp.game_start_timestamp
+            FROM MatchParticipants mp
+            LEFT JOIN MatchMetadata mm ON mm.match_id = mp.match_id
+            LEFT JOIN MatchIDs m ON m.match_id = mp.match_id
+            WHERE mp.rowid > ?
+            ORDER BY mp.rowid
+            LIMIT ?
+        """,
+        "columns": {
+            "rowid": "<i8",
+            "match_id": "S24",
+            "participant_id": "i1",
+            "puuid": "S78",
+            "champion_id": "<i2",
+            "team_id": "<i2",
+            "team_position": "S8",
+            "win": "i1",
+            "kills": "<i2",
+            "deaths": "<i2",
+            "assists": "<i2",
+            "gold_earned": "<i4",
+            "total_damage_dealt_to_champions": "<i4",
+            "game_start_timestamp": "<i8",
+        },
+    },
+}
+
+
+def patch_of(game_version: Optional[str]) -> str:
+    """'14.2.555.1234' -> '14.2'."""
+    if not game_version:
+        return "unknown"
+    return ".".join(game_version.split(".")[:2])
+
+
+class ColumnarStore:
+    """Append-only column files partitioned by region and patch.
+
+    Layout: {root}/{table}/region={r}/patch={p}/{column}.bin, one raw
+    fixed-dtype array per column, plus {root}/{table}/manifest.json with
+    the row count of each partition and the last exported rowid. Readers
+    trust only the manifest counts, so a crash between appending and
+    updating the manifest leaves the store consistent; the next export
+    truncates the unaccounted tail before appending.
+    """
+
+    def __init__(self, root="columnar"):
+        self.root = Path(root)
+
+    def _manifest_path(self, table: str) -> Path:
+        return self.root / table / "manifest.json"
+
+    def manifest(self, table: str) -> Dict:
+        path = self._manifest_path(table)
+        if not path.exists():
+            return {"columns": TABLES[table]["columns"], "last_rowid": 0, "partitions": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_manifest(self, table: str, manifest: Dict) -> None:
+        path = self._manifest_path(table)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _partition_key(region: str, patch: str) -> str:
+        return f"region={region}/patch={patch}"
+
+    def _append(self, table: str, key: str, rows: List[Tuple], manifest: Dict) -> None:
+        # Row tuples follow the query's column order, not the manifest's
+        columns = TABLES[table]["columns"]
+        directory = self.root / table / key
+        directory.mkdir(parents=True, exist_ok=True)
+        existing = manifest["partitions"].get(key, 0)
+
+        for index, (column, dtype) in enumerate(columns.items()):
+            values = [row[index] for row in rows]
+            if dtype.startswith("S"):
+                array = np.array([(v or "").encode("utf-8") for v in values], dtype=dtype)
+            else:
+                array = np.array([0 if v is None else v for v in values], dtype=dtype)
+
+            path = directory / f"{column}.bin"
+            mode = "r+b" if path.exists() else "wb"
+            with open(path, mode) as f:
+                f.truncate(existing * array.dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(array.tobytes())
+
+        manifest["partitions"][key] = existing + len(rows)
+
+    def export(self, conn, table: str, chunk_size: int = 100_000) -> int:
+        """Append rows added to `table` since the last export; returns the count."""
+        manifest = self.manifest(table)
+        if manifest["columns"] != TABLES[table]["columns"]:
+            raise ValueError(f"{self.root / table} uses a different column layout; delete it and export again")
+        query = TABLES[table]["query"]
+        exported = 0
+
+        while True:
+            rows = conn.execute(query, (manifest["last_rowid"], chunk_size)).fetchall()
+            if not rows:
+                break
+
+            partitions = defaultdict(list)
+            for row in rows:
+                partitions[self._partition_key(row[1], patch_of(row[2]))].append((row[0], *row[3:]))
+            for key, partition_rows in partitions.items():
+                self._append(table, key, partition_rows, manifest)
+
+            manifest["last_rowid"] = rows[-1][0]
+            self._save_manifest(table, manifest)
+            exported += len(rows)
+            logging.info(f"Exported {exported} {table} rows")
+
+        return exported
+
+    def partitions(self, table: str, regions: List[str] = None, patches: List[str] = None) -> List[Tuple[str, str, int]]:
+        """(region, patch, rows) for each partition matching the filters."""
+        result = []
+        for key, count in self.manifest(table)["partitions"].items():
+            region, patch = (part.split("=", 1)[1] for part in key.split("/"))
+            if regions and region not in regions:
+                continue
+            if patches and patch not in patches:
+                continue
+            result.append((region, patch, count))
+        return sorted(result)
+
+    def iter_partitions(self, table: str, columns: List[str], regions: List[str] = None,
+                        patches: List[str] = None, after_rowid: int = 0
+                        ) -> Iterator[Tuple[str, str, Dict[str, np.ndarray]]]:
+        """Yield (region, patch, {column: memmap}) without reading any data up front.
+
+        Rows are appended in rowid order, so `after_rowid` just trims the
+        head of each partition.
+        """
+        dtypes = self.manifest(table)["columns"]
+        for region, patch, count in self.partitions(table, regions, patches):
+            if count == 0:
+                continue
+            directory = self.root / table / self._partition_key(region, patch)
+            start = 0
+            if after_rowid:
+                rowids = np.memmap(directory / "rowid.bin", dtype=dtypes["rowid"], mode="r", shape=(count,))
+                start = int(np.searchsorted(rowids, after_rowid, side="right"))
+                if start == count:
+                    continue
+            yield region, patch, {
+                column: np.memmap(directory / f"{column}.bin", dtype=dtypes[column], mode="r", shape=(count,))[start:]
+                for column in columns
+            }
+
+    def read(self, table: str, columns: List[str], regions: List[str] = None,
+             patches: List[str] = None, after_rowid: int = 0) -> Dict[str, np.ndarray]:
+        """Concatenate the requested columns across matching partitions."""
+        dtypes = self.manifest(table)["columns"]
+        chunks = defaultdict(list)
+        for _, _, arrays in self.iter_partitions(table, columns, regions, patches, after_rowid):
+            for column, array in arrays.items():
+                chunks[column].append(array)
+        return {
+            column: np.concatenate(chunks[column]) if chunks[column] else np.empty(0, dtype=dtypes[column])
+            for column in columns
+        }
+
+    def has_table(self, table: str) -> bool:
+        return self._manifest_path(table).exists()
+
+    def exported_rowid(self, table: str) -> int:
+        """Last rowid exported for `table`; 0 if there is no export (or one without the rowid column)."""
+        if not self.has_table(table):
+            return 0
+        manifest = self.manifest(table)
+        return manifest["last_rowid"] if "rowid" in manifest["columns"] else 0
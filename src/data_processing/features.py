@@ -0,0 +1,338 @@
+"""Model-ready match features, built in parallel and incrementally.
+
+Every MatchMetadata row becomes one fixed-width example: the ten
+champions, each player's recent win rate and games played before the
+match, the rank mix of each team, region and patch, labelled with
+whether the blue side won.
+
+FeatureBuilder splits the MatchMetadata rowids past the JobState
+watermark into chunks and builds them on a process pool. A worker reads
+its chunk, the participants, their match history inside the
+RECENT_DAYS window and their ladder entries with a handful of queries,
+then computes every feature with vectorized NumPy and writes one
+compressed part file. History already exported to the columnar store is
+scanned from its memory-mapped MatchParticipants columns; SQLite only
+serves the participants exported after it.
+
+    {root}/part-{first rowid}-{last rowid}.npz
+
+Parts are written atomically and the watermark only moves past a chunk
+once its part exists, so an interrupted build resumes where it stopped.
+Parts store the compact per-match arrays; assemble_vector turns them into
+the model's input matrix, for training and for online scoring alike.
+"""
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from data_processing.columnar_store import ColumnarStore, patch_of
+
+STAGE = "features"
+
+RECENT_DAYS = 30
+RECENT_WINDOW_MS = RECENT_DAYS * 86_400_000
+
+# Champion ids are < 1000; any larger id wraps around
+CHAMPION_DIM = 1000
+REGIONS = ["euw1", "eun1", "kr", "na1"]
+PATCH_BUCKETS = 32
+RANKS = ["Challenger", "Grandmaster"]
+
+NUMERIC_FEATURES = (
+    [f"p{slot}_win_rate" for slot in range(10)]
+    + [f"p{slot}_log_games" for slot in range(10)]
+    + ["blue_win_rate", "red_win_rate", "blue_log_games", "red_log_games"]
+    + [f"{side}_{rank.lower()}" for side in ("blue", "red") for rank in RANKS]
+    + ["blue_unranked", "red_unranked", "blue_lp", "red_lp"]
+)
+
+# Each part holds these arrays, one row per match
+PART_ARRAYS = ("match_id", "region", "patch", "game_start", "label", "champions", "numeric")
+
+
+def feature_names() -> List[str]:
+    """Column names of assemble_vector's output."""
+    return (
+        [f"champion_{i}" for i in range(CHAMPION_DIM)]
+        + NUMERIC_FEATURES
+        + [f"region_{region}" for region in REGIONS] + ["region_other"]
+        + [f"patch_bucket_{i}" for i in range(PATCH_BUCKETS)]
+    )
+
+
+def _patch_bucket(patch: str) -> int:
+    return zlib.crc32(patch.encode()) % PATCH_BUCKETS
+
+
+def assemble_vector(champions: np.ndarray, numeric: np.ndarray, regions: Sequence[str],
+                    patches: Sequence[str]) -> np.ndarray:
+    """Build the model matrix from part arrays (or the same arrays for live matches).
+
+    champions is (n, 10) with blue side in slots 0-4; they become a signed
+    multi-hot block (+1 blue, -1 red). numeric is (n, len(NUMERIC_FEATURES)).
+    Region is one-hot and patch is hashed into PATCH_BUCKETS.
+    """
+    champions = np.asarray(champions, dtype=np.int64)
+    n = len(champions)
+    numeric_start = CHAMPION_DIM
+    region_start = numeric_start + len(NUMERIC_FEATURES)
+    patch_start = region_start + len(REGIONS) + 1
+    X = np.zeros((n, patch_start + PATCH_BUCKETS), dtype=np.float32)
+
+    rows = np.repeat(np.arange(n), 10)
+    ids = champions.reshape(-1)
+    signs = np.tile(np.array([1] * 5 + [-1] * 5, dtype=np.float32), n)
+    present = ids > 0  # 0 pads missing participants
+    np.add.at(X, (rows[present], ids[present] % CHAMPION_DIM), signs[present])
+
+    X[:, numeric_start:region_start] = numeric
+    region_index = {region: i for i, region in enumerate(REGIONS)}
+    X[np.arange(n), [region_start + region_index.get(_text(r), len(REGIONS)) for r in regions]] = 1
+    X[np.arange(n), [patch_start + _patch_bucket(_text(p)) for p in patches]] = 1
+    return X
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def compute_numeric(puuids: np.ndarray, game_start: np.ndarray, history: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                    ranks: Dict[str, Tuple[str, int]]) -> np.ndarray:
+    """Numeric features for (n, 10) participant PUUIDs ('' where missing).
+
+    history is (puuid, game_start_timestamp, win) arrays of earlier games;
+    only games in the RECENT_DAYS before each match count, and never the
+    match itself. ranks maps a PUUID to its (rank, league_points).
+    """
+    n = len(puuids)
+    vocab, player = np.unique(puuids.reshape(-1), return_inverse=True)
+    player = player.reshape(n, 10)
+    missing = puuids == ""
+
+    # One sorted key per history row: player in the high bits, time in the low 42
+    hist_puuid, hist_ts, hist_win = history
+    hist_player = np.searchsorted(vocab, hist_puuid)
+    known = (hist_player < len(vocab)) & (vocab[np.minimum(hist_player, len(vocab) - 1)] == hist_puuid)
+    keys = (hist_player[known].astype(np.int64) << 42) | hist_ts[known].astype(np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    cum_wins = np.concatenate([[0], np.cumsum(hist_win[known][order].astype(np.int64))])
+
+    base = player.astype(np.int64) << 42
+    ts = np.repeat(game_start.astype(np.int64)[:, None], 10, axis=1)
+    hi = np.searchsorted(keys, base | ts, side="left")
+    lo = np.searchsorted(keys, base | np.maximum(ts - RECENT_WINDOW_MS, 0), side="left")
+    games = np.where(missing, 0, hi - lo)
+    wins = np.where(missing, 0, cum_wins[hi] - cum_wins[lo])
+
+    win_rate = (wins + 1) / (games + 2)  # Laplace-smoothed, 0.5 with no history
+    log_games = np.log1p(games)
+
+    rank_of = np.array([ranks.get(p, ("", 0))[0] for p in vocab], dtype=object)[player]
+    lp = np.array([ranks.get(p, ("", 0))[1] or 0 for p in vocab], dtype=np.float64)[player] / 1000
+
+    columns = [win_rate, log_games]
+    team_means = []
+    for values in (win_rate, log_games):
+        team_means += [values[:, :5].mean(axis=1), values[:, 5:].mean(axis=1)]
+    rank_counts = [
+        (rank_of[:, side] == rank).sum(axis=1)
+        for side in (slice(0, 5), slice(5, 10)) for rank in RANKS
+    ]
+    unranked = [(~np.isin(rank_of[:, side], RANKS)).sum(axis=1) for side in (slice(0, 5), slice(5, 10))]
+    lp_means = [lp[:, :5].mean(axis=1), lp[:, 5:].mean(axis=1)]
+
+    return np.column_stack(columns + team_means + rank_counts + unranked + lp_means).astype(np.float32)
+
+
+def load_player_data(conn, puuids: Sequence[str], since: int, until: int, max_rowid: int = None,
+                     after_rowid: int = 0
+                     ) -> Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray], Dict[str, Tuple[str, int]]]:
+    """History and ladder entries of `puuids` in the shape compute_numeric expects.
+
+    History covers games with since <= game_start_timestamp < until and
+    MatchParticipants rowids after `after_rowid` and, if given, up to
+    `max_rowid`.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS feature_players (puuid TEXT PRIMARY KEY) WITHOUT ROWID")
+    conn.execute("DELETE FROM feature_players")
+    conn.executemany("INSERT OR IGNORE INTO feature_players VALUES (?)", ((p,) for p in puuids if p))
+    history = conn.execute("""
+        SELECT mp.puuid, mp.game_start_timestamp, mp.win
+        FROM feature_players f
+        JOIN MatchParticipants mp ON mp.puuid = f.puuid
+        WHERE mp.game_start_timestamp >= ? AND mp.game_start_timestamp < ?
+        AND mp.rowid > ? AND mp.rowid <= COALESCE(?, mp.rowid)
+    """, (since, until, after_rowid, max_rowid)).fetchall()
+    ranks = {
+        puuid: (rank, lp) for puuid, rank, lp in conn.execute("""
+            SELECT s.puuid, s.rank, s.league_points
+            FROM feature_players f
+            JOIN Summoners s ON s.puuid = f.puuid
+        """)
+    }
+    history_arrays = (
+        np.array([row[0] for row in history], dtype="U78"),
+        np.array([row[1] for row in history], dtype=np.int64),
+        np.array([row[2] or 0 for row in history], dtype=np.int8),
+    )
+    return history_arrays, ranks
+
+
+def load_exported_history(store: ColumnarStore, puuids: Sequence[str], since: int, until: int,
+                          regions: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """History of `puuids` from the exported MatchParticipants columns, like load_player_data's.
+
+    Only the partitions of `regions` (and of matches without a region) are
+    mapped; the time window is applied before comparing PUUIDs.
+    """
+    wanted = np.unique(np.array([p for p in puuids if p], dtype="S78"))
+    chunks = []
+    for _, _, arrays in store.iter_partitions(
+        "MatchParticipants", ["puuid", "game_start_timestamp", "win"], regions=[*regions, "unknown"]
+    ):
+        timestamps = arrays["game_start_timestamp"]
+        candidates = np.flatnonzero((timestamps >= since) & (timestamps < until))
+        rows = candidates[np.isin(arrays["puuid"][candidates], wanted)]
+        chunks.append((arrays["puuid"][rows].astype("U78"), timestamps[rows].astype(np.int64),
+                       arrays["win"][rows].astype(np.int8)))
+    if not chunks:
+        return np.empty(0, dtype="U78"), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8)
+    return tuple(np.concatenate(column) for column in zip(*chunks))
+
+
+def build_part(db_path: str, root: str, first_rowid: int, last_rowid: int,
+               columnar_root: str = None) -> Tuple[int, int]:
+    """Build and write the part for MatchMetadata rowids in [first_rowid, last_rowid].
+
+    Runs in a worker process with its own read-only connection. Returns
+    (last_rowid, matches written).
+    """
+    store = ColumnarStore(columnar_root) if columnar_root else None
+    exported = store.exported_rowid("MatchParticipants") if store else 0
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        matches = conn.execute("""
+            SELECT mm.match_id, COALESCE(m.region, 'unknown'), mm.game_version,
+                   COALESCE(mm.game_start_timestamp, 0), mm.winner_team_id
+            FROM MatchMetadata mm
+            LEFT JOIN MatchIDs m ON m.match_id = mm.match_id
+            WHERE mm.rowid BETWEEN ? AND ?
+            ORDER BY mm.rowid
+        """, (first_rowid, last_rowid)).fetchall()
+        if not matches:
+            return last_rowid, 0
+
+        index = {row[0]: i for i, row in enumerate(matches)}
+        n = len(matches)
+        champions = np.zeros((n, 10), dtype=np.int16)
+        puuids = np.full((n, 10), "", dtype="U78")
+        for match_id, participant_id, champion_id, puuid in conn.execute("""
+            SELECT mp.match_id, mp.participant_id, mp.champion_id, mp.puuid
+            FROM MatchMetadata mm
+            JOIN MatchParticipants mp ON mp.match_id = mm.match_id
+            WHERE mm.rowid BETWEEN ? AND ?
+        """, (first_rowid, last_rowid)):
+            slot = participant_id - 1  # Riot numbers blue side 1-5, red side 6-10
+            if 0 <= slot < 10:
+                champions[index[match_id], slot] = champion_id or 0
+                puuids[index[match_id], slot] = puuid or ""
+
+        game_start = np.array([row[3] for row in matches], dtype=np.int64)
+        since, until = int(game_start.min()) - RECENT_WINDOW_MS, int(game_start.max())
+        history, ranks = load_player_data(conn, np.unique(puuids), since, until, after_rowid=exported)
+    finally:
+        conn.close()
+    if exported:
+        exported_history = load_exported_history(
+            store, np.unique(puuids), since, until, sorted({row[1] for row in matches})
+        )
+        history = tuple(np.concatenate(pair) for pair in zip(exported_history, history))
+
+    numeric = compute_numeric(puuids, game_start, history, ranks)
+
+    path = Path(root) / f"part-{first_rowid:012d}-{last_rowid:012d}.npz"
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        match_id=np.array([row[0] for row in matches], dtype="S24"),
+        region=np.array([row[1] for row in matches], dtype="S8"),
+        patch=np.array([patch_of(row[2]) for row in matches], dtype="S8"),
+        game_start=game_start,
+        label=np.array([row[4] == 100 for row in matches], dtype=np.int8),
+        champions=champions,
+        numeric=numeric,
+    )
+    os.replace(tmp, path)
+    return last_rowid, n
+
+
+class FeatureBuilder:
+    def __init__(self, db, root="features", workers: int = None, chunk_size: int = 50_000,
+                 columnar_root: str = "columnar"):
+        self.db = db
+        self.root = Path(root)
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.columnar_root = columnar_root
+
+    def build(self, rebuild: bool = False) -> int:
+        """Build parts for matches stored since the last run; returns the number of matches."""
+        conn = self.db.get_connection()
+        if rebuild:
+            for part in self.root.glob("part-*.npz"):
+                part.unlink()
+            self.db.save_job_state(conn, STAGE, 0, status='idle')
+            conn.commit()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        watermark = self.db.get_job_state(STAGE)['last_cursor']
+        max_rowid = conn.execute("SELECT MAX(rowid) FROM MatchMetadata").fetchone()[0] or 0
+        chunks = [
+            (start, min(start + self.chunk_size - 1, max_rowid))
+            for start in range(watermark + 1, max_rowid + 1, self.chunk_size)
+        ]
+        if not chunks:
+            logging.info("Features are up to date")
+            return 0
+
+        logging.info(f"Building features for rowids {watermark + 1}-{max_rowid} in {len(chunks)} chunks "
+                     f"on {self.workers} processes")
+        start_time = time.time()
+        built = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            results = pool.map(
+                build_part,
+                [self.db.db_path] * len(chunks), [str(self.root)] * len(chunks),
+                [first for first, _ in chunks], [last for _, last in chunks],
+                [self.columnar_root] * len(chunks),
+            )
+            # map() yields in chunk order, so the watermark never skips a missing part
+            for last_rowid, count in results:
+                built += count
+                self.db.save_job_state(conn, STAGE, last_rowid, processed=count, status='complete')
+                conn.commit()
+                logging.info(f"Features: {built} matches ({built / (time.time() - start_time):.0f}/s)")
+        return built
+
+
+def iter_parts(root="features") -> Iterator[Dict[str, np.ndarray]]:
+    """Yield each part's arrays, oldest rowids first."""
+    for path in sorted(Path(root).glob("part-*[0-9].npz")):
+        with np.load(path) as part:
+            yield {name: part[name] for name in PART_ARRAYS}
+
+
+def load_features(root="features") -> Dict[str, np.ndarray]:
+    """All parts concatenated into one set of arrays."""
+    parts = list(iter_parts(root))
+    if not parts:
+        return {}
+    return {name: np.concatenate([part[name] for part in parts]) for name in PART_ARRAYS}
@@ -0,0 +1,132 @@
+"""Derived tables built from raw match-v5 payloads.
+
+Every derived table has a writer here taking a cursor and a list of
+(match_id, match_data) pairs. The online fetcher and the offline
+re-derive command both go through DERIVED_TABLES, so adding a table
+means adding one writer and registering it.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+MatchPayloads = List[Tuple[str, Dict]]
+
+
+def parse_match_metadata(match_id: str, match_data: Dict) -> Optional[Tuple]:
+    """Extract the MatchMetadata row from a match-v5 response."""
+    if not match_data or not match_data.get("info"):
+        return None
+    info = match_data["info"]
+    return (
+        match_id,
+        info.get("gameDuration"),
+        info.get("gameVersion"),
+        info.get("queueId"),
+        100 if info.get("teams")[0].get("win") else 200,
+        any(team.get("earlyRendered", False) for team in info.get("teams", [])),
+        info.get("gameStartTimestamp")
+    )
+
+
+def write_match_metadata(cursor, matches: MatchPayloads) -> int:
+    """Upsert MatchMetadata rows; existing rows are refreshed in place."""
+    rows = [row for row in (parse_match_metadata(match_id, data) for match_id, data in matches) if row]
+    cursor.executemany("""
+        INSERT INTO MatchMetadata (
+            match_id,
+            game_duration,
+            game_version,
+            queue_id,
+            winner_team_id,
+            early_surrender,
+            game_start_timestamp
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(match_id) DO UPDATE SET
+            game_duration = excluded.game_duration,
+            game_version = excluded.game_version,
+            queue_id = excluded.queue_id,
+            winner_team_id = excluded.winner_team_id,
+            early_surrender = excluded.early_surrender,
+            game_start_timestamp = excluded.game_start_timestamp
+    """, rows)
+    return len(rows)
+
+
+def parse_match_participants(match_id: str, match_data: Dict) -> List[Tuple]:
+    """Extract one MatchParticipants row per entry in info.participants."""
+    if not match_data or not match_data.get("info"):
+        return []
+    info = match_data["info"]
+    game_start = info.get("gameStartTimestamp")
+    return [
+        (
+            match_id,
+            participant.get("participantId", index + 1),
+            participant.get("puuid"),
+            participant.get("championId"),
+            participant.get("championName"),
+            participant.get("teamId"),
+            participant.get("teamPosition") or participant.get("individualPosition"),
+            participant.get("win"),
+            participant.get("kills"),
+            participant.get("deaths"),
+            participant.get("assists"),
+            participant.get("goldEarned"),
+            participant.get("totalDamageDealtToChampions"),
+            game_start
+        )
+        for index, participant in enumerate(info.get("participants", []))
+        if participant.get("puuid")
+    ]
+
+
+def write_match_participants(cursor, matches: MatchPayloads) -> int:
+    """Upsert MatchParticipants rows for every match in one executemany."""
+    rows = [row for match_id, data in matches for row in parse_match_participants(match_id, data)]
+    cursor.executemany("""
+        INSERT INTO MatchParticipants (
+            match_id,
+            participant_id,
+            puuid,
+            champion_id,
+            champion_name,
+            team_id,
+            team_position,
+            win,
+            kills,
+            deaths,
+            assists,
+            gold_earned,
+            total_damage_dealt_to_champions,
+            game_start_timestamp
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(match_id, participant_id) DO UPDATE SET
+            puuid = excluded.puuid,
+            champion_id = excluded.champion_id,
+            champion_name = excluded.champion_name,
+            team_id = excluded.team_id,
+            team_position = excluded.team_position,
+            win = excluded.win,
+            kills = excluded.kills,
+            deaths = excluded.deaths,
+            assists = excluded.assists,
+            gold_earned = excluded.gold_earned,
+            total_damage_dealt_to_champions = excluded.total_damage_dealt_to_champions,
+            game_start_timestamp = excluded.game_start_timestamp
+    """, rows)
+    return len(rows)
+
+
+DERIVED_TABLES: Dict[str, Callable[[object, MatchPayloads], int]] = {
+    "MatchMetadata": write_match_metadata,
+    "MatchParticipants": write_match_participants,
+}
+
+
+def derive_tables(cursor, matches: MatchPayloads, tables: List[str] = None) -> Dict[str, int]:
+    """Run the registered writers (or just `tables`) over a batch of payloads."""
+    counts = {}
+    for table in tables or DERIVED_TABLES:
+        counts[table] = DERIVED_TABLES[table](cursor, matches)
+        metrics.inc("db_rows_written_total", counts[table], table=table)
+    return counts
@@ -0,0 +1,188 @@
+"""Match-v5 timelines as fixed-dtype frame arrays.
+
+Each match becomes a (minute, participant, stat) block of MAX_MINUTES x
+10 x len(STATS) int32 values: per-minute total gold, XP, CS (lane plus
+jungle minions) and level, with participants in participantId order
+(blue side first). Games shorter than MAX_MINUTES keep their final
+frame for the remaining minutes, and longer games are cut off.
+
+Blocks live in raw chunk files of chunk_matches matches each:
+
+    {root}/layout.json          # dtype, stats, minutes, chunk size
+    {root}/chunk-000000.bin     # (MAX_MINUTES, chunk_matches, 10, len(STATS))
+
+Within a chunk the minute axis comes first, so one minute of every match
+in the chunk is contiguous on disk: reading the 10-minute gold difference
+across a million matches maps 100 slices of a few MB, not the whole
+store. The TimelineIndex table in riot_data.db maps match_id to its slot
+(chunk * chunk_matches + offset) and frame count. Readers trust only the
+index, and a slot's frames are written before its index row is
+committed, so a crash mid-write leaves the store consistent; the next
+append reuses the unindexed slots.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import metrics
+
+STATS = ("total_gold", "xp", "cs", "level")
+MAX_MINUTES = 60
+CHUNK_MATCHES = 10_000
+DTYPE = "<i4"
+
+
+def parse_timeline(timeline: Dict) -> Optional[Tuple[np.ndarray, int]]:
+    """(MAX_MINUTES, 10, len(STATS)) frames and the number of real frames, or None."""
+    frames = ((timeline or {}).get("info") or {}).get("frames")
+    if not frames:
+        return None
+    array = np.zeros((MAX_MINUTES, 10, len(STATS)), dtype=DTYPE)
+    count = min(len(frames), MAX_MINUTES)
+    for minute, frame in enumerate(frames[:count]):
+        for participant_id, values in (frame.get("participantFrames") or {}).items():
+            slot = int(participant_id) - 1
+            if 0 <= slot < 10:
+                array[minute, slot] = (
+                    values.get("totalGold", 0),
+                    values.get("xp", 0),
+                    values.get("minionsKilled", 0) + values.get("jungleMinionsKilled", 0),
+                    values.get("level", 0),
+                )
+    array[count:] = array[count - 1]  # Stats stop changing when the game ends
+    return array, count
+
+
+class TimelineStore:
+    def __init__(self, db, root="timelines", chunk_matches: int = CHUNK_MATCHES):
+        self.db = db
+        self.root = Path(root)
+        self.layout = {
+            "dtype": DTYPE, "stats": list(STATS), "minutes": MAX_MINUTES, "chunk_matches": chunk_matches,
+        }
+        layout_path = self.root / "layout.json"
+        if layout_path.exists():
+            with open(layout_path) as f:
+                stored = json.load(f)
+            if stored != self.layout:
+                raise ValueError(f"{root} uses a different layout {stored}; choose another --root")
+        self.chunk_matches = chunk_matches
+        self._match_bytes = 10 * len(STATS) * np.dtype(DTYPE).itemsize
+
+    def _chunk_path(self, chunk: int) -> Path:
+        return self.root / f"chunk-{chunk:06d}.bin"
+
+    def _chunk_shape(self) -> Tuple[int, int, int, int]:
+        return MAX_MINUTES, self.chunk_matches, 10, len(STATS)
+
+    def _open_chunk(self, chunk: int, mode: str = "r") -> np.memmap:
+        return np.memmap(self._chunk_path(chunk), dtype=DTYPE, mode=mode, shape=self._chunk_shape())
+
+    def _save_layout(self) -> None:
+        path = self.root / "layout.json"
+        if not path.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(self.layout, f, indent=2)
+
+    def append(self, cursor, timelines: List[Tuple[str, np.ndarray, int]]) -> int:
+        """Write (match_id, frames, frame_count) blocks and their index rows.
+
+        Matches already in the index are rewritten in place. The caller
+        commits, like the derived-table writers.
+
+        New slots are allocated under the write lock, taken here with
+        BEGIN IMMEDIATE unless the caller's transaction already holds it,
+        so concurrent writers can't both claim MAX(slot) + 1 and overwrite
+        each other's frames. The lock is held until the caller commits.
+        """
+        if not timelines:
+            return 0
+        self._save_layout()
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+        match_ids = [match_id for match_id, _, _ in timelines]
+        slots = {}
+        for start in range(0, len(match_ids), 500):
+            batch = match_ids[start:start + 500]
+            slots.update(cursor.execute(
+                f"SELECT match_id, slot FROM TimelineIndex WHERE match_id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        next_slot = cursor.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM TimelineIndex").fetchone()[0]
+        for match_id in match_ids:
+            if match_id not in slots:
+                slots[match_id] = next_slot
+                next_slot += 1
+
+        order = sorted(range(len(timelines)), key=lambda i: slots[match_ids[i]])
+        blocks = np.stack([timelines[i][1] for i in order]).astype(DTYPE, copy=False)  # (n, minutes, 10, stats)
+        slot_array = np.array([slots[match_ids[i]] for i in order], dtype=np.int64)
+
+        # One write per minute for each run of consecutive slots in a chunk
+        runs = np.flatnonzero((np.diff(slot_array) != 1) | (np.diff(slot_array // self.chunk_matches) != 0)) + 1
+        for run in np.split(np.arange(len(slot_array)), runs):
+            first = int(slot_array[run[0]])
+            chunk, offset = divmod(first, self.chunk_matches)
+            path = self._chunk_path(chunk)
+            if not path.exists():
+                with open(path, "wb") as f:
+                    f.truncate(int(np.prod(self._chunk_shape())) * np.dtype(DTYPE).itemsize)
+            fd = os.open(path, os.O_WRONLY)
+            try:
+                for minute in range(MAX_MINUTES):
+                    position = (minute * self.chunk_matches + offset) * self._match_bytes
+                    os.pwrite(fd, blocks[run, minute].tobytes(), position)
+            finally:
+                os.close(fd)
+
+        cursor.executemany("""
+            INSERT INTO TimelineIndex (match_id, slot, frames)
+            VALUES (?, ?, ?)
+            ON CONFLICT(match_id) DO UPDATE SET frames = excluded.frames
+        """, [(match_id, slots[match_id], frames) for match_id, _, frames in timelines])
+        metrics.inc("db_rows_written_total", len(timelines), table="TimelineIndex")
+        return len(timelines)
+
+    def get(self, match_id: str) -> Optional[np.ndarray]:
+        """One match's (minute, participant, stat) frames, or None if it isn't stored."""
+        row = self.db.get_connection().execute(
+            "SELECT slot, frames FROM TimelineIndex WHERE match_id = ?", (match_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        chunk, offset = divmod(row[0], self.chunk_matches)
+        return np.array(self._open_chunk(chunk)[:, offset])
+
+    def read_minute(self, minute: int, stats: List[str] = None) -> Dict[str, np.ndarray]:
+        """Every stored match at `minute`: match_id, frames, and an (n, 10) array per stat."""
+        if not 0 <= minute < MAX_MINUTES:
+            raise ValueError(f"minute must be in [0, {MAX_MINUTES})")
+        stats = stats or list(STATS)
+        columns = [STATS.index(stat) for stat in stats]
+        rows = self.db.get_connection().execute(
+            "SELECT match_id, slot, frames FROM TimelineIndex ORDER BY slot"
+        ).fetchall()
+        slots = np.array([row[1] for row in rows], dtype=np.int64)
+        values = {stat: np.zeros((len(rows), 10), dtype=DTYPE) for stat in stats}
+        chunks = slots // self.chunk_matches
+        for chunk in np.unique(chunks):
+            selected = np.flatnonzero(chunks == chunk)
+            frame = self._open_chunk(int(chunk))[minute]  # (chunk_matches, 10, stats), contiguous
+            block = frame[slots[selected] - chunk * self.chunk_matches]
+            for stat, column in zip(stats, columns):
+                values[stat][selected] = block[:, :, column]
+        return {
+            "match_id": np.array([row[0] for row in rows], dtype="S24"),
+            "frames": np.array([row[2] for row in rows], dtype=np.int16),
+            **values,
+        }
+
+    def gold_difference(self, minute: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(match_id, blue minus red total gold) at `minute`, for games that lasted that long."""
+        data = self.read_minute(minute, ["total_gold"])
+        gold = data["total_gold"].astype(np.int64)
+        lasted = data["frames"] > minute
+        return data["match_id"][lasted], (gold[:, :5].sum(axis=1) - gold[:, 5:].sum(axis=1))[lasted]
@@ -0,0 +1,216 @@
+import gzip
+import logging
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+BACKUP_PREFIX = "riot_data_backup_"
+# Microseconds keep backups taken within the same second apart
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S_%f"
+LEGACY_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+# When backup_if_due takes a backup: before every call, once per clock hour, or never
+SCHEDULES = ("always", "hourly", "never")
+
+
+class BackupManager:
+    """Online SQLite backups with hourly/daily retention.
+
+    Backups copy `pages_per_step` pages at a time with the SQLite online
+    backup API, sleeping between steps so writers are never blocked for
+    long. If concurrent writes keep restarting the copy, it falls back to
+    VACUUM INTO, which reads one consistent snapshot and in WAL mode does
+    not block writers either.
+    """
+
+    def __init__(self, db_path, backup_dir="backups", keep_hourly=24, keep_daily=14,
+                 compress=False, pages_per_step=1024, step_sleep=0.01, max_restarts=5,
+                 schedule="hourly"):
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown backup schedule {schedule!r}, expected one of {SCHEDULES}")
+        self.db_path = db_path
+        self.backup_dir = Path(backup_dir)
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.compress = compress
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+        self.schedule = schedule
+
+    @classmethod
+    def from_args(cls, db_path, args):
+        return cls(db_path, backup_dir=args.backup_dir, keep_hourly=args.keep_hourly,
+                   keep_daily=args.keep_daily, compress=args.compress_backups, schedule=args.backup_schedule)
+
+    @staticmethod
+    def backup_time(path: Path) -> Optional[datetime]:
+        """Parse the timestamp out of a backup file name."""
+        stamp = path.name[len(BACKUP_PREFIX):].split(".")[0]
+        for timestamp_format in (TIMESTAMP_FORMAT, LEGACY_TIMESTAMP_FORMAT):
+            try:
+                return datetime.strptime(stamp, timestamp_format)
+            except ValueError:
+                continue
+        return None
+
+    def list_backups(self) -> List[Path]:
+        """Finished backups, newest first."""
+        if not self.backup_dir.exists():
+            return []
+        backups = [
+            path for path in self.backup_dir.glob(f"{BACKUP_PREFIX}*")
+            if not path.name.endswith(".partial") and self.backup_time(path)
+        ]
+        return sorted(backups, key=self.backup_time, reverse=True)
+
+    def _copy_online(self, target: Path) -> None:
+        restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > self.max_restarts:
+                    raise _TooManyRestarts()
+            last_remaining = remaining
+
+        source = sqlite3.connect(self.db_path)
+        try:
+            destination = sqlite3.connect(target)
+            try:
+                source.backup(destination, pages=self.pages_per_step, progress=progress, sleep=self.step_sleep)
+            finally:
+                destination.close()
+        except _TooManyRestarts:
+            logging.warning(f"Backup restarted {restarts} times under concurrent writes; using VACUUM INTO instead")
+            target.unlink(missing_ok=True)
+            source.execute("VACUUM INTO ?", (str(target),))
+        finally:
+            source.close()
+
+    def create_backup(self) -> Optional[Path]:
+        """Create a backup with timestamp, then apply the retention policy."""
+        if not Path(self.db_path).exists():
+            logging.warning("No database file exists yet to backup.")
+            return None
+
+        self.backup_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+        backup_path = self.backup_dir / f"{BACKUP_PREFIX}{timestamp}.db"
+        if self.compress:
+            backup_path = backup_path.with_suffix(".db.gz")
+        partial = backup_path.with_name(backup_path.name + ".partial")
+
+        if self.compress:
+            with tempfile.TemporaryDirectory(dir=self.backup_dir) as tmp:
+                snapshot = Path(tmp) / "snapshot.db"
+                self._copy_online(snapshot)
+                with open(snapshot, "rb") as src, gzip.open(partial, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, length=1024 * 1024)
+        else:
+            self._copy_online(partial)
+
+        # Only complete backups ever carry the final name
+        partial.replace(backup_path)
+        logging.info(f"Created database backup: {backup_path}")
+        self.prune()
+        return backup_path
+
+    def backup_if_due(self) -> Optional[Path]:
+        """Create a backup if the schedule calls for one now.
+
+        With the hourly schedule a backup is only taken when the current
+        clock hour has none yet; prune() would keep just the newest of
+        several anyway.
+        """
+        if self.schedule == "never":
+            return None
+        if self.schedule == "hourly":
+            backups = self.list_backups()
+            hour = datetime.now().strftime("%Y%m%d%H")
+            if backups and self.backup_time(backups[0]).strftime("%Y%m%d%H") == hour:
+                logging.info(f"Skipping backup: {backups[0]} already covers this hour")
+                return None
+        return self.create_backup()
+
+    def prune(self) -> List[Path]:
+        """Delete backups outside the retention policy and return them.
+
+        Keeps the newest backup of each of the last `keep_hourly` hours and
+        of each of the last `keep_daily` days that have backups. The newest
+        backup is always kept.
+        """
+        backups = self.list_backups()
+        keep = set(backups[:1])
+        hours_seen = set()
+        days_seen = set()
+        for path in backups:
+            taken = self.backup_time(path)
+            hour = taken.strftime("%Y%m%d%H")
+            day = taken.strftime("%Y%m%d")
+            if hour not in hours_seen and len(hours_seen) < self.keep_hourly:
+                hours_seen.add(hour)
+                keep.add(path)
+            if day not in days_seen and len(days_seen) < self.keep_daily:
+                days_seen.add(day)
+                keep.add(path)
+
+        removed = [path for path in backups if path not in keep]
+        for path in removed:
+            path.unlink(missing_ok=True)
+            logging.info(f"Removed old backup: {path}")
+
+        # Leftovers from interrupted backups
+        for path in self.backup_dir.glob(f"{BACKUP_PREFIX}*.partial"):
+            path.unlink(missing_ok=True)
+        return removed
+
+    def restore(self, backup_path, target_path=None) -> None:
+        """Restore a backup into the database through the backup API.
+
+        Writing through SQLite (rather than copying files over) keeps the
+        target's WAL and lock state consistent.
+        """
+        backup_path = Path(backup_path)
+        target_path = target_path or self.db_path
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if backup_path.suffix == ".gz":
+                source_path = Path(tmp) / "restore.db"
+                with gzip.open(backup_path, "rb") as src, open(source_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, length=1024 * 1024)
+            else:
+                source_path = backup_path
+
+            source = sqlite3.connect(source_path)
+            try:
+                integrity = source.execute("PRAGMA integrity_check").fetchone()[0]
+                if integrity != "ok":
+                    raise ValueError(f"Backup {backup_path} failed integrity check: {integrity}")
+                destination = sqlite3.connect(target_path)
+                try:
+                    source.backup(destination, pages=self.pages_per_step)
+                finally:
+                    destination.close()
+            finally:
+                source.close()
+
+        logging.info(f"Restored {target_path} from {backup_path}")
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def add_backup_arguments(parser) -> None:
+    """Add the backup schedule and retention flags to a CLI that writes the ladder."""
+    parser.add_argument("--backup-dir", default="backups", help="Backup directory")
+    parser.add_argument("--keep-hourly", type=int, default=24, help="Hourly backups to keep")
+    parser.add_argument("--keep-daily", type=int, default=14, help="Daily backups to keep")
+    parser.add_argument("--compress-backups", action="store_true", help="gzip backups")
+    parser.add_argument("--backup-schedule", choices=SCHEDULES, default="hourly",
+                        help="Back up before every ladder update, at most once per hour, or never")
@@ -1,17 +1,139 @@
 import sqlite3
-import logging
-import shutil
-from datetime import datetime
-from pathlib import Path
+import random
+import threading
+import time
+from database.backup import BackupManager
+from utils.metrics import metrics
+
+# Connection profile applied to every connection we open
+CONNECTION_PRAGMAS = {
+    "journal_mode": "WAL",         # readers don't block the writer and vice versa
+    "synchronous": "NORMAL",       # safe with WAL, fsync only at checkpoints
+    "mmap_size": 268435456,        # 256 MB memory-mapped reads
+    "cache_size": -65536,          # 64 MB page cache
+    "temp_store": "MEMORY",
+}
+BUSY_TIMEOUT_SECONDS = 30
+
+# One row per summoner, region and ranked queue
+SUMMONERS_TABLE = """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        summonerID TEXT NOT NULL,
+        rank TEXT NOT NULL,
+        region TEXT NOT NULL,
+        queue TEXT NOT NULL DEFAULT 'RANKED_SOLO_5x5',
+        puuid TEXT,
+        league_points INTEGER,
+        wins INTEGER,
+        losses INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(summonerID, region, queue)
+    )
+"""
+
+# Triggers keeping SummonerCounts and MatchCoverage in step with the base
+# tables, so stats queries read a handful of rows instead of scanning.
+SUMMARY_TRIGGERS = {
+    "trg_summoners_insert": """
+        AFTER INSERT ON Summoners BEGIN
+            INSERT INTO SummonerCounts (region, rank, summoners, with_puuid)
+            VALUES (NEW.region, NEW.rank, 1, NEW.puuid IS NOT NULL)
+            ON CONFLICT(region, rank) DO UPDATE SET
+                summoners = summoners + 1,
+                with_puuid = with_puuid + excluded.with_puuid;
+        END
+    """,
+    "trg_summoners_delete": """
+        AFTER DELETE ON Summoners BEGIN
+            UPDATE SummonerCounts
+            SET summoners = summoners - 1, with_puuid = with_puuid - (OLD.puuid IS NOT NULL)
+            WHERE region = OLD.region AND rank = OLD.rank;
+        END
+    """,
+    "trg_summoners_update": """
+        AFTER UPDATE OF region, rank, puuid ON Summoners
+        WHEN OLD.region IS NOT NEW.region OR OLD.rank IS NOT NEW.rank
+            OR (OLD.puuid IS NULL) != (NEW.puuid IS NULL)
+        BEGIN
+            UPDATE SummonerCounts
+            SET summoners = summoners - 1, with_puuid = with_puuid - (OLD.puuid IS NOT NULL)
+            WHERE region = OLD.region AND rank = OLD.rank;
+            INSERT INTO SummonerCounts (region, rank, summoners, with_puuid)
+            VALUES (NEW.region, NEW.rank, 1, NEW.puuid IS NOT NULL)
+            ON CONFLICT(region, rank) DO UPDATE SET
+                summoners = summoners + 1,
+                with_puuid = with_puuid + excluded.with_puuid;
+        END
+    """,
+    "trg_matchids_insert": """
+        AFTER INSERT ON MatchIDs BEGIN
+            INSERT INTO MatchCoverage (region, match_ids, with_metadata)
+            VALUES (NEW.region, 1, EXISTS (SELECT 1 FROM MatchMetadata WHERE match_id = NEW.match_id))
+            ON CONFLICT(region) DO UPDATE SET
+                match_ids = match_ids + 1,
+                with_metadata = with_metadata + excluded.with_metadata;
+        END
+    """,
+    "trg_matchids_delete": """
+        AFTER DELETE ON MatchIDs BEGIN
+            UPDATE MatchCoverage
+            SET match_ids = match_ids - 1,
+                with_metadata = with_metadata - EXISTS (SELECT 1 FROM MatchMetadata WHERE match_id = OLD.match_id)
+            WHERE region = OLD.region;
+        END
+    """,
+    "trg_matchmetadata_insert": """
+        AFTER INSERT ON MatchMetadata BEGIN
+            UPDATE MatchCoverage SET with_metadata = with_metadata + 1
+            WHERE region = (SELECT region FROM MatchIDs WHERE match_id = NEW.match_id);
+        END
+    """,
+    "trg_matchmetadata_delete": """
+        AFTER DELETE ON MatchMetadata BEGIN
+            UPDATE MatchCoverage SET with_metadata = with_metadata - 1
+            WHERE region = (SELECT region FROM MatchIDs WHERE match_id = OLD.match_id);
+        END
+    """,
+}
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection that records every commit in the db_commit_seconds histogram."""
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            metrics.observe("db_commit_seconds", time.perf_counter() - start)
+
+
+def connect(db_path, check_same_thread=True):
+    """Open a connection with the tuned profile applied.
+
+    Pass check_same_thread=False only for a connection whose users
+    serialize access with their own lock.
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, factory=TimedConnection,
+                           check_same_thread=check_same_thread)
+    for pragma, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
 
 class DatabaseManager:
-    def __init__(self, db_path="riot_data.db"):
+    def __init__(self, db_path="riot_data.db", backups: BackupManager = None):
         self.db_path = db_path
+        self._local = threading.local()
+        # Backup location, retention and schedule; hourly backups in ./backups by default
+        self.backups = backups or BackupManager(db_path)
         self._init_db()
 
     def _init_db(self):
         """Initialize the database and create tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         try:
             cursor = conn.cursor()
             
@@ -24,18 +146,7 @@ class DatabaseManager:
             
             if not exists:
                 # Create new table with timestamps
-                cursor.execute("""
-                    CREATE TABLE Summoners (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        summonerID TEXT NOT NULL,
-                        rank TEXT NOT NULL,
-                        region TEXT NOT NULL,
-                        puuid TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(summonerID, region)
-                    )
-                """)
+                cursor.execute(SUMMONERS_TABLE.format(name="Summoners"))
             else:
                 # Check if timestamp columns exist, add them if they don't
                 cursor.execute("PRAGMA table_info(Summoners)")
@@ -47,6 +158,12 @@ class DatabaseManager:
                 if 'updated_at' not in columns:
                     cursor.execute("ALTER TABLE Summoners ADD COLUMN updated_at TIMESTAMP")
                     cursor.execute("UPDATE Summoners SET updated_at = CURRENT_TIMESTAMP")
+                # Ladder standing from the league entries
+                for column in ('league_points', 'wins', 'losses'):
+                    if column not in columns:
+                        cursor.execute(f"ALTER TABLE Summoners ADD COLUMN {column} INTEGER")
+                if 'queue' not in columns:
+                    self._add_summoner_queue(cursor)
             
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS MatchIDs (
@@ -74,124 +191,424 @@ class DatabaseManager:
                     FOREIGN KEY(match_id) REFERENCES MatchIDs(match_id)
                 )
             """)
+
+            # One row per player per match, from info.participants
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS MatchParticipants (
+                    match_id TEXT NOT NULL,
+                    participant_id INTEGER NOT NULL,
+                    puuid TEXT NOT NULL,
+                    champion_id INTEGER,
+                    champion_name TEXT,
+                    team_id INTEGER,
+                    team_position TEXT,
+                    win BOOLEAN,
+                    kills INTEGER,
+                    deaths INTEGER,
+                    assists INTEGER,
+                    gold_earned INTEGER,
+                    total_damage_dealt_to_champions INTEGER,
+                    game_start_timestamp INTEGER,
+                    PRIMARY KEY (match_id, participant_id),
+                    FOREIGN KEY(match_id) REFERENCES MatchMetadata(match_id)
+                )
+            """)
+
+            # Progress and resume cursor for each batch-processing stage
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS JobState (
+                    stage TEXT PRIMARY KEY,
+                    last_cursor INTEGER NOT NULL DEFAULT 0,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    api_calls INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'idle',
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # How far each PUUID's match history has been crawled: every game
+            # that ended before listed_until (epoch seconds, the wall-clock
+            # start of the last crawl that reached the previous watermark)
+            # has been listed, and last_match_id is the newest ID seen.
+            # A crawl cut short records where it stopped: the first
+            # resume_start entries from resume_match_id on are listed.
+            # PUUIDs without a row are crawled from when they were added.
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS MatchHistoryWatermarks (
+                    puuid TEXT PRIMARY KEY,
+                    listed_until INTEGER,
+                    last_match_id TEXT,
+                    resume_start INTEGER,
+                    resume_match_id TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Mergeable game-duration summaries, see analysis/duration_stats.py
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS DurationStats (
+                    region TEXT NOT NULL,
+                    patch TEXT NOT NULL,
+                    queue_id INTEGER NOT NULL,
+                    summary TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (region, patch, queue_id)
+                )
+            """)
+
+            # Per-player totals, recent results and daily buckets, see analysis/player_stats.py
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS PlayerStats (
+                    puuid TEXT PRIMARY KEY,
+                    games INTEGER NOT NULL DEFAULT 0,
+                    wins INTEGER NOT NULL DEFAULT 0,
+                    duration_total INTEGER NOT NULL DEFAULT 0,
+                    last_game_start INTEGER,
+                    streak INTEGER NOT NULL DEFAULT 0,
+                    recent TEXT NOT NULL,
+                    daily TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID
+            """)
+
+            # Slot of each match's frames in the timeline chunk files, see data_processing/timeline_store.py
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS TimelineIndex (
+                    match_id TEXT PRIMARY KEY,
+                    slot INTEGER NOT NULL UNIQUE,
+                    frames INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Jobs shared by queue_worker.py processes, see database/work_queue.py
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS WorkQueue (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (kind, key)
+                )
+            """)
+
+            # Indexes for the columns the fetchers join and filter on
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_summoners_puuid ON Summoners(puuid)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_summoners_region_rank ON Summoners(region, rank)")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_matchids_summoner_puuid
+                ON MatchIDs(summoner_puuid, created_at)
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_matchids_region ON MatchIDs(region)")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_matchmetadata_game_start
+                ON MatchMetadata(game_start_timestamp)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_matchparticipants_puuid
+                ON MatchParticipants(puuid, game_start_timestamp)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_matchparticipants_champion
+                ON MatchParticipants(champion_id)
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_workqueue_claim ON WorkQueue(kind, lease_expires)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_workqueue_owner ON WorkQueue(lease_owner)")
+
+            self._init_summary_tables(cursor)
             
             conn.commit()
+            cursor.execute("PRAGMA optimize")
         finally:
             conn.close()
 
+    def _add_summoner_queue(self, cursor):
+        """Rebuild Summoners with the queue column in its unique key.
+
+        A unique constraint cannot be altered in place, so existing rows
+        (all from the solo queue ladder) are copied with their ids into a
+        new table. Dropping the old table drops its triggers and indexes;
+        both are recreated further down in _init_db.
+        """
+        cursor.execute(SUMMONERS_TABLE.format(name="Summoners_new"))
+        cursor.execute("""
+            INSERT INTO Summoners_new (
+                id, summonerID, rank, region, puuid, league_points, wins, losses, created_at, updated_at
+            )
+            SELECT id, summonerID, rank, region, puuid, league_points, wins, losses, created_at, updated_at
+            FROM Summoners
+        """)
+        cursor.execute("DROP TABLE Summoners")
+        cursor.execute("ALTER TABLE Summoners_new RENAME TO Summoners")
+
+    def _init_summary_tables(self, cursor):
+        """Create the trigger-maintained count tables, backfilling them on first creation."""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('SummonerCounts', 'MatchCoverage')")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SummonerCounts (
+                region TEXT NOT NULL,
+                rank TEXT NOT NULL,
+                summoners INTEGER NOT NULL DEFAULT 0,
+                with_puuid INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (region, rank)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS MatchCoverage (
+                region TEXT PRIMARY KEY,
+                match_ids INTEGER NOT NULL DEFAULT 0,
+                with_metadata INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+
+        if 'SummonerCounts' not in existing:
+            cursor.execute("""
+                INSERT INTO SummonerCounts (region, rank, summoners, with_puuid)
+                SELECT region, rank, COUNT(*), COUNT(puuid)
+                FROM Summoners
+                GROUP BY region, rank
+            """)
+        if 'MatchCoverage' not in existing:
+            cursor.execute("""
+                INSERT INTO MatchCoverage (region, match_ids, with_metadata)
+                SELECT m.region, COUNT(*), COUNT(mm.match_id)
+                FROM MatchIDs m
+                LEFT JOIN MatchMetadata mm ON mm.match_id = m.match_id
+                GROUP BY m.region
+            """)
+
+        for name, body in SUMMARY_TRIGGERS.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    def get_summoner_counts(self):
+        """(region, rank, summoners, with_puuid) rows from the maintained counts."""
+        return self.get_connection().execute("""
+            SELECT region, rank, summoners, with_puuid
+            FROM SummonerCounts
+            WHERE summoners > 0
+            ORDER BY region, rank
+        """).fetchall()
+
+    def get_match_coverage(self):
+        """(region, match_ids, with_metadata) rows from the maintained counts."""
+        return self.get_connection().execute("""
+            SELECT region, match_ids, with_metadata
+            FROM MatchCoverage
+            WHERE match_ids > 0
+            ORDER BY region
+        """).fetchall()
+
+    def sample_rows(self, table, columns, limit):
+        """Pick up to `limit` random rows without sorting the table.
+
+        Draws random rowids in [MIN(rowid), MAX(rowid)] and takes the first
+        row at or after each, so every pick is one index seek. Rows that
+        follow a gap in the rowids are slightly more likely to be picked.
+        `table` and `columns` are interpolated and must be trusted names.
+        """
+        conn = self.get_connection()
+        low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+        if low is None:
+            return []
+
+        select = f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE rowid >= ? ORDER BY rowid LIMIT 1"
+        picked = {}
+        attempts = 0
+        while len(picked) < limit and attempts < limit * 10:
+            attempts += 1
+            row = conn.execute(select, (random.randint(low, high),)).fetchone()
+            if row is not None:
+                picked.setdefault(row[0], row[1:])
+        return list(picked.values())
+
+    def sample_summoners(self, limit=10):
+        """Random summoners as (summonerID, rank, region, puuid, created_at, updated_at)."""
+        return self.sample_rows(
+            "Summoners", ["summonerID", "rank", "region", "puuid", "created_at", "updated_at"], limit
+        )
+
+    def get_job_state(self, stage):
+        """Get the saved progress for a stage, or a fresh state if it never ran."""
+        row = self.get_connection().execute("""
+            SELECT last_cursor, processed, api_calls, status, updated_at
+            FROM JobState WHERE stage = ?
+        """, (stage,)).fetchone()
+        if row is None:
+            return {'stage': stage, 'last_cursor': 0, 'processed': 0, 'api_calls': 0, 'status': 'idle', 'updated_at': None}
+        return {
+            'stage': stage,
+            'last_cursor': row[0],
+            'processed': row[1],
+            'api_calls': row[2],
+            'status': row[3],
+            'updated_at': row[4]
+        }
+
+    def save_job_state(self, conn, stage, last_cursor, processed=0, api_calls=0, status='running'):
+        """Record progress for a stage on `conn` without committing.
+
+        Callers write this in the same transaction as the results it
+        covers, so the cursor never gets ahead of the stored data.
+        `processed` and `api_calls` are increments.
+        """
+        conn.execute("""
+            INSERT INTO JobState (stage, last_cursor, processed, api_calls, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(stage) DO UPDATE SET
+                last_cursor = excluded.last_cursor,
+                processed = JobState.processed + excluded.processed,
+                api_calls = JobState.api_calls + excluded.api_calls,
+                status = excluded.status,
+                updated_at = CURRENT_TIMESTAMP
+        """, (stage, last_cursor, processed, api_calls, status))
+
+    def set_job_status(self, stage, status, reset_cursor=False):
+        """Update a stage's status, optionally rewinding its cursor for the next full pass."""
+        conn = self.get_connection()
+        last_cursor = 0 if reset_cursor else self.get_job_state(stage)['last_cursor']
+        self.save_job_state(conn, stage, last_cursor, status=status)
+        conn.commit()
+
     def create_backup(self):
-        """Create a backup of the database with timestamp."""
-        if not Path(self.db_path).exists():
-            logging.warning("No database file exists yet to backup.")
-            return None
-        
-        # Create backups directory if it doesn't exist
-        backup_dir = Path("backups")
-        backup_dir.mkdir(exist_ok=True)
-        
-        # Create backup filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = backup_dir / f"riot_data_backup_{timestamp}.db"
-        
-        # Copy database file
-        shutil.copy2(self.db_path, backup_path)
-        logging.info(f"Created database backup: {backup_path}")
-        return backup_path
+        """Create an online backup of the database and prune old ones."""
+        return self.backups.create_backup()
 
     def get_connection(self):
-        """Get a database connection."""
-        return sqlite3.connect(self.db_path)
+        """Get this thread's long-lived database connection.
 
-    def update_summoners(self, summoners):
-        """Update the summoners table with new data."""
-        # Create backup before updating
-        self.create_backup()
+        The connection is shared by everything running on the calling
+        thread, so callers commit or roll back but never close it.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection, if it has one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def update_summoners(self, summoners, scopes=None):
+        """Merge a ladder snapshot into Summoners in one set-based pass.
+
+        Rows are staged in a temp table keyed like Summoners, upserted with
+        ON CONFLICT DO UPDATE (only rows whose rank or standing changed are
+        touched), and rows missing from the snapshot are deleted only within
+        the (region, queue, rank) scopes that were fetched, so a league that
+        failed to download keeps its rows. `scopes` defaults to the scopes
+        present in `summoners`; pass it explicitly to also clear leagues that
+        came back empty. Totals come from SummonerCounts instead of COUNT(*).
+        """
+        # Back up before updating, as often as the backup schedule allows
+        self.backups.backup_if_due()
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         try:
             cursor = conn.cursor()
 
-            # Create temporary table
+            # Staging table with the same key as Summoners, so every lookup below is an index seek
             cursor.execute("DROP TABLE IF EXISTS temp_summoners")
             cursor.execute("""
                 CREATE TEMPORARY TABLE temp_summoners (
                     summonerID TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    queue TEXT NOT NULL,
                     rank TEXT NOT NULL,
-                    region TEXT NOT NULL
-                )
+                    puuid TEXT,
+                    league_points INTEGER,
+                    wins INTEGER,
+                    losses INTEGER,
+                    PRIMARY KEY (summonerID, region, queue)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("DROP TABLE IF EXISTS temp_scopes")
+            cursor.execute("""
+                CREATE TEMPORARY TABLE temp_scopes (
+                    region TEXT NOT NULL,
+                    queue TEXT NOT NULL,
+                    rank TEXT NOT NULL,
+                    PRIMARY KEY (region, queue, rank)
+                ) WITHOUT ROWID
             """)
 
-            # Insert new data into temporary table
-            cursor.executemany(
-                "INSERT INTO temp_summoners (summonerID, rank, region) VALUES (?, ?, ?)",
-                [(s["summonerID"], s["rank"], s["region"]) for s in summoners]
-            )
+            cursor.executemany("""
+                INSERT OR REPLACE INTO temp_summoners (
+                    summonerID, region, queue, rank, puuid, league_points, wins, losses
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (s["summonerID"], s["region"], s.get("queue", "RANKED_SOLO_5x5"), s["rank"], s.get("puuid"),
+                 s.get("league_points"), s.get("wins"), s.get("losses"))
+                for s in summoners
+            ])
+            if scopes is None:
+                cursor.execute("INSERT INTO temp_scopes SELECT DISTINCT region, queue, rank FROM temp_summoners")
+            else:
+                cursor.executemany("INSERT OR IGNORE INTO temp_scopes (region, queue, rank) VALUES (?, ?, ?)", scopes)
 
-            # Get counts before update
-            cursor.execute("SELECT COUNT(*) FROM Summoners")
-            count_before = cursor.fetchone()[0]
+            count_before = sum(row[2] for row in self.get_summoner_counts())
 
-            # Update existing records (only if rank changed)
-            cursor.execute("""
-                UPDATE Summoners
-                SET 
-                    rank = (
-                        SELECT temp.rank 
-                        FROM temp_summoners temp 
-                        WHERE temp.summonerID = Summoners.summonerID 
-                        AND temp.region = Summoners.region
-                    ),
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE EXISTS (
-                    SELECT 1 
-                    FROM temp_summoners temp 
-                    WHERE temp.summonerID = Summoners.summonerID 
-                    AND temp.region = Summoners.region
-                    AND temp.rank != Summoners.rank
-                )
-            """)
-            updated_count = cursor.rowcount
+            # Ids are AUTOINCREMENT, so any id past the current maximum was inserted by this statement
+            max_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM Summoners").fetchone()[0]
 
-            # Insert new records
-            cursor.execute("""
-                INSERT INTO Summoners (summonerID, rank, region, created_at, updated_at)
-                SELECT 
-                    summonerID, 
-                    rank, 
-                    region,
-                    CURRENT_TIMESTAMP,
-                    CURRENT_TIMESTAMP
-                FROM temp_summoners
-                WHERE NOT EXISTS (
-                    SELECT 1 
-                    FROM Summoners 
-                    WHERE Summoners.summonerID = temp_summoners.summonerID 
-                    AND Summoners.region = temp_summoners.region
+            # Insert new rows; update existing ones only if rank or standing changed
+            written_ids = [row[0] for row in cursor.execute("""
+                INSERT INTO Summoners (
+                    summonerID, rank, region, queue, puuid, league_points, wins, losses, created_at, updated_at
                 )
-            """)
-            inserted_count = cursor.rowcount
+                SELECT summonerID, rank, region, queue, puuid, league_points, wins, losses,
+                       CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+                FROM temp_summoners
+                WHERE true
+                ON CONFLICT(summonerID, region, queue) DO UPDATE SET
+                    rank = excluded.rank,
+                    puuid = COALESCE(excluded.puuid, Summoners.puuid),
+                    league_points = excluded.league_points,
+                    wins = excluded.wins,
+                    losses = excluded.losses,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE excluded.rank != Summoners.rank
+                    OR (excluded.puuid IS NOT NULL AND excluded.puuid IS NOT Summoners.puuid)
+                    OR excluded.league_points IS NOT Summoners.league_points
+                    OR excluded.wins IS NOT Summoners.wins
+                    OR excluded.losses IS NOT Summoners.losses
+                RETURNING id
+            """)]
+            inserted_count = sum(1 for summoner_id in written_ids if summoner_id > max_id)
+            updated_count = len(written_ids) - inserted_count
 
-            # Delete outdated records
+            # Delete rows that dropped out of a league we fetched
             cursor.execute("""
                 DELETE FROM Summoners
-                WHERE NOT EXISTS (
+                WHERE (region, queue, rank) IN (SELECT region, queue, rank FROM temp_scopes)
+                AND NOT EXISTS (
                     SELECT 1
-                    FROM temp_summoners
-                    WHERE temp_summoners.summonerID = Summoners.summonerID
-                    AND temp_summoners.region = Summoners.region
+                    FROM temp_summoners t
+                    WHERE t.summonerID = Summoners.summonerID
+                    AND t.region = Summoners.region
+                    AND t.queue = Summoners.queue
                 )
             """)
             deleted_count = cursor.rowcount
 
-            # Get count after update
-            cursor.execute("SELECT COUNT(*) FROM Summoners")
-            count_after = cursor.fetchone()[0]
-
+            cursor.execute("DROP TABLE temp_summoners")
+            cursor.execute("DROP TABLE temp_scopes")
             conn.commit()
+            metrics.inc("db_rows_written_total", inserted_count + updated_count, table="Summoners")
             
             return {
                 'before': count_before,
-                'after': count_after,
+                'after': count_before + inserted_count - deleted_count,
                 'inserted': inserted_count,
                 'updated': updated_count,
                 'deleted': deleted_count
@@ -199,6 +616,4 @@ class DatabaseManager:
 
         except Exception as e:
             conn.rollback()
-            raise e
-        finally:
-            conn.close() 
\ No newline at end of file
+            raise e 
\ No newline at end of file
@@ -0,0 +1,137 @@
+import gzip
+import json
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database.db_manager import connect
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed payloads")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class RawMatchStore:
+    """Compressed match-v5 responses keyed by match_id.
+
+    Payloads live in their own SQLite file so the main database stays
+    small. New payloads use zstd when the zstandard package is installed
+    and gzip otherwise, unless `codec` says which. Each row records its
+    codec, so gzip and zstd rows can coexist.
+    """
+
+    def __init__(self, db_path="riot_raw.db", codec=None):
+        if codec is None:
+            codec = "gzip" if zstandard is None else "zstd"
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("codec 'zstd' requires the zstandard package")
+        if codec not in ("gzip", "zstd"):
+            raise ValueError(f"Unknown codec: {codec}")
+        self.db_path = db_path
+        self.codec = codec
+        self._local = threading.local()
+        self._init_db()
+
+    def _init_db(self):
+        """Create the payload table if it doesn't exist."""
+        conn = self.get_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS RawMatches (
+                match_id TEXT PRIMARY KEY,
+                region TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+
+    def get_connection(self):
+        """Get this thread's long-lived connection to the payload database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def _encode(self, payload: Dict) -> bytes:
+        return _compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), self.codec)
+
+    def put(self, match_id: str, region: str, payload: Dict) -> None:
+        """Store one payload, replacing any previous copy."""
+        self.put_many([(match_id, region, payload)])
+
+    def put_many(self, records: Iterable[Tuple[str, str, Dict]]) -> int:
+        """Store (match_id, region, payload) records in one transaction."""
+        rows = [(match_id, region, self.codec, self._encode(payload)) for match_id, region, payload in records]
+        conn = self.get_connection()
+        try:
+            conn.executemany("""
+                INSERT OR REPLACE INTO RawMatches (match_id, region, codec, payload)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
+
+    def get(self, match_id: str) -> Optional[Dict]:
+        """Return the decoded payload for a match, or None if it isn't stored."""
+        return self.get_many([match_id]).get(match_id)
+
+    def get_many(self, match_ids: List[str], chunk_size: int = 500) -> Dict[str, Dict]:
+        """Bulk read payloads; missing matches are left out of the result."""
+        result = {}
+        conn = self.get_connection()
+        for i in range(0, len(match_ids), chunk_size):
+            chunk = match_ids[i:i + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            for match_id, codec, blob in conn.execute(
+                f"SELECT match_id, codec, payload FROM RawMatches WHERE match_id IN ({placeholders})",
+                chunk
+            ).fetchall():
+                result[match_id] = json.loads(_decompress(blob, codec))
+        return result
+
+    def iter_matches(self, batch_size: int = 500, region: str = None) -> Iterator[List[Tuple[str, str, Dict]]]:
+        """Yield batches of (match_id, region, payload) in storage order.
+
+        Uses keyset pagination on rowid, so memory stays bounded by
+        batch_size regardless of how many payloads are stored.
+        """
+        last_rowid = 0
+        while True:
+            query = "SELECT rowid, match_id, region, codec, payload FROM RawMatches WHERE rowid > ?"
+            params = [last_rowid]
+            if region:
+                query += " AND region = ?"
+                params.append(region)
+            query += " ORDER BY rowid LIMIT ?"
+            params.append(batch_size)
+
+            rows = self.get_connection().execute(query, params).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [
+                (match_id, match_region, json.loads(_decompress(blob, codec)))
+                for _, match_id, match_region, codec, blob in rows
+            ]
+
+    def count(self) -> int:
+        return self.get_connection().execute("SELECT COUNT(*) FROM RawMatches").fetchone()[0]
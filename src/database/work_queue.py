@@ -0,0 +1,139 @@
+"""Lease-based work queue shared by worker processes.
+
+Jobs are WorkQueue rows keyed by (kind, key), so the same summoner or
+match is never queued twice. A worker claims a batch by taking a lease:
+one UPDATE ... RETURNING sets lease_owner and lease_expires on the first
+claimable rows and hands them back, so two workers never get the same
+job. A job is claimable while its lease has expired (new jobs start at
+lease_expires = 0), which is how a crashed worker's jobs come back:
+nobody has to notice the crash, the lease just runs out. Live workers
+heartbeat to extend their leases. Completing a job deletes its row in
+the same transaction as the job's results and follow-up jobs; a failed
+job is retried after a delay until it has used max_attempts, then stays
+in the table as dead for inspection.
+
+Any number of processes on one host can share the queue. connect()
+puts the database in WAL mode, whose shared-memory index only works
+between processes on the same machine, so the database file must not
+be shared over a network filesystem.
+"""
+import json
+import os
+import socket
+import time
+from typing import Dict, Iterable, List, Tuple
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    def __init__(self, db, lease_seconds: float = 300, max_attempts: int = 5, retry_delay: float = 60):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def enqueue(self, conn, kind: str, jobs: Iterable[Tuple[str, Dict]]) -> int:
+        """Queue (key, payload) jobs on `conn` without committing; returns how many were new.
+
+        Keys already queued (pending, leased or dead) are left alone.
+        """
+        cursor = conn.cursor()
+        before = conn.total_changes
+        cursor.executemany("""
+            INSERT OR IGNORE INTO WorkQueue (kind, key, payload)
+            VALUES (?, ?, ?)
+        """, ((kind, key, json.dumps(payload)) for key, payload in jobs))
+        return conn.total_changes - before
+
+    def claim(self, kind: str, worker_id: str, limit: int) -> List[Dict]:
+        """Lease up to `limit` claimable jobs of `kind` to `worker_id`.
+
+        Returns [{"key", "payload", "attempts"}], oldest jobs first.
+        """
+        conn = self.db.get_connection()
+        now = time.time()
+        # Taking the write lock up front means the claimable rows can't
+        # change between choosing them and leasing them; anything the
+        # caller left uncommitted is committed first
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("""
+                UPDATE WorkQueue
+                SET lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE rowid IN (
+                    SELECT rowid FROM WorkQueue
+                    WHERE kind = ? AND lease_expires < ? AND attempts < ?
+                    ORDER BY lease_expires, rowid
+                    LIMIT ?
+                )
+                RETURNING key, payload, attempts
+            """, (worker_id, now + self.lease_seconds, kind, now, self.max_attempts, limit)).fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return [{"key": key, "payload": json.loads(payload), "attempts": attempts} for key, payload, attempts in rows]
+
+    def heartbeat(self, worker_id: str) -> int:
+        """Extend every lease held by `worker_id`; returns the number of jobs still held."""
+        conn = self.db.get_connection()
+        cursor = conn.execute("""
+            UPDATE WorkQueue
+            SET lease_expires = ?
+            WHERE lease_owner = ? AND lease_expires > 0
+        """, (time.time() + self.lease_seconds, worker_id))
+        conn.commit()
+        return cursor.rowcount
+
+    def complete(self, conn, kind: str, key: str, worker_id: str) -> bool:
+        """Remove a finished job on `conn` without committing.
+
+        Returns False if the lease had already expired and another worker
+        claimed the job; the results are still written, since every
+        store is an idempotent upsert.
+        """
+        cursor = conn.execute(
+            "DELETE FROM WorkQueue WHERE kind = ? AND key = ? AND lease_owner = ?", (kind, key, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, kind: str, key: str, worker_id: str, error: str) -> None:
+        """Give a job back to be retried after retry_delay (or left dead after max_attempts)."""
+        conn = self.db.get_connection()
+        conn.execute("""
+            UPDATE WorkQueue
+            SET lease_owner = NULL, lease_expires = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE kind = ? AND key = ? AND lease_owner = ?
+        """, (time.time() + self.retry_delay, error[:500], kind, key, worker_id))
+        conn.commit()
+
+    def release(self, worker_id: str) -> int:
+        """Hand back every job `worker_id` holds without counting an attempt (clean shutdown)."""
+        conn = self.db.get_connection()
+        cursor = conn.execute("""
+            UPDATE WorkQueue
+            SET lease_owner = NULL, lease_expires = 0, attempts = MAX(attempts - 1, 0)
+            WHERE lease_owner = ?
+        """, (worker_id,))
+        conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per kind: jobs ready to claim, leased, waiting to retry and dead."""
+        now = time.time()
+        stats = {}
+        for kind, ready, leased, retrying, dead in self.db.get_connection().execute("""
+            SELECT kind,
+                   SUM(attempts < ? AND lease_expires < ?),
+                   SUM(lease_owner IS NOT NULL AND lease_expires >= ?),
+                   SUM(lease_owner IS NULL AND lease_expires >= ?),
+                   SUM(attempts >= ? AND lease_expires < ?)
+            FROM WorkQueue
+            GROUP BY kind
+        """, (self.max_attempts, now, now, now, self.max_attempts, now)):
+            stats[kind] = {"ready": ready, "leased": leased, "retrying": retrying, "dead": dead}
+        return stats
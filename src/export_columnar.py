@@ -0,0 +1,38 @@
+import argparse
+import logging
+import time
+from database.db_manager import DatabaseManager
+from data_processing.columnar_store import ColumnarStore, TABLES
+from utils.logging_config import setup_logging
+
+
+def export_tables(tables=None, root="columnar", chunk_size: int = 100_000) -> dict:
+    """Append new rows of each match table to the columnar store."""
+    db = DatabaseManager()
+    store = ColumnarStore(root)
+    conn = db.get_connection()
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    counts = {}
+    for table in tables or TABLES:
+        if table not in existing:
+            logging.info(f"Skipping {table}: table does not exist")
+            continue
+        start_time = time.time()
+        counts[table] = store.export(conn, table, chunk_size)
+        logging.info(f"{table}: {counts[table]} new rows in {time.time() - start_time:.1f} seconds")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new match rows to the region/patch partitioned column files.")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), help="Tables to export (default: all)")
+    parser.add_argument("--root", default="columnar", help="Output directory")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows read from SQLite per query")
+    args = parser.parse_args()
+    export_tables(args.tables, args.root, args.chunk_size)
+
+
+if __name__ == "__main__":
+    setup_logging("export_columnar")
+    main()
@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, Tuple
+
+from analysis.player_stats import update_player_stats
+from api.async_riot_client import AsyncRiotClient
+from api.riot_client import get_region_routing
+from database.db_manager import DatabaseManager
+from fetch_puuids import STAGE as PUUIDS_STAGE, PUUIDFetcher
+from fetch_match_ids import STAGE as MATCH_IDS_STAGE, MatchHistoryCrawl, MatchIDFetcher
+from fetch_match_metadata import STAGE as METADATA_STAGE, MatchMetadataFetcher
+from fetch_timelines import STAGE as TIMELINES_STAGE, TimelineFetcher
+from utils.logging_config import setup_logging
+from utils.metrics import add_metrics_arguments, start_metrics_export
+from utils.run_budget import RunBudget, add_budget_arguments
+
+
+class Checkpoint:
+    """Resume cursor for items fed in id order but finished out of order.
+
+    The cursor is the highest id whose predecessors have all finished, so
+    a restart never skips an item that was still in flight.
+    """
+
+    def __init__(self, cursor: int = 0):
+        self.cursor = cursor
+        self.fed = 0
+        self._in_flight = deque()
+        self._finished = set()
+
+    def feed(self, item_id: int) -> None:
+        self.fed += 1
+        self._in_flight.append(item_id)
+
+    def finish(self, item_id: int) -> None:
+        self._finished.add(item_id)
+        while self._in_flight and self._in_flight[0] in self._finished:
+            self.cursor = self._in_flight.popleft()
+            self._finished.discard(self.cursor)
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._in_flight)
+
+
+class CommittingStore:
+    """Store callback that commits every `commit_every` finished items together with the stage's cursor."""
+
+    def __init__(self, db: DatabaseManager, stage: str, write: Callable, checkpoint: Checkpoint,
+                 budget: RunBudget, commit_every: int = 50):
+        self.db = db
+        self.stage = stage
+        self.conn = db.get_connection()
+        self.cursor = self.conn.cursor()
+        self.write = write
+        self.checkpoint = checkpoint
+        self.budget = budget
+        self.commit_every = commit_every
+        self.pending = 0
+        self.stored = 0
+        self.calls_saved = budget.calls
+
+    def __call__(self, item: Dict, result) -> None:
+        self.write(self.cursor, item, result)
+        self.stored += 1
+        self.finish(item)
+
+    def finish(self, item: Dict) -> None:
+        """Let the cursor pass `item`; failed items are passed too, like the batch fetchers do."""
+        self.checkpoint.finish(item["id"])
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self.db.save_job_state(self.conn, self.stage, self.checkpoint.cursor, processed=self.stored,
+                               api_calls=self.budget.calls - self.calls_saved)
+        self.conn.commit()
+        self.pending = 0
+        self.stored = 0
+        self.calls_saved = self.budget.calls
+
+
+async def run_sharded(
+    items: Iterable[Dict],
+    host_of: Callable[[Dict], str],
+    fetch: Callable[[Dict], Awaitable],
+    store: CommittingStore,
+    concurrency_per_host: int,
+    budget: RunBudget,
+) -> Tuple[int, bool]:
+    """Stream items into a bounded queue and worker pool per routing host.
+
+    Feeding waits while a host's queue is full, so memory stays bounded by
+    the queue sizes however large the backlog. Once the budget is spent
+    feeding stops and queued items are left unfinished for the next run.
+    Storing happens on the event loop thread, so a single sqlite
+    connection can be shared by all workers. Returns (items stored,
+    whether `items` ran out).
+    """
+    queues: Dict[str, asyncio.Queue] = {}
+    workers = []
+    completed = 0
+
+    async def worker(queue: asyncio.Queue):
+        nonlocal completed
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if budget.exhausted():
+                continue
+            try:
+                result = await fetch(item)
+                store(item, result)
+                completed += 1
+            except Exception as e:
+                logging.error(f"Error processing {item}: {str(e)}")
+                store.finish(item)
+
+    ran_out = False
+    try:
+        for item in items:
+            if budget.exhausted():
+                logging.info(f"Budget exhausted ({budget.describe()}), stopping")
+                break
+            host = host_of(item)
+            if host not in queues:
+                queues[host] = asyncio.Queue(maxsize=concurrency_per_host * 2)
+                workers.extend(asyncio.create_task(worker(queues[host])) for _ in range(concurrency_per_host))
+            store.checkpoint.feed(item["id"])
+            await queues[host].put(item)
+        else:
+            ran_out = True
+    finally:
+        for queue in queues.values():
+            for _ in range(concurrency_per_host):
+                await queue.put(None)
+        await asyncio.gather(*workers)
+    return completed, ran_out
+
+
+async def fetch_summoners(client: AsyncRiotClient, args) -> None:
+    summoners = await client.fetch_top_summoners()
+    if not summoners:
+        logging.warning("No summoners fetched from the API.")
+        return
+    stats = DatabaseManager().update_summoners(summoners)
+    logging.info(f"Summoners: {stats['inserted']} new, {stats['updated']} updated, {stats['deleted']} removed")
+
+
+async def fetch_puuids(client: AsyncRiotClient, args) -> None:
+    fetcher = PUUIDFetcher()
+    await _run_stage(
+        fetcher.db, PUUIDS_STAGE, fetcher.iter_summoners_without_puuid,
+        host_of=lambda s: s["region"],
+        fetch=lambda s: client.get_summoner_by_id(s["summonerID"], s["region"]),
+        write=fetcher.store_puuid,
+        budget=client.budget,
+        args=args,
+    )
+
+
+async def fetch_match_ids(client: AsyncRiotClient, args) -> None:
+    fetcher = MatchIDFetcher()
+
+    async def crawl(summoner):
+        history = MatchHistoryCrawl(summoner)
+        params = history.next_page()
+        while params is not None and not client.budget.exhausted():
+            history.add_page(await client.get_matches_by_puuid(summoner["puuid"], summoner["region"], **params))
+            params = history.next_page()
+        return history
+
+    await _run_stage(
+        fetcher.db, MATCH_IDS_STAGE, fetcher.iter_summoners_for_match_fetch,
+        host_of=lambda s: get_region_routing(s["region"]),
+        fetch=crawl,
+        write=fetcher.store_match_ids,
+        budget=client.budget,
+        args=args,
+    )
+
+
+async def fetch_match_metadata(client: AsyncRiotClient, args) -> None:
+    fetcher = MatchMetadataFetcher()
+    loop = asyncio.get_running_loop()
+    # Raw store reads and writes block on SQLite, so they run off the event loop, one at a time
+    raw_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raw-store")
+
+    async def fetch_or_load(match):
+        # Matches already in the raw store are derived without an API call
+        match_data = await loop.run_in_executor(raw_io, fetcher.raw_store.get, match["match_id"])
+        if match_data is None:
+            match_data = await client.get_match_metadata(match["match_id"], match["region"])
+            await loop.run_in_executor(raw_io, fetcher.raw_store.put, match["match_id"], match["region"], match_data)
+        return match_data
+
+    try:
+        await _run_stage(
+            fetcher.db, METADATA_STAGE, fetcher.iter_matches_needing_metadata,
+            host_of=lambda m: get_region_routing(m["region"]),
+            fetch=fetch_or_load,
+            write=fetcher.store_match_metadata,
+            budget=client.budget,
+            args=args,
+        )
+    finally:
+        raw_io.shutdown()
+    update_player_stats(fetcher.db)
+
+
+async def fetch_timelines(client: AsyncRiotClient, args) -> None:
+    fetcher = TimelineFetcher()
+    await _run_stage(
+        fetcher.db, TIMELINES_STAGE, fetcher.iter_matches_needing_timeline,
+        host_of=lambda m: get_region_routing(m["region"]),
+        fetch=lambda m: client.get_match_timeline(m["match_id"], m["region"]),
+        write=fetcher.store_timeline,
+        budget=client.budget,
+        args=args,
+    )
+
+
+async def _run_stage(db: DatabaseManager, stage: str, iter_items: Callable[..., Iterator[Dict]],
+                     host_of, fetch, write, budget: RunBudget, args) -> bool:
+    """Stream a stage's work from its saved cursor, checkpointing in JobState like the batch fetchers.
+
+    Returns True if the stage reached the end of its work, in which case
+    the cursor is rewound so the next run starts a fresh pass.
+    """
+    state = db.get_job_state(stage)
+    if state['last_cursor']:
+        logging.info(f"Resuming {stage} after id {state['last_cursor']} ({state['processed']} processed so far)")
+    db.set_job_status(stage, 'running')
+
+    items = iter_items(after_id=state['last_cursor'])
+    if args.limit:
+        items = islice(items, args.limit)
+    checkpoint = Checkpoint(state['last_cursor'])
+    store = CommittingStore(db, stage, write, checkpoint, budget, commit_every=args.commit_every)
+    start_time = time.time()
+    try:
+        completed, ran_out = await run_sharded(items, host_of, fetch, store, args.concurrency, budget)
+    finally:
+        store.flush()
+    elapsed = time.time() - start_time
+    logging.info(f"Completed {completed}/{checkpoint.fed} in {elapsed:.1f} seconds")
+
+    # A limit that cut the stream short is not the end of the work
+    done = ran_out and not checkpoint.outstanding and not (args.limit and checkpoint.fed >= args.limit)
+    if done:
+        db.set_job_status(stage, 'complete', reset_cursor=True)
+        logging.info(f"Stage {stage} complete ({budget.describe()})")
+    else:
+        db.set_job_status(stage, 'stopped')
+        logging.info(f"Stopped {stage} after id {checkpoint.cursor}; the next run resumes from there")
+    return done
+
+
+STAGES = {
+    "summoners": fetch_summoners,
+    "puuids": fetch_puuids,
+    "match_ids": fetch_match_ids,
+    "metadata": fetch_match_metadata,
+    "timelines": fetch_timelines,
+}
+
+
+async def run(args) -> None:
+    budget = RunBudget.from_args(args)
+    async with AsyncRiotClient(max_concurrency_per_host=args.concurrency, budget=budget) as client:
+        for stage in args.stages:
+            if budget.exhausted():
+                logging.info(f"Budget exhausted ({budget.describe()}), skipping the remaining stages")
+                break
+            logging.info(f"\n=== Stage: {stage} ===")
+            await STAGES[stage](client, args)
+        logging.info(f"API client stats: {client.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fetch stages with the asyncio Riot client.")
+    parser.add_argument("stages", nargs="+", choices=list(STAGES), help="Stages to run, in order")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight per routing host")
+    parser.add_argument("--commit-every", type=int, default=50, help="Results per database commit")
+    parser.add_argument("--limit", type=int, default=None, help="Process at most this many items per stage")
+    add_budget_arguments(parser, batches=False)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    exporter = start_metrics_export(args)
+    try:
+        asyncio.run(run(args))
+    finally:
+        exporter.close()
+
+
+if __name__ == "__main__":
+    setup_logging("fetch_async")
+    main()
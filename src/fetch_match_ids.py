@@ -1,130 +1,259 @@
+import argparse
 import time
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Tuple
 import logging
 from datetime import datetime
 from database.db_manager import DatabaseManager
 from api.riot_client import RiotClient
 from utils.logging_config import setup_logging
+from utils.run_budget import RunBudget, add_budget_arguments
+from utils.batch_runner import run_checkpointed_batches
+from utils.metrics import add_metrics_arguments, metrics, start_metrics_export
 
 logging.basicConfig(level=logging.INFO)
 
+STAGE = "match_ids"
+
+PAGE_SIZE = 100  # match-v5 maximum
+MAX_PAGES = 10   # Safety bound per summoner and run
+WATERMARK_OVERLAP_SECONDS = 2 * 3600  # Re-list games that were in progress at the last crawl
+
+
+def crawl_start_time(summoner: Dict) -> int:
+    """startTime for a crawl: just before the watermark, or when the summoner was added."""
+    if summoner.get("listed_until"):
+        return summoner["listed_until"] - WATERMARK_OVERLAP_SECONDS
+    return int(summoner["created_at"].timestamp())
+
+
+def take_until_watermark(page: List[str], last_match_id: str = None) -> Tuple[List[str], bool]:
+    """Split a newest-first page at the watermark; returns (new IDs, crawl finished)."""
+    if last_match_id and last_match_id in page:
+        return page[:page.index(last_match_id)], True
+    return page, len(page) < PAGE_SIZE
+
+
+class MatchHistoryCrawl:
+    """Paging state of one summoner's match-history crawl.
+
+    The sync and async fetchers both drive it: ask next_page() for the
+    request arguments, fetch the page with their client and hand it to
+    add_page(), until next_page() returns None. `done` is only set once a
+    page reaches the old last_match_id or comes back short, i.e. once
+    everything since the watermark has been listed.
+
+    A summoner with a resume point (left by a crawl cut short) is first
+    paged until resume_match_id, which lists the games played since; the
+    crawl then skips the resume_start entries listed before and carries on
+    towards the watermark.
+    """
+
+    def __init__(self, summoner: Dict):
+        self.summoner = summoner
+        self.start_time = crawl_start_time(summoner)
+        # Games that ended before the crawl started are all listed once it is done
+        self.started_at = int(time.time())
+        self.match_ids = []
+        self.newest_id = None
+        self.offset = 0
+        self.pages = 0
+        self.done = False
+        self.resuming = summoner.get("resume_match_id") is not None
+
+    def next_page(self) -> Optional[Dict]:
+        """Keyword arguments for the next get_matches_by_puuid call, or None when the crawl is over."""
+        if self.done or self.pages >= MAX_PAGES:
+            return None
+        return {"start_time": self.start_time, "start": self.offset, "count": PAGE_SIZE}
+
+    def add_page(self, page_ids: List[str]) -> None:
+        if self.offset == 0 and page_ids:
+            self.newest_id = page_ids[0]
+        self.pages += 1
+        if self.resuming and self.summoner["resume_match_id"] in page_ids:
+            # Everything from here on was listed by the crawl that was cut short
+            new_count = page_ids.index(self.summoner["resume_match_id"])
+            self.match_ids.extend(page_ids[:new_count])
+            self.offset += new_count + self.summoner["resume_start"]
+            self.resuming = False
+        else:
+            new_ids, self.done = take_until_watermark(page_ids, self.summoner.get("last_match_id"))
+            self.match_ids.extend(new_ids)
+            self.offset += len(page_ids)
+        if not self.done and self.pages >= MAX_PAGES:
+            logging.warning(f"Stopped crawling {self.summoner['puuid']} after {MAX_PAGES} pages before reaching its watermark")
+
+    def resume_point(self) -> Optional[Tuple[int, str]]:
+        """(resume_start, resume_match_id) for the next run of a crawl cut short.
+
+        None if this crawl listed nothing usable, including one that never got
+        back to the previous resume point: the old resume point is kept then.
+        """
+        if self.done or self.resuming or self.newest_id is None:
+            return None
+        return self.offset, self.newest_id
+
+
 class MatchIDFetcher:
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.riot_client = RiotClient()
-        self.batch_size = 100  # Maximum calls per 2 minutes
-        self.rate_limit_window = 120  # 2 minutes in seconds
+    def __init__(self, db: DatabaseManager = None, riot_client: RiotClient = None):
+        self.db = db or DatabaseManager()
+        self.riot_client = riot_client or RiotClient()
+        self.batch_size = 100  # Summoners per batch (rate limiting is handled by RiotClient)
+
+    def iter_summoners_for_match_fetch(self, page_size: int = 500, after_id: int = 0,
+                                       region: str = None) -> Iterator[Dict]:
+        """Stream summoners that we need matches for, with their crawl watermark, one page per query."""
+        last_id = after_id
+        while True:
+            rows = self.db.get_connection().execute("""
+                SELECT s.id, s.puuid, s.region, s.created_at,
+                       w.listed_until, w.last_match_id, w.resume_start, w.resume_match_id
+                FROM Summoners s
+                LEFT JOIN MatchHistoryWatermarks w ON w.puuid = s.puuid
+                WHERE s.puuid IS NOT NULL AND s.id > ? AND s.region = COALESCE(?, s.region)
+                ORDER BY s.id
+                LIMIT ?
+            """, (last_id, region, page_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                yield {
+                    "id": row[0],
+                    "puuid": row[1], 
+                    "region": row[2],
+                    "created_at": datetime.strptime(row[3], '%Y-%m-%d %H:%M:%S'),
+                    "listed_until": row[4],
+                    "last_match_id": row[5],
+                    "resume_start": row[6],
+                    "resume_match_id": row[7]
+                }
 
     def get_summoners_for_match_fetch(self) -> List[Dict]:
         """Fetch summoners that we need matches for."""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        try:
+        return list(self.iter_summoners_for_match_fetch())
+
+    def get_watermark(self, puuid: str) -> Dict:
+        """The crawl watermark and resume point for one PUUID (all None if it was never crawled)."""
+        row = self.db.get_connection().execute(
+            "SELECT listed_until, last_match_id, resume_start, resume_match_id FROM MatchHistoryWatermarks WHERE puuid = ?",
+            (puuid,)
+        ).fetchone() or (None, None, None, None)
+        return dict(zip(("listed_until", "last_match_id", "resume_start", "resume_match_id"), row))
+
+    def crawl_match_ids(self, summoner: Dict, budget: RunBudget = None) -> MatchHistoryCrawl:
+        """Page through a summoner's match history until reaching the watermark.
+
+        The returned crawl holds the new match IDs, newest first, the number
+        of pages requested and whether the watermark was reached. The budget
+        is checked before every page, so a crawl can stop part way.
+        """
+        budget = budget or RunBudget()
+        crawl = MatchHistoryCrawl(summoner)
+        params = crawl.next_page()
+        while params is not None and not budget.exhausted():
+            with budget.charge(self.riot_client):
+                page_ids = self.riot_client.get_matches_by_puuid(summoner["puuid"], summoner["region"], **params)
+            crawl.add_page(page_ids)
+            params = crawl.next_page()
+        return crawl
+
+    def store_match_ids(self, cursor, summoner: Dict, crawl: MatchHistoryCrawl) -> List[str]:
+        """Insert a crawl's match IDs and return the ones that were new.
+
+        The watermark only advances when the crawl reached it. A crawl cut
+        short keeps the old watermark and records its resume point instead,
+        so the next run lists the rest of the gap without re-listing the
+        pages already stored.
+        """
+        new_match_ids = []
+        for match_id in crawl.match_ids:
+            # Unique constraint will handle duplicates
             cursor.execute("""
-                SELECT 
-                    s.puuid, 
-                    s.region, 
-                    COALESCE(
-                        MAX(m.created_at),  -- If they have matches, use latest match timestamp
-                        s.created_at        -- If no matches, use when they were added to database
-                    ) as start_time
-                FROM Summoners s
-                LEFT JOIN MatchIDs m ON s.puuid = m.summoner_puuid
-                WHERE s.puuid IS NOT NULL
-                GROUP BY s.puuid, s.region, s.created_at
-            """)
-            return [
-                {
-                    "puuid": row[0], 
-                    "region": row[1],
-                    "created_at": datetime.strptime(row[2], '%Y-%m-%d %H:%M:%S')
-                } 
-                for row in cursor.fetchall()
-            ]
-        finally:
-            conn.close()
-
-    def update_match_ids_batch(self, summoners: List[Dict]) -> None:
-        """Fetch and store match IDs for a batch of summoners."""
+                INSERT OR IGNORE INTO MatchIDs (
+                    match_id, summoner_puuid, region
+                ) VALUES (?, ?, ?)
+            """, (match_id, summoner["puuid"], summoner["region"]))
+            if cursor.rowcount:
+                new_match_ids.append(match_id)
+
+        if crawl.done:
+            # Everything that ended before the crawl started has been listed; the newest ID is the next stop marker
+            cursor.execute("""
+                INSERT INTO MatchHistoryWatermarks (puuid, listed_until, last_match_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(puuid) DO UPDATE SET
+                    listed_until = excluded.listed_until,
+                    last_match_id = COALESCE(excluded.last_match_id, MatchHistoryWatermarks.last_match_id),
+                    resume_start = NULL,
+                    resume_match_id = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (summoner["puuid"], crawl.started_at, crawl.newest_id))
+        elif crawl.resume_point():
+            resume_start, resume_match_id = crawl.resume_point()
+            cursor.execute("""
+                INSERT INTO MatchHistoryWatermarks (puuid, resume_start, resume_match_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(puuid) DO UPDATE SET
+                    resume_start = excluded.resume_start,
+                    resume_match_id = excluded.resume_match_id,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (summoner["puuid"], resume_start, resume_match_id))
+            logging.warning(f"Crawl of {summoner['puuid']} did not reach its watermark; resuming at entry {resume_start} next run")
+        else:
+            logging.warning(f"Crawl of {summoner['puuid']} did not reach its watermark; keeping it for the next run")
+        metrics.inc("db_rows_written_total", len(new_match_ids), table="MatchIDs")
+
+        logging.info(f"Processed {len(crawl.match_ids)} matches ({len(new_match_ids)} new) for summoner {summoner['puuid']}")
+        return new_match_ids
+
+    def update_match_ids_batch(self, summoners: List[Dict], budget: RunBudget = None) -> None:
+        """Fetch and store match IDs for a batch of summoners, committing and checkpointing each one."""
         conn = self.db.get_connection()
         cursor = conn.cursor()
+        budget = budget or RunBudget()
         try:
             for summoner in summoners:
+                if budget.exhausted():
+                    return
+                calls_before = budget.calls
                 try:
-                    # Get match IDs for this summoner
-                    match_ids = self.riot_client.get_matches_by_puuid(
-                        summoner["puuid"],
-                        summoner["region"],
-                        start_time=int(summoner["created_at"].timestamp())
-                    )
-                    
-                    # Insert match IDs (unique constraint will handle duplicates)
-                    for match_id in match_ids:
-                        cursor.execute("""
-                            INSERT OR IGNORE INTO MatchIDs (
-                                match_id, summoner_puuid, region
-                            ) VALUES (?, ?, ?)
-                        """, (match_id, summoner["puuid"], summoner["region"]))
-                    
-                    logging.info(f"Processed {len(match_ids)} matches for summoner {summoner['puuid']}")
+                    crawl = self.crawl_match_ids(summoner, budget)
+                    self.store_match_ids(cursor, summoner, crawl)
+                    self.db.save_job_state(conn, STAGE, summoner["id"], processed=1,
+                                           api_calls=budget.calls - calls_before)
 
                 except Exception as e:
                     logging.error(f"Error processing matches for summoner {summoner['puuid']}: {str(e)}")
-            
-            conn.commit()
-        finally:
-            conn.close()
-
-    def process_summoners(self, num_batches: int = None) -> None:
-        """Process summoners in batches, with option to limit number of batches."""
-        summoners = self.get_summoners_for_match_fetch()
-        total_summoners = len(summoners)
-        total_possible_batches = (total_summoners + self.batch_size - 1) // self.batch_size
-        
-        # Calculate estimated time
-        estimated_time_per_batch = self.rate_limit_window
-        total_estimated_time = total_possible_batches * estimated_time_per_batch
-
-        logging.info(f"Found {total_summoners} summoners needing match IDs")
-        logging.info(f"This will require {total_possible_batches} batches total")
-        logging.info(f"Estimated time for all batches: {total_estimated_time/60:.1f} minutes")
-
-        if num_batches is None:
-            while True:
-                try:
-                    user_input = input(f"\nHow many batches would you like to process? (1-{total_possible_batches}, or 0 for all): ")
-                    num_batches = int(user_input)
-                    if num_batches == 0:
-                        num_batches = total_possible_batches
-                    if 0 <= num_batches <= total_possible_batches:
-                        break
-                    print(f"Please enter a number between 1 and {total_possible_batches} (or 0 for all)")
-                except ValueError:
-                    print("Please enter a valid number")
-
-        batches_to_process = min(num_batches, total_possible_batches)
-        estimated_time = batches_to_process * estimated_time_per_batch
-        logging.info(f"\nProcessing {batches_to_process} batches")
-        logging.info(f"Estimated time: {estimated_time/60:.1f} minutes")
-
-        for i in range(0, min(batches_to_process * self.batch_size, total_summoners), self.batch_size):
-            batch = summoners[i:i + self.batch_size]
-            logging.info(f"\nProcessing batch {i//self.batch_size + 1} of {batches_to_process}")
-            
-            start_time = time.time()
-            self.update_match_ids_batch(batch)
-            
-            elapsed_time = time.time() - start_time
-            wait_time = max(0, self.rate_limit_window - elapsed_time)
-            
-            if wait_time > 0 and i + self.batch_size < total_summoners and i//self.batch_size + 1 < batches_to_process:
-                logging.info(f"Rate limit window - waiting {wait_time:.2f} seconds before next batch")
-                time.sleep(wait_time)
+                    self.db.save_job_state(conn, STAGE, summoner["id"], api_calls=budget.calls - calls_before)
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def process_summoners(self, num_batches: int = None, budget: RunBudget = None) -> bool:
+        """Process summoners in batches from the last checkpoint until done or out of budget."""
+        return run_checkpointed_batches(
+            self.db, STAGE,
+            self.iter_summoners_for_match_fetch,
+            self.update_match_ids_batch,
+            self.batch_size, num_batches, budget
+        )
 
 def main():
-    fetcher = MatchIDFetcher()
-    fetcher.process_summoners()
+    parser = argparse.ArgumentParser(description="Fetch new match IDs for summoners with a PUUID.")
+    add_budget_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    exporter = start_metrics_export(args)
+    try:
+        fetcher = MatchIDFetcher()
+        fetcher.process_summoners(args.batches, RunBudget.from_args(args))
+        logging.info(f"API client stats: {fetcher.riot_client.connection_stats()}")
+    finally:
+        exporter.close()
 
 if __name__ == "__main__":
     setup_logging("fetch_match_ids")
-    main() 
\ No newline at end of file
+    main()
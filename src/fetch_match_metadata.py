@@ -1,121 +1,133 @@
-import time
-from typing import List, Dict
+import argparse
+from typing import Iterator, List, Dict
 import logging
 from datetime import datetime
 from database.db_manager import DatabaseManager
+from database.raw_store import RawMatchStore
+from analysis.player_stats import update_player_stats
+from data_processing.match_tables import derive_tables
 from api.riot_client import RiotClient
 from utils.logging_config import setup_logging
+from utils.run_budget import RunBudget, add_budget_arguments
+from utils.batch_runner import run_checkpointed_batches
+from utils.metrics import add_metrics_arguments, start_metrics_export
 
 logging.basicConfig(level=logging.INFO)
 
+STAGE = "metadata"
+
 class MatchMetadataFetcher:
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.riot_client = RiotClient()
-        self.batch_size = 100  # Maximum calls per 2 minutes
-        self.rate_limit_window = 120  # 2 minutes in seconds
+    def __init__(self, db: DatabaseManager = None, riot_client: RiotClient = None):
+        self.db = db or DatabaseManager()
+        self.riot_client = riot_client or RiotClient()
+        self.raw_store = RawMatchStore()
+        self.batch_size = 100  # Matches per batch (rate limiting is handled by RiotClient)
 
-    def get_matches_needing_metadata(self) -> List[Dict]:
-        """Get matches that don't have metadata yet."""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT m.match_id, m.region
+    def iter_matches_needing_metadata(self, page_size: int = 500, max_id: int = None, after_id: int = 0,
+                                      region: str = None, newest_first: bool = False) -> Iterator[Dict]:
+        """Stream matches that don't have metadata yet, one page per query.
+
+        `newest_first` walks ids downwards from `max_id` so the most recently
+        discovered matches come first.
+        """
+        order = "DESC" if newest_first else "ASC"
+        lower, upper = after_id, max_id
+        while True:
+            rows = self.db.get_connection().execute(f"""
+                SELECT m.id, m.match_id, m.region
                 FROM MatchIDs m
                 LEFT JOIN MatchMetadata mm ON m.match_id = mm.match_id
-                WHERE mm.match_id IS NULL
-            """)
-            return [{"match_id": row[0], "region": row[1]} for row in cursor.fetchall()]
-        finally:
-            conn.close()
+                WHERE mm.match_id IS NULL AND m.id > ? AND m.id <= COALESCE(?, m.id)
+                AND m.region = COALESCE(?, m.region)
+                ORDER BY m.id {order}
+                LIMIT ?
+            """, (lower, upper, region, page_size)).fetchall()
+            if not rows:
+                return
+            if newest_first:
+                upper = rows[-1][0] - 1
+            else:
+                lower = rows[-1][0]
+            for row in rows:
+                yield {"id": row[0], "match_id": row[1], "region": row[2]}
+
+    def get_matches_needing_metadata(self) -> List[Dict]:
+        """Get matches that don't have metadata yet."""
+        return list(self.iter_matches_needing_metadata())
+
+    def fetch_match_data(self, match: Dict) -> Dict:
+        """Fetch a match-v5 payload and keep the full response in the raw store."""
+        match_data = self.riot_client.get_match_metadata(
+            match["match_id"],
+            match["region"]
+        )
+        if match_data:
+            self.raw_store.put(match["match_id"], match["region"], match_data)
+        return match_data
+
+    def store_match_metadata(self, cursor, match: Dict, match_data: Dict) -> None:
+        """Write every derived table for a match-v5 response."""
+        if match_data and match_data.get("info"):
+            derive_tables(cursor, [(match["match_id"], match_data)])
+            logging.info(f"Processed metadata for match {match['match_id']}")
 
-    def update_match_metadata_batch(self, matches: List[Dict]) -> None:
-        """Fetch and store metadata for a batch of matches."""
+    def update_match_metadata_batch(self, matches: List[Dict], budget: RunBudget = None) -> None:
+        """Fetch and store metadata for a batch of matches, committing and checkpointing each one."""
+        # Matches already in the raw store are derived without an API call
+        cached = self.raw_store.get_many([match["match_id"] for match in matches])
+        if cached:
+            logging.info(f"{len(cached)} matches found in raw store")
+
+        budget = budget or RunBudget()
         conn = self.db.get_connection()
         cursor = conn.cursor()
         try:
             for match in matches:
+                calls_before = budget.calls
                 try:
-                    # Get match metadata
-                    match_data = self.riot_client.get_match_metadata(
-                        match["match_id"],
-                        match["region"]
-                    )
-                    
-                    if match_data and match_data.get("info"):
-                        info = match_data["info"]
-                        cursor.execute("""
-                            INSERT OR IGNORE INTO MatchMetadata (
-                                match_id,
-                                game_duration,
-                                game_version,
-                                queue_id,
-                                winner_team_id,
-                                early_surrender,
-                                game_start_timestamp
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            match["match_id"],
-                            info.get("gameDuration"),
-                            info.get("gameVersion"),
-                            info.get("queueId"),
-                            100 if info.get("teams")[0].get("win") else 200,
-                            any(team.get("earlyRendered", False) for team in info.get("teams", [])),
-                            info.get("gameStartTimestamp")
-                        ))
-                        
-                        logging.info(f"Processed metadata for match {match['match_id']}")
+                    match_data = cached.get(match["match_id"])
+                    if match_data is None:
+                        if budget.exhausted():
+                            return
+                        with budget.charge(self.riot_client):
+                            match_data = self.fetch_match_data(match)
+                    self.store_match_metadata(cursor, match, match_data)
+                    self.db.save_job_state(conn, STAGE, match["id"], processed=1,
+                                           api_calls=budget.calls - calls_before)
 
                 except Exception as e:
                     logging.error(f"Error processing metadata for match {match['match_id']}: {str(e)}")
-            
-            conn.commit()
-        finally:
-            conn.close()
-
-    def process_matches(self, num_batches: int = None) -> None:
-        """Process matches in batches, with option to limit number of batches."""
-        matches = self.get_matches_needing_metadata()
-        total_matches = len(matches)
-        total_possible_batches = (total_matches + self.batch_size - 1) // self.batch_size
-        
-        logging.info(f"Found {total_matches} matches needing metadata")
-        logging.info(f"This will require {total_possible_batches} batches total")
-        
-        if num_batches is None:
-            while True:
-                try:
-                    user_input = input(f"\nHow many batches would you like to process? (1-{total_possible_batches}, or 0 for all): ")
-                    num_batches = int(user_input)
-                    if num_batches == 0:
-                        num_batches = total_possible_batches
-                    if 0 <= num_batches <= total_possible_batches:
-                        break
-                    print(f"Please enter a number between 1 and {total_possible_batches} (or 0 for all)")
-                except ValueError:
-                    print("Please enter a valid number")
+                    self.db.save_job_state(conn, STAGE, match["id"], api_calls=budget.calls - calls_before)
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
-        batches_to_process = min(num_batches, total_possible_batches)
-        
-        for i in range(0, min(batches_to_process * self.batch_size, total_matches), self.batch_size):
-            batch = matches[i:i + self.batch_size]
-            logging.info(f"\nProcessing batch {i//self.batch_size + 1} of {batches_to_process}")
-            
-            start_time = time.time()
-            self.update_match_metadata_batch(batch)
-            
-            elapsed_time = time.time() - start_time
-            wait_time = max(0, self.rate_limit_window - elapsed_time)
-            
-            if wait_time > 0 and i + self.batch_size < total_matches:
-                logging.info(f"Rate limit window - waiting {wait_time:.2f} seconds")
-                time.sleep(wait_time)
+    def process_matches(self, num_batches: int = None, budget: RunBudget = None) -> bool:
+        """Process matches in batches from the last checkpoint until done or out of budget."""
+        done = run_checkpointed_batches(
+            self.db, STAGE,
+            self.iter_matches_needing_metadata,
+            self.update_match_metadata_batch,
+            self.batch_size, num_batches, budget
+        )
+        update_player_stats(self.db)
+        return done
 
 def main():
-    fetcher = MatchMetadataFetcher()
-    fetcher.process_matches()
+    parser = argparse.ArgumentParser(description="Fetch match-v5 data for matches without metadata.")
+    add_budget_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    exporter = start_metrics_export(args)
+    try:
+        fetcher = MatchMetadataFetcher()
+        fetcher.process_matches(args.batches, RunBudget.from_args(args))
+        logging.info(f"API client stats: {fetcher.riot_client.connection_stats()}")
+    finally:
+        exporter.close()
 
 if __name__ == "__main__":
     setup_logging("fetch_match_metadata")
-    main() 
\ No newline at end of file
+    main()
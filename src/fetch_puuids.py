@@ -1,114 +1,122 @@
-import time
-from typing import List, Dict
+import argparse
+from typing import Iterator, List, Dict
 import logging
 from database.db_manager import DatabaseManager
 from api.riot_client import RiotClient
 from utils.logging_config import setup_logging
+from utils.run_budget import RunBudget, add_budget_arguments
+from utils.batch_runner import run_checkpointed_batches
+from utils.metrics import add_metrics_arguments, metrics, start_metrics_export
 
 logging.basicConfig(level=logging.INFO)
 
+STAGE = "puuids"
+
 class PUUIDFetcher:
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.riot_client = RiotClient()
-        self.batch_size = 100  # Maximum calls per 2 minutes
-        self.rate_limit_window = 120  # 2 minutes in seconds
+    def __init__(self, db: DatabaseManager = None, riot_client: RiotClient = None):
+        self.db = db or DatabaseManager()
+        self.riot_client = riot_client or RiotClient()
+        self.batch_size = 100  # Summoners per batch (rate limiting is handled by RiotClient)
+
+    def iter_summoners_without_puuid(self, page_size: int = 500, after_id: int = 0, region: str = None,
+                                     newest_first: bool = False) -> Iterator[Dict]:
+        """Stream summoners that don't have a PUUID yet, one page per query.
+
+        `newest_first` walks ids downwards so the latest ladder entries come first.
+        """
+        order = "DESC" if newest_first else "ASC"
+        lower, upper = after_id, None
+        while True:
+            rows = self.db.get_connection().execute(f"""
+                SELECT id, summonerID, region, created_at
+                FROM Summoners
+                WHERE puuid IS NULL AND id > ? AND id <= COALESCE(?, id)
+                AND region = COALESCE(?, region)
+                ORDER BY id {order}
+                LIMIT ?
+            """, (lower, upper, region, page_size)).fetchall()
+            if not rows:
+                return
+            if newest_first:
+                upper = rows[-1][0] - 1
+            else:
+                lower = rows[-1][0]
+            for row in rows:
+                yield {"id": row[0], "summonerID": row[1], "region": row[2], "created_at": row[3]}
 
     def get_summoners_without_puuid(self) -> List[Dict]:
         """Fetch summoners that don't have a PUUID yet."""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        try:
+        return list(self.iter_summoners_without_puuid())
+
+    def store_puuid(self, cursor, summoner: Dict, response: Dict) -> None:
+        """Write the PUUID from a summoner-v4 response."""
+        if response and "puuid" in response:
             cursor.execute("""
-                SELECT summonerID, region
-                FROM Summoners
-                WHERE puuid IS NULL
-            """)
-            return [{"summonerID": row[0], "region": row[1]} for row in cursor.fetchall()]
-        finally:
-            conn.close()
+                UPDATE Summoners
+                SET puuid = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE summonerID = ? AND region = ?
+            """, (response["puuid"], summoner["summonerID"], summoner["region"]))
+            metrics.inc("db_rows_written_total", cursor.rowcount, table="Summoners")
+            logging.info(f"Updated PUUID for summoner {summoner['summonerID']}")
 
-    def update_puuid_batch(self, summoners: List[Dict]) -> None:
-        """Update PUUIDs for a batch of summoners."""
+    def update_puuid_batch(self, summoners: List[Dict], budget: RunBudget = None) -> None:
+        """Update PUUIDs for a batch of summoners, committing and checkpointing each one."""
+        budget = budget or RunBudget()
         conn = self.db.get_connection()
         cursor = conn.cursor()
         try:
             for summoner in summoners:
+                if budget.exhausted():
+                    return
+                calls_before = budget.calls
                 try:
-                    response = self.riot_client.get_summoner_by_id(
-                        summoner["summonerID"], 
-                        summoner["region"]
-                    )
-                    if response and "puuid" in response:
-                        cursor.execute("""
-                            UPDATE Summoners
-                            SET puuid = ?
-                            WHERE summonerID = ? AND region = ?
-                        """, (response["puuid"], summoner["summonerID"], summoner["region"]))
-                        logging.info(f"Updated PUUID for summoner {summoner['summonerID']}")
+                    with budget.charge(self.riot_client):
+                        response = self.riot_client.get_summoner_by_id(
+                            summoner["summonerID"], 
+                            summoner["region"]
+                        )
+                    self.store_puuid(cursor, summoner, response)
+                    self.db.save_job_state(conn, STAGE, summoner["id"], processed=1,
+                                           api_calls=budget.calls - calls_before)
                 except Exception as e:
                     logging.error(f"Error updating PUUID for summoner {summoner['summonerID']}: {str(e)}")
-            
-            conn.commit()
-        finally:
-            conn.close()
-
-    def process_summoners(self, num_batches: int = None) -> None:
-        """Process summoners in batches, with option to limit number of batches."""
-        summoners = self.get_summoners_without_puuid()
-        total_summoners = len(summoners)
-        total_possible_batches = (total_summoners + self.batch_size - 1) // self.batch_size
-        
-        # Calculate estimated time
-        estimated_time_per_batch = self.rate_limit_window  # 2 minutes per batch
-        total_estimated_time = total_possible_batches * estimated_time_per_batch
-
-        logging.info(f"Found {total_summoners} summoners without PUUID")
-        logging.info(f"This will require {total_possible_batches} batches total")
-        logging.info(f"Estimated time for all batches: {total_estimated_time/60:.1f} minutes")
-
-        if num_batches is None:
-            # Ask user how many batches to process
-            while True:
-                try:
-                    user_input = input(f"\nHow many batches would you like to process? (1-{total_possible_batches}, or 0 for all): ")
-                    num_batches = int(user_input)
-                    if num_batches == 0:
-                        num_batches = total_possible_batches
-                    if 0 <= num_batches <= total_possible_batches:
-                        break
-                    print(f"Please enter a number between 1 and {total_possible_batches} (or 0 for all)")
-                except ValueError:
-                    print("Please enter a valid number")
-
-        batches_to_process = min(num_batches, total_possible_batches)
-        estimated_time = batches_to_process * estimated_time_per_batch
-        logging.info(f"\nProcessing {batches_to_process} batches")
-        logging.info(f"Estimated time: {estimated_time/60:.1f} minutes")
+                    self.db.save_job_state(conn, STAGE, summoner["id"], api_calls=budget.calls - calls_before)
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
-        for i in range(0, min(batches_to_process * self.batch_size, total_summoners), self.batch_size):
-            batch = summoners[i:i + self.batch_size]
-            logging.info(f"\nProcessing batch {i//self.batch_size + 1} of {batches_to_process}")
-            
-            start_time = time.time()
-            self.update_puuid_batch(batch)
-            
-            # Calculate time to wait before next batch
-            elapsed_time = time.time() - start_time
-            wait_time = max(0, self.rate_limit_window - elapsed_time)
-            
-            if wait_time > 0 and i + self.batch_size < total_summoners and i//self.batch_size + 1 < batches_to_process:
-                logging.info(f"Rate limit window - waiting {wait_time:.2f} seconds before next batch")
-                time.sleep(wait_time)
-
-        remaining = total_summoners - (batches_to_process * self.batch_size)
-        if remaining > 0:
-            logging.info(f"\nCompleted requested batches. {remaining} summoners remaining to be processed in the future.")
+    def process_summoners(self, num_batches: int = None, budget: RunBudget = None) -> bool:
+        """Process summoners in batches from the last checkpoint until done or out of budget."""
+        return run_checkpointed_batches(
+            self.db, STAGE,
+            self.iter_summoners_without_puuid,
+            self.update_puuid_batch,
+            self.batch_size, num_batches, budget
+        )
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Resolve PUUIDs for summoners whose league entry didn't include one (fallback stage)."
+    )
+    add_budget_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
     fetcher = PUUIDFetcher()
-    fetcher.process_summoners()
+    # Ladder ingestion stores PUUIDs from the league entries, so this is usually a no-op
+    missing = sum(summoners - with_puuid for _, _, summoners, with_puuid in fetcher.db.get_summoner_counts())
+    if not missing:
+        logging.info("All summoners already have a PUUID; nothing to do.")
+        return
+    logging.info(f"{missing} summoners are missing a PUUID")
+    exporter = start_metrics_export(args)
+    try:
+        fetcher.process_summoners(args.batches, RunBudget.from_args(args))
+        logging.info(f"API client stats: {fetcher.riot_client.connection_stats()}")
+    finally:
+        exporter.close()
 
 if __name__ == "__main__":
     setup_logging("fetch_puuids")
-    main()  
\ No newline at end of file
+    main()
@@ -1,13 +1,20 @@
+import argparse
 from api.riot_client import RiotClient
+from database.backup import BackupManager, add_backup_arguments
 from database.db_manager import DatabaseManager
 from utils.logging_config import setup_logging
 import logging
 
 def main():
+    parser = argparse.ArgumentParser(description="Fetch the Challenger and Grandmaster ladders into Summoners.")
+    parser.add_argument("--db", default="riot_data.db", help="Database file")
+    add_backup_arguments(parser)
+    args = parser.parse_args()
+
     try:
         # Initialize clients
         riot_client = RiotClient()
-        db_manager = DatabaseManager()
+        db_manager = DatabaseManager(args.db, BackupManager.from_args(args.db, args))
 
         # Fetch summoners
         logging.info("Fetching summoners from Riot API...")
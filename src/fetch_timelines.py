@@ -0,0 +1,106 @@
+import argparse
+from typing import Iterator, List, Dict
+import logging
+from database.db_manager import DatabaseManager
+from data_processing.timeline_store import TimelineStore, parse_timeline
+from api.riot_client import RiotClient
+from utils.logging_config import setup_logging
+from utils.run_budget import RunBudget, add_budget_arguments
+from utils.batch_runner import run_checkpointed_batches
+from utils.metrics import add_metrics_arguments, start_metrics_export
+
+STAGE = "timelines"
+
+class TimelineFetcher:
+    def __init__(self, db: DatabaseManager = None, riot_client: RiotClient = None, root="timelines"):
+        self.db = db or DatabaseManager()
+        self.riot_client = riot_client or RiotClient()
+        self.store = TimelineStore(self.db, root)
+        self.batch_size = 100  # Matches per batch (rate limiting is handled by RiotClient)
+
+    def iter_matches_needing_timeline(self, page_size: int = 500, after_id: int = 0) -> Iterator[Dict]:
+        """Stream matches with metadata but no stored timeline, in MatchMetadata rowid order."""
+        lower = after_id
+        while True:
+            rows = self.db.get_connection().execute("""
+                SELECT mm.rowid, mm.match_id, m.region
+                FROM MatchMetadata mm
+                JOIN MatchIDs m ON m.match_id = mm.match_id
+                LEFT JOIN TimelineIndex t ON t.match_id = mm.match_id
+                WHERE t.match_id IS NULL AND mm.rowid > ?
+                ORDER BY mm.rowid
+                LIMIT ?
+            """, (lower, page_size)).fetchall()
+            if not rows:
+                return
+            lower = rows[-1][0]
+            for row in rows:
+                yield {"id": row[0], "match_id": row[1], "region": row[2]}
+
+    def get_matches_needing_timeline(self) -> List[Dict]:
+        return list(self.iter_matches_needing_timeline())
+
+    def store_timeline(self, cursor, match: Dict, timeline: Dict) -> None:
+        """Parse a timeline response into frames and write them to the store."""
+        parsed = parse_timeline(timeline)
+        if parsed:
+            self.store.append(cursor, [(match["match_id"], *parsed)])
+            logging.info(f"Stored timeline for match {match['match_id']} ({parsed[1]} frames)")
+
+    def update_timeline_batch(self, matches: List[Dict], budget: RunBudget = None) -> None:
+        """Fetch a batch of timelines, then write their frames and checkpoint in one commit."""
+        budget = budget or RunBudget()
+        conn = self.db.get_connection()
+        parsed, last_id, calls_before = [], None, budget.calls
+        for match in matches:
+            if budget.exhausted():
+                break
+            try:
+                with budget.charge(self.riot_client):
+                    timeline = self.riot_client.get_match_timeline(match["match_id"], match["region"])
+                frames = parse_timeline(timeline)
+                if frames:
+                    parsed.append((match["match_id"], *frames))
+            except Exception as e:
+                logging.error(f"Error fetching timeline for match {match['match_id']}: {str(e)}")
+            last_id = match["id"]
+
+        if last_id is None:
+            return
+        # Frames are parsed into ~10 KB arrays as they arrive, so a batch never holds the JSON payloads
+        try:
+            self.store.append(conn.cursor(), parsed)
+            self.db.save_job_state(conn, STAGE, last_id, processed=len(parsed), api_calls=budget.calls - calls_before)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logging.info(f"Stored {len(parsed)} timelines")
+
+    def process_matches(self, num_batches: int = None, budget: RunBudget = None) -> bool:
+        """Process matches in batches from the last checkpoint until done or out of budget."""
+        return run_checkpointed_batches(
+            self.db, STAGE,
+            self.iter_matches_needing_timeline,
+            self.update_timeline_batch,
+            self.batch_size, num_batches, budget
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch match-v5 timelines into the frame store.")
+    parser.add_argument("--root", default="timelines", help="Directory of timeline chunk files")
+    add_budget_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    exporter = start_metrics_export(args)
+    try:
+        fetcher = TimelineFetcher(root=args.root)
+        fetcher.process_matches(args.batches, RunBudget.from_args(args))
+        logging.info(f"API client stats: {fetcher.riot_client.connection_stats()}")
+    finally:
+        exporter.close()
+
+if __name__ == "__main__":
+    setup_logging("fetch_timelines")
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import logging
+from database.backup import BackupManager
+from utils.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create, list, prune and restore database backups.")
+    parser.add_argument("--db", default="riot_data.db", help="Database file")
+    parser.add_argument("--backup-dir", default="backups", help="Backup directory")
+    parser.add_argument("--keep-hourly", type=int, default=24, help="Hourly backups to keep")
+    parser.add_argument("--keep-daily", type=int, default=14, help="Daily backups to keep")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create = subparsers.add_parser("create", help="Create an online backup")
+    create.add_argument("--compress", action="store_true", help="gzip the backup")
+    subparsers.add_parser("list", help="List backups, newest first")
+    subparsers.add_parser("prune", help="Apply the retention policy")
+    restore = subparsers.add_parser("restore", help="Restore a backup into the database")
+    restore.add_argument("backup", help="Backup file to restore")
+
+    args = parser.parse_args()
+    manager = BackupManager(
+        args.db,
+        backup_dir=args.backup_dir,
+        keep_hourly=args.keep_hourly,
+        keep_daily=args.keep_daily,
+        compress=getattr(args, "compress", False),
+    )
+
+    if args.command == "create":
+        manager.create_backup()
+    elif args.command == "list":
+        for path in manager.list_backups():
+            print(f"{manager.backup_time(path):%Y-%m-%d %H:%M:%S}  {path.stat().st_size / 1e6:10.1f} MB  {path}")
+    elif args.command == "prune":
+        removed = manager.prune()
+        logging.info(f"Removed {len(removed)} backups")
+    elif args.command == "restore":
+        manager.restore(args.backup)
+
+
+if __name__ == "__main__":
+    setup_logging("manage_backups")
+    main()
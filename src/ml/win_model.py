@@ -0,0 +1,223 @@
+"""Incrementally trained blue-side win probability model.
+
+The model is a logistic-loss SGDClassifier over assemble_vector's
+features. Each training run loads the latest version, calls partial_fit
+on mini-batches from the feature parts built since that version was
+trained, and saves the result as a new version:
+
+    {root}/v0001/model.joblib
+    {root}/v0001/metadata.json   # parent, trained_through rowid, metrics, ...
+    {root}/LATEST
+
+A fixed hash of the match ID keeps HOLDOUT_FRACTION of matches out of
+training for good. Holdout metrics are reported per patch for the
+matches added in the run, and accumulated per patch across versions, so
+a nightly refresh only ever reads the day's new parts.
+"""
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import roc_auc_score
+
+from data_processing.features import assemble_vector, feature_names
+
+HOLDOUT_FRACTION = 0.1
+PART_NAME = re.compile(r"part-(\d+)-(\d+)\.npz$")
+
+
+def is_holdout(match_ids: np.ndarray, fraction: float = HOLDOUT_FRACTION) -> np.ndarray:
+    """Stable train/holdout split: the same match is always on the same side."""
+    buckets = np.array([zlib.crc32(m if isinstance(m, bytes) else m.encode()) % 10_000 for m in match_ids])
+    return buckets < fraction * 10_000
+
+
+def new_model(seed: int = 0) -> SGDClassifier:
+    # The "optimal" schedule starts with steps of 1/alpha, which saturates the
+    # probabilities when a run only brings a few thousand matches
+    return SGDClassifier(loss="log_loss", alpha=1e-4, learning_rate="invscaling", eta0=0.05, random_state=seed)
+
+
+def parts_after(features_root: str, rowid: int) -> List[Tuple[int, Path]]:
+    """Feature parts whose rows all come after `rowid`, in rowid order."""
+    parts = []
+    for path in Path(features_root).glob("part-*.npz"):
+        match = PART_NAME.search(path.name)
+        if match and int(match.group(1)) > rowid:
+            parts.append((int(match.group(2)), path))
+    return sorted(parts)
+
+
+class ModelRegistry:
+    """Numbered model versions on disk with a LATEST pointer."""
+
+    def __init__(self, root="models/win_model"):
+        self.root = Path(root)
+
+    def versions(self) -> List[int]:
+        return sorted(int(p.name[1:]) for p in self.root.glob("v[0-9]*") if (p / "metadata.json").exists())
+
+    def latest_version(self) -> Optional[int]:
+        pointer = self.root / "LATEST"
+        if pointer.exists():
+            return int(pointer.read_text().strip())
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def _dir(self, version: int) -> Path:
+        return self.root / f"v{version:04d}"
+
+    def metadata(self, version: int = None) -> Optional[Dict]:
+        version = version or self.latest_version()
+        if version is None:
+            return None
+        with open(self._dir(version) / "metadata.json") as f:
+            return json.load(f)
+
+    def load(self, version: int = None) -> Tuple[Optional[SGDClassifier], Optional[Dict]]:
+        """The given (default: latest) version's model and metadata, or (None, None)."""
+        version = version or self.latest_version()
+        if version is None:
+            return None, None
+        return joblib.load(self._dir(version) / "model.joblib"), self.metadata(version)
+
+    def save(self, model: SGDClassifier, metadata: Dict) -> int:
+        """Write a new version and point LATEST at it; returns the version number."""
+        version = (self.versions() or [0])[-1] + 1
+        directory = self._dir(version)
+        directory.mkdir(parents=True)
+        metadata = {**metadata, "version": version}
+        joblib.dump(model, directory / "model.joblib")
+        with open(directory / "metadata.json", "w") as f:
+            json.dump(metadata, f, indent=2)
+
+        # LATEST moves last, so readers never see a half-written version
+        tmp = self.root / "LATEST.tmp"
+        tmp.write_text(str(version))
+        os.replace(tmp, self.root / "LATEST")
+        return version
+
+
+class PatchMetrics:
+    """Holdout accuracy, log loss and AUC per patch."""
+
+    def __init__(self):
+        self.labels = defaultdict(list)
+        self.probabilities = defaultdict(list)
+
+    def add(self, patches: np.ndarray, labels: np.ndarray, probabilities: np.ndarray) -> None:
+        for patch in np.unique(patches):
+            mask = patches == patch
+            key = patch.decode() if isinstance(patch, bytes) else str(patch)
+            self.labels[key].append(labels[mask])
+            self.probabilities[key].append(probabilities[mask])
+
+    def report(self) -> Dict[str, Dict]:
+        report = {}
+        for patch in sorted(self.labels):
+            y = np.concatenate(self.labels[patch])
+            p = np.clip(np.concatenate(self.probabilities[patch]), 1e-7, 1 - 1e-7)
+            report[patch] = {
+                "matches": int(len(y)),
+                "correct": int(((p >= 0.5) == y).sum()),
+                "log_loss_sum": float(-(y * np.log(p) + (1 - y) * np.log(1 - p)).sum()),
+                "accuracy": float(((p >= 0.5) == y).mean()),
+                "log_loss": float(-(y * np.log(p) + (1 - y) * np.log(1 - p)).mean()),
+                "auc": float(roc_auc_score(y, p)) if 0 < y.sum() < len(y) else None,
+            }
+        return report
+
+
+def accumulate(previous: Dict[str, Dict], run: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Fold one run's per-patch holdout counts into the running totals."""
+    totals = {patch: dict(values) for patch, values in previous.items()}
+    for patch, values in run.items():
+        total = totals.setdefault(patch, {"matches": 0, "correct": 0, "log_loss_sum": 0.0})
+        total["matches"] += values["matches"]
+        total["correct"] += values["correct"]
+        total["log_loss_sum"] += values["log_loss_sum"]
+    for total in totals.values():
+        total["accuracy"] = total["correct"] / total["matches"]
+        total["log_loss"] = total["log_loss_sum"] / total["matches"]
+    return totals
+
+
+def train_incremental(features_root="features", model_root="models/win_model", batch_size: int = 4096,
+                      from_scratch: bool = False, seed: int = 0) -> Optional[Dict]:
+    """Train the latest model on feature parts added since it was saved.
+
+    Returns the new version's metadata, or None if there was nothing new.
+    """
+    registry = ModelRegistry(model_root)
+    model, parent = (None, None) if from_scratch else registry.load()
+    width = len(feature_names())
+    if parent and parent["n_features"] != width:
+        raise ValueError(
+            f"Feature layout changed ({parent['n_features']} -> {width} columns); retrain with --from-scratch"
+        )
+    if model is None:
+        model = new_model(seed)
+
+    trained_through = parent["trained_through"] if parent else 0
+    parts = parts_after(features_root, trained_through)
+    if not parts:
+        logging.info(f"No feature parts after rowid {trained_through}; model v{parent['version']} is current"
+                     if parent else "No feature parts found; run build_features.py first")
+        return None
+
+    rng = np.random.default_rng(seed + trained_through)
+    holdout_sets = []
+    trained = 0
+    start_time = time.time()
+    for last_rowid, path in parts:
+        with np.load(path) as part:
+            arrays = {name: part[name] for name in ("match_id", "champions", "numeric", "region", "patch", "label")}
+        holdout = is_holdout(arrays["match_id"])
+        X = assemble_vector(arrays["champions"], arrays["numeric"], arrays["region"], arrays["patch"])
+        y = arrays["label"].astype(np.int64)
+
+        train_rows = rng.permutation(np.flatnonzero(~holdout))
+        for start in range(0, len(train_rows), batch_size):
+            batch = train_rows[start:start + batch_size]
+            model.partial_fit(X[batch], y[batch], classes=np.array([0, 1]))
+        trained += len(train_rows)
+        trained_through = last_rowid
+        # Kept compact; scored once the model has seen every new part
+        holdout_sets.append({name: values[holdout] for name, values in arrays.items()})
+
+    metrics = PatchMetrics()
+    if hasattr(model, "coef_"):
+        for held in holdout_sets:
+            if len(held["label"]):
+                X = assemble_vector(held["champions"], held["numeric"], held["region"], held["patch"])
+                metrics.add(held["patch"], held["label"].astype(np.int64), model.predict_proba(X)[:, 1])
+
+    run_metrics = metrics.report()
+    metadata = {
+        "parent": parent["version"] if parent else None,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "trained_through": trained_through,
+        "examples_seen": (parent["examples_seen"] if parent else 0) + trained,
+        "examples_this_run": trained,
+        "n_features": width,
+        "holdout_fraction": HOLDOUT_FRACTION,
+        "batch_size": batch_size,
+        "sklearn_version": sklearn.__version__,
+        "holdout_this_run": run_metrics,
+        "holdout_cumulative": accumulate(parent["holdout_cumulative"] if parent else {}, run_metrics),
+    }
+    version = registry.save(model, metadata)
+    logging.info(f"Saved model v{version}: {trained} new examples through rowid {trained_through} "
+                 f"in {time.time() - start_time:.1f} seconds")
+    return registry.metadata(version)
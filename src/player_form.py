@@ -0,0 +1,28 @@
+import argparse
+from analysis.player_stats import WINDOW_DAYS, player_form, update_player_stats
+from database.db_manager import DatabaseManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bring PlayerStats up to date and show players' recent form.")
+    parser.add_argument("puuids", nargs="*", help="Players to show")
+    parser.add_argument("--days", type=int, default=7, help=f"Rolling window in days (at most {WINDOW_DAYS})")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute PlayerStats from scratch")
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    added = update_player_stats(db, rebuild=args.rebuild)
+    print(f"Folded in {added} new participant rows")
+
+    for puuid in args.puuids:
+        form = player_form(db.get_connection(), puuid, args.days)
+        print(f"\n=== {puuid} ===")
+        if form is None:
+            print("No stored games")
+            continue
+        for key, value in form.items():
+            print(f"{key}: {f'{value:.3f}' if isinstance(value, float) else value}")
+
+
+if __name__ == "__main__":
+    main()
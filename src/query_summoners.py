@@ -1,57 +1,50 @@
+from collections import Counter
 from database.db_manager import DatabaseManager
-import sqlite3
 
 def query_summoner_stats():
     db = DatabaseManager()
-    conn = sqlite3.connect(db.db_path)
-    cursor = conn.cursor()
+
+    # Counts are kept up to date by triggers, so this reads a few rows per region
+    counts = db.get_summoner_counts()
 
     print("\n=== Summoners by Rank ===")
-    cursor.execute("""
-        SELECT rank, COUNT(*) as count
-        FROM Summoners
-        GROUP BY rank
-        ORDER BY count DESC
-    """)
-    for rank, count in cursor.fetchall():
+    by_rank = Counter()
+    for _, rank, summoners, _ in counts:
+        by_rank[rank] += summoners
+    for rank, count in by_rank.most_common():
         print(f"{rank}: {count}")
 
     print("\n=== Summoners by Region ===")
-    cursor.execute("""
-        SELECT region, COUNT(*) as count
-        FROM Summoners
-        GROUP BY region
-        ORDER BY count DESC
-    """)
-    for region, count in cursor.fetchall():
+    by_region = Counter()
+    for region, _, summoners, _ in counts:
+        by_region[region] += summoners
+    for region, count in by_region.most_common():
         print(f"{region}: {count}")
 
     print("\n=== Summoners by Region and Rank ===")
-    cursor.execute("""
-        SELECT region, rank, COUNT(*) as count
-        FROM Summoners
-        GROUP BY region, rank
-        ORDER BY region, rank
-    """)
     current_region = None
-    for region, rank, count in cursor.fetchall():
+    for region, rank, count, _ in counts:
         if region != current_region:
             print(f"\n{region}:")
             current_region = region
         print(f"  {rank}: {count}")
 
+    print("\n=== PUUID Coverage ===")
+    with_puuid = Counter()
+    for region, _, _, puuids in counts:
+        with_puuid[region] += puuids
+    for region in sorted(by_region):
+        print(f"{region}: {with_puuid[region]}/{by_region[region]} ({with_puuid[region] / by_region[region] * 100:.1f}%)")
+
+    print("\n=== Match Metadata Coverage ===")
+    for region, match_ids, with_metadata in db.get_match_coverage():
+        print(f"{region}: {with_metadata}/{match_ids} ({with_metadata / match_ids * 100:.1f}%)")
+
     # Show one random example at the end
     print("\n=== Example Summoner ===")
-    cursor.execute("""
-        SELECT summonerID, region, rank
-        FROM Summoners
-        ORDER BY RANDOM()
-        LIMIT 1
-    """)
-    example = cursor.fetchone()
-    print(f"Random summoner: {example}")
+    example = db.sample_rows("Summoners", ["summonerID", "region", "rank"], 1)
+    print(f"Random summoner: {example[0] if example else None}")
 
-    conn.close()
 
 if __name__ == "__main__":
-    query_summoner_stats() 
\ No newline at end of file
+    query_summoner_stats()
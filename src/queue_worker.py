@@ -0,0 +1,218 @@
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+
+from analysis.player_stats import update_player_stats
+from api.riot_client import RiotClient
+from database.db_manager import DatabaseManager
+from database.work_queue import WorkQueue, default_worker_id
+from fetch_puuids import PUUIDFetcher
+from fetch_match_ids import MatchIDFetcher
+from fetch_match_metadata import MatchMetadataFetcher
+from utils.logging_config import setup_logging
+from utils.metrics import add_metrics_arguments, metrics, start_metrics_export
+from utils.run_budget import RunBudget, add_budget_arguments
+
+KINDS = ("puuids", "match_ids", "metadata")
+
+
+def summoner_job(summoner: Dict):
+    return f"{summoner['region']}:{summoner['summonerID']}", {
+        "summonerID": summoner["summonerID"], "region": summoner["region"], "created_at": summoner["created_at"],
+    }
+
+
+def match_ids_job(puuid: str, region: str, created_at: str):
+    return puuid, {"puuid": puuid, "region": region, "created_at": created_at}
+
+
+def metadata_job(match_id: str, region: str):
+    return match_id, {"match_id": match_id, "region": region}
+
+
+class QueueWorker:
+    """Claims PUUID, match-ID and metadata jobs from the shared WorkQueue.
+
+    Each job's results, its follow-up jobs (a resolved PUUID queues its
+    match-ID crawl, new match IDs queue their metadata, stored metadata
+    is folded into PlayerStats) and its removal from the queue commit
+    together. Run as many workers as the API keys'
+    rate limits allow; each process paces itself from the rate limit
+    headers, which count every request made with its key.
+    """
+
+    def __init__(self, worker_id: str = None, batch_size: int = 20, lease_seconds: float = 300,
+                 max_attempts: int = 5):
+        self.db = DatabaseManager()
+        self.queue = WorkQueue(self.db, lease_seconds, max_attempts)
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size
+
+        # One client, so the three stages share one view of the rate limits
+        self.riot_client = RiotClient()
+        self.puuid_fetcher = PUUIDFetcher(self.db, self.riot_client)
+        self.match_id_fetcher = MatchIDFetcher(self.db, self.riot_client)
+        self.metadata_fetcher = MatchMetadataFetcher(self.db, self.riot_client)
+
+        self.handlers = {
+            "puuids": self._resolve_puuid,
+            "match_ids": self._fetch_match_ids,
+            "metadata": self._fetch_metadata,
+        }
+        self._stop = threading.Event()
+
+    def seed(self, kinds=KINDS) -> Dict[str, int]:
+        """Queue all outstanding work of `kinds` found in the database."""
+        conn = self.db.get_connection()
+        sources = {
+            "puuids": lambda: (summoner_job(s) for s in self.puuid_fetcher.iter_summoners_without_puuid()),
+            "match_ids": lambda: (
+                match_ids_job(s["puuid"], s["region"], s["created_at"].strftime('%Y-%m-%d %H:%M:%S'))
+                for s in self.match_id_fetcher.iter_summoners_for_match_fetch()
+            ),
+            "metadata": lambda: (
+                metadata_job(m["match_id"], m["region"]) for m in self.metadata_fetcher.iter_matches_needing_metadata()
+            ),
+        }
+        counts = {}
+        for kind in kinds:
+            counts[kind] = self.queue.enqueue(conn, kind, sources[kind]())
+            conn.commit()
+            logging.info(f"Queued {counts[kind]} new {kind} jobs")
+        return counts
+
+    def _resolve_puuid(self, conn, job: Dict, budget: RunBudget) -> None:
+        summoner = job["payload"]
+        with budget.charge(self.riot_client):
+            response = self.riot_client.get_summoner_by_id(summoner["summonerID"], summoner["region"])
+        self.puuid_fetcher.store_puuid(conn.cursor(), summoner, response)
+        if response and "puuid" in response:
+            self.queue.enqueue(conn, "match_ids", [
+                match_ids_job(response["puuid"], summoner["region"], summoner["created_at"])
+            ])
+
+    def _fetch_match_ids(self, conn, job: Dict, budget: RunBudget) -> None:
+        payload = job["payload"]
+        # The watermark is read now, not when the job was queued
+        summoner = {
+            **payload,
+            "created_at": datetime.strptime(payload["created_at"], '%Y-%m-%d %H:%M:%S'),
+            **self.match_id_fetcher.get_watermark(payload["puuid"]),
+        }
+        crawl = self.match_id_fetcher.crawl_match_ids(summoner, budget)
+        new_match_ids = self.match_id_fetcher.store_match_ids(conn.cursor(), summoner, crawl)
+        self.queue.enqueue(conn, "metadata", [
+            metadata_job(match_id, summoner["region"]) for match_id in new_match_ids
+        ])
+
+    def _fetch_metadata(self, conn, job: Dict, budget: RunBudget) -> None:
+        match = job["payload"]
+        match_data = self.metadata_fetcher.raw_store.get(match["match_id"])
+        if match_data is None:
+            with budget.charge(self.riot_client):
+                match_data = self.metadata_fetcher.fetch_match_data(match)
+        # Take the write lock before update_player_stats reads its watermark, so another
+        # worker can't fold the same participant rows between the read and our commit
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        self.metadata_fetcher.store_match_metadata(conn.cursor(), match, match_data)
+        update_player_stats(self.db, commit=False)
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.heartbeat(self.worker_id)
+            except Exception as e:
+                logging.warning(f"Heartbeat failed: {str(e)}")
+
+    def run(self, kinds=KINDS, budget: RunBudget = None, follow: bool = False, num_batches: int = None,
+            poll_interval: float = 5) -> Dict[str, int]:
+        """Process jobs until the queue is empty (or forever with `follow`) or the budget is spent.
+
+        `num_batches` limits how many batches of each kind are claimed.
+        """
+        budget = budget or RunBudget()
+        rounds = 0
+        done = {kind: 0 for kind in kinds}
+        heartbeat = threading.Thread(target=self._heartbeat, name="queue-heartbeat", daemon=True)
+        heartbeat.start()
+        conn = self.db.get_connection()
+        logging.info(f"Worker {self.worker_id} started on {', '.join(kinds)}")
+        try:
+            while not budget.exhausted() and (num_batches is None or rounds < num_batches):
+                rounds += 1
+                claimed = 0
+                for kind in kinds:
+                    jobs = self.queue.claim(kind, self.worker_id, self.batch_size)
+                    claimed += len(jobs)
+                    for job in jobs:
+                        if budget.exhausted():
+                            break
+                        try:
+                            self.handlers[kind](conn, job, budget)
+                            if not self.queue.complete(conn, kind, job["key"], self.worker_id):
+                                logging.warning(f"Lease on {kind} job {job['key']} was lost; results kept")
+                            conn.commit()
+                            done[kind] += 1
+                            metrics.inc("work_queue_jobs_total", kind=kind, result="done")
+                        except Exception as e:
+                            conn.rollback()
+                            logging.error(f"Error processing {kind} job {job['key']}: {str(e)}")
+                            self.queue.fail(kind, job["key"], self.worker_id, str(e))
+                            metrics.inc("work_queue_jobs_total", kind=kind, result="failed")
+                    # Jobs left over when the budget ran out go back to the queue below
+                    if budget.exhausted():
+                        break
+                if not claimed:
+                    if not follow:
+                        break
+                    time.sleep(poll_interval)
+        finally:
+            self._stop.set()
+            heartbeat.join()
+            released = self.queue.release(self.worker_id)
+            if released:
+                logging.info(f"Released {released} unfinished jobs")
+        logging.info(f"Worker {self.worker_id} finished: {done} ({budget.describe()})")
+        return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pull PUUID, match-ID and metadata jobs from the shared work queue.")
+    parser.add_argument("command", choices=["seed", "work", "status"],
+                        help="seed: queue outstanding work; work: process jobs; status: show queue counts")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS), help="Job kinds to seed or work on")
+    parser.add_argument("--batch-size", type=int, default=20, help="Jobs claimed per lease")
+    parser.add_argument("--lease-seconds", type=float, default=300,
+                        help="How long a claimed job stays leased without a heartbeat")
+    parser.add_argument("--max-attempts", type=int, default=5, help="Attempts before a job is left dead")
+    parser.add_argument("--worker-id", default=None, help="Lease owner name (default: host-pid)")
+    parser.add_argument("--follow", action="store_true", help="Keep polling for new jobs instead of exiting")
+    add_budget_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        queue = WorkQueue(DatabaseManager(), args.lease_seconds, args.max_attempts)
+        for kind, counts in sorted(queue.stats().items()):
+            print(f"{kind}: " + ", ".join(f"{counts[state]} {state}" for state in counts))
+        return
+
+    exporter = start_metrics_export(args)
+    try:
+        worker = QueueWorker(args.worker_id, args.batch_size, args.lease_seconds, args.max_attempts)
+        if args.command == "seed":
+            worker.seed(args.kinds)
+        else:
+            worker.run(args.kinds, RunBudget.from_args(args), args.follow, args.batches)
+            logging.info(f"API client stats: {worker.riot_client.connection_stats()}")
+    finally:
+        exporter.close()
+
+
+if __name__ == "__main__":
+    setup_logging("queue_worker")
+    main()
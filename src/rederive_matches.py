@@ -0,0 +1,43 @@
+import argparse
+import logging
+import time
+from database.db_manager import DatabaseManager
+from database.raw_store import RawMatchStore
+from data_processing.match_tables import DERIVED_TABLES, derive_tables
+from utils.logging_config import setup_logging
+
+
+def rederive(tables=None, batch_size: int = 2000, region: str = None) -> dict:
+    """Rebuild derived tables from the raw match store without any API calls."""
+    db = DatabaseManager()
+    raw_store = RawMatchStore()
+    totals = {table: 0 for table in tables or DERIVED_TABLES}
+
+    logging.info(f"Re-deriving {', '.join(totals)} from {raw_store.count()} stored matches")
+    start_time = time.time()
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    for batch in raw_store.iter_matches(batch_size=batch_size, region=region):
+        counts = derive_tables(cursor, [(match_id, payload) for match_id, _, payload in batch], tables)
+        conn.commit()
+        for table, count in counts.items():
+            totals[table] += count
+        logging.info(f"Re-derived {sum(totals.values())} rows so far")
+
+    logging.info(f"Finished in {time.time() - start_time:.1f} seconds: {totals}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild derived match tables from stored raw payloads.")
+    parser.add_argument("--tables", nargs="+", choices=list(DERIVED_TABLES), help="Tables to rebuild (default: all)")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Matches per transaction")
+    parser.add_argument("--region", help="Only re-derive matches from this platform region")
+    args = parser.parse_args()
+    rederive(args.tables, args.batch_size, args.region)
+
+
+if __name__ == "__main__":
+    setup_logging("rederive_matches")
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from analysis.player_stats import update_player_stats
+from api.riot_client import RiotClient, get_region_routing
+from database.db_manager import DatabaseManager
+from fetch_puuids import PUUIDFetcher
+from fetch_match_ids import MatchIDFetcher
+from fetch_match_metadata import MatchMetadataFetcher
+from utils.logging_config import setup_logging
+from utils.metrics import add_metrics_arguments, start_metrics_export
+from utils.run_budget import RunBudget, add_budget_arguments
+from utils.scheduler import FRESH, RegionScheduler
+
+class IngestionPipeline:
+    """Ladder -> PUUID -> match IDs -> metadata on a host-sharded scheduler.
+
+    A PUUID resolved by the first stage goes straight to match-ID fetching,
+    and every newly inserted match ID goes straight to metadata fetching,
+    ahead of older backlog. Work is queued per API host (see
+    utils/scheduler.py), so every region's rate limit is used in parallel.
+    Backlog from earlier runs is streamed in per region, newest first, with
+    backpressure, so memory use is bounded by the queue size rather than
+    the size of the backlog.
+
+    All stages spend from one RunBudget. Once it is exhausted the seeders
+    stop and queued items are dropped unprocessed; they are still
+    outstanding in the database, so the next run picks them up.
+    """
+
+    def __init__(self, workers_per_host: int = 4, queue_size: int = 500):
+        self.db = DatabaseManager()
+        self.riot_client = RiotClient(pool_maxsize=workers_per_host)
+
+        # Every stage shares the runner's client and database, so they draw from one set of rate limits
+        self.puuid_fetcher = PUUIDFetcher(self.db, self.riot_client)
+        self.match_id_fetcher = MatchIDFetcher(self.db, self.riot_client)
+        self.metadata_fetcher = MatchMetadataFetcher(self.db, self.riot_client)
+
+        self.scheduler = RegionScheduler({
+            "puuids": self._resolve_puuid,
+            "match_ids": self._fetch_match_ids,
+            "metadata": self._fetch_metadata,
+        }, workers_per_host, queue_size)
+
+        # PUUIDs already handed to the match-ID stage during this run
+        self._streamed_puuids = set()
+        self._streamed_lock = threading.Lock()
+        self.budget = RunBudget()
+
+    def _until_exhausted(self, items: Iterable[Dict]) -> Iterable[Dict]:
+        return itertools.takewhile(lambda _: not self.budget.exhausted(), items)
+
+    def _resolve_puuid(self, summoner: Dict) -> None:
+        if self.budget.exhausted():
+            return
+        with self.budget.charge(self.riot_client):
+            response = self.riot_client.get_summoner_by_id(summoner["summonerID"], summoner["region"])
+        has_puuid = response and "puuid" in response
+        if has_puuid:
+            # Registered before the commit so the match-ID seeder never sees it unmarked
+            with self._streamed_lock:
+                self._streamed_puuids.add(response["puuid"])
+
+        conn = self.db.get_connection()
+        self.puuid_fetcher.store_puuid(conn.cursor(), summoner, response)
+        conn.commit()
+
+        if has_puuid:
+            self.scheduler.submit("match_ids", get_region_routing(summoner["region"]), {
+                "puuid": response["puuid"],
+                "region": summoner["region"],
+                "created_at": datetime.strptime(summoner["created_at"], '%Y-%m-%d %H:%M:%S'),
+                **self.match_id_fetcher.get_watermark(response["puuid"]),
+            }, FRESH)
+
+    def _fetch_match_ids(self, summoner: Dict) -> None:
+        if self.budget.exhausted():
+            return
+        crawl = self.match_id_fetcher.crawl_match_ids(summoner, self.budget)
+        conn = self.db.get_connection()
+        new_match_ids = self.match_id_fetcher.store_match_ids(conn.cursor(), summoner, crawl)
+        conn.commit()
+
+        for match_id in new_match_ids:
+            self.scheduler.submit(
+                "metadata", get_region_routing(summoner["region"]),
+                {"match_id": match_id, "region": summoner["region"]}, FRESH
+            )
+
+    def _fetch_metadata(self, match: Dict) -> None:
+        match_data = self.metadata_fetcher.raw_store.get(match["match_id"])
+        if match_data is None:
+            if self.budget.exhausted():
+                return
+            with self.budget.charge(self.riot_client):
+                match_data = self.metadata_fetcher.fetch_match_data(match)
+        conn = self.db.get_connection()
+        self.metadata_fetcher.store_match_metadata(conn.cursor(), match, match_data)
+        conn.commit()
+
+    def _regions(self) -> List[str]:
+        regions = {row[0] for row in self.db.get_summoner_counts()}
+        regions.update(row[0] for row in self.db.get_match_coverage())
+        return sorted(regions)
+
+    def _max_match_row_id(self) -> Optional[int]:
+        return self.db.get_connection().execute("SELECT MAX(id) FROM MatchIDs").fetchone()[0]
+
+    def refresh_ladder(self) -> None:
+        logging.info("Fetching summoners from Riot API...")
+        with self.budget.charge(self.riot_client):
+            summoners = self.riot_client.fetch_top_summoners()
+        if not summoners:
+            logging.warning("No summoners fetched from the API.")
+            return
+        stats = self.db.update_summoners(summoners)
+        logging.info(f"Ladder: {stats['inserted']} new, {stats['updated']} updated, {stats['deleted']} removed")
+
+    def run(self, refresh_ladder: bool = False, budget: RunBudget = None) -> Dict[str, Dict[str, int]]:
+        start_time = time.time()
+        self.budget = budget or RunBudget()
+        if refresh_ladder:
+            self.refresh_ladder()
+
+        # Existing metadata backlog stops at the current last row; anything
+        # inserted after this arrives through the match-ID stage instead.
+        max_match_row_id = self._max_match_row_id()
+
+        # One seeder per region and stage, so a region whose host queue is
+        # full only holds back its own backlog
+        seeders = []
+        for region in self._regions():
+            seeders.append(self.scheduler.seed(
+                "puuids",
+                self._until_exhausted(self.puuid_fetcher.iter_summoners_without_puuid(region=region, newest_first=True)),
+                host_of=lambda s: s["region"],
+            ))
+            seeders.append(self.scheduler.seed(
+                "match_ids",
+                self._until_exhausted(
+                    s for s in self.match_id_fetcher.iter_summoners_for_match_fetch(region=region)
+                    if s["puuid"] not in self._streamed_puuids
+                ),
+                host_of=lambda s: get_region_routing(s["region"]),
+            ))
+            if max_match_row_id:
+                seeders.append(self.scheduler.seed(
+                    "metadata",
+                    self._until_exhausted(self.metadata_fetcher.iter_matches_needing_metadata(
+                        max_id=max_match_row_id, region=region, newest_first=True
+                    )),
+                    host_of=lambda m: get_region_routing(m["region"]),
+                ))
+
+        # Follow-up work is submitted before the item that produced it is
+        # marked done, so once the seeders finish, join() covers everything.
+        for seeder in seeders:
+            seeder.join()
+        self.scheduler.join()
+        self.scheduler.close()
+        update_player_stats(self.db)
+
+        for (host, kind), counts in sorted(self.scheduler.stats.items()):
+            logging.info(f"{host}/{kind}: {counts['processed']} processed, {counts['errors']} errors")
+        if self.budget.exhausted():
+            logging.info(f"Budget exhausted ({self.budget.describe()}); remaining work is left for the next run")
+        logging.info(f"Pipeline finished in {time.time() - start_time:.1f} seconds")
+        logging.info(f"API client stats: {self.riot_client.connection_stats()}")
+        return self.scheduler.totals()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the full ingestion pipeline with streaming hand-off between stages.")
+    parser.add_argument("--refresh-ladder", action="store_true", help="Fetch the Challenger/Grandmaster ladders first")
+    parser.add_argument("--workers", type=int, default=4, help="Worker threads per API host")
+    parser.add_argument("--queue-size", type=int, default=500, help="Maximum backlog items queued per API host")
+    add_budget_arguments(parser, batches=False)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    exporter = start_metrics_export(args)
+    try:
+        pipeline = IngestionPipeline(workers_per_host=args.workers, queue_size=args.queue_size)
+        pipeline.run(refresh_ladder=args.refresh_ladder, budget=RunBudget.from_args(args))
+    finally:
+        exporter.close()
+
+
+if __name__ == "__main__":
+    setup_logging("run_pipeline")
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import logging
+from api.prediction_service import PredictionService, serve
+from database.db_manager import DatabaseManager
+from utils.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve blue-side win probabilities for live lobbies over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--model-root", default="models/win_model", help="Directory of model versions")
+    parser.add_argument("--snapshot", default="player_cache.npz",
+                        help="Player cache snapshot, loaded at startup and rewritten periodically")
+    parser.add_argument("--max-players", type=int, default=200_000, help="Players kept in the cache")
+    parser.add_argument("--refresh-interval", type=float, default=30,
+                        help="Seconds between picking up new matches, ladder changes and model versions")
+    parser.add_argument("--snapshot-interval", type=float, default=600, help="Seconds between cache snapshots")
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    service = PredictionService(db, args.model_root, args.max_players, args.snapshot)
+    service.start_background_refresh(args.refresh_interval, args.snapshot_interval)
+    server = serve(service, args.host, args.port)
+    logging.info(f"Serving model v{service.model_metadata['version']} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.cache.save_snapshot(args.snapshot)
+        logging.info(f"Saved {len(service.cache)} players to {args.snapshot}; {service.stats()}")
+        service.cache.close()
+
+
+if __name__ == "__main__":
+    setup_logging("serve_predictions")
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import logging
+from ml.win_model import ModelRegistry, train_incremental
+from utils.logging_config import setup_logging
+
+
+def print_metrics(title, metrics):
+    print(f"\n=== {title} ===")
+    print(f"{'patch':<8}{'matches':>9}{'accuracy':>10}{'log loss':>10}{'auc':>8}")
+    for patch, values in metrics.items():
+        auc = values.get("auc")
+        print(f"{patch:<8}{values['matches']:>9}{values['accuracy']:>10.3f}{values['log_loss']:>10.3f}"
+              f"{(f'{auc:.3f}' if auc is not None else '-'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the win prediction model with matches added since its last version.")
+    parser.add_argument("--features-root", default="features", help="Directory of feature parts")
+    parser.add_argument("--model-root", default="models/win_model", help="Directory of model versions")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Examples per partial_fit call")
+    parser.add_argument("--from-scratch", action="store_true", help="Start a new model instead of updating the latest")
+    args = parser.parse_args()
+
+    metadata = train_incremental(args.features_root, args.model_root, args.batch_size, args.from_scratch)
+    if metadata is None:
+        metadata = ModelRegistry(args.model_root).metadata()
+        if metadata is None:
+            return
+    else:
+        print_metrics(f"Holdout, matches added in v{metadata['version']}", metadata["holdout_this_run"])
+    print_metrics(f"Holdout, all matches up to v{metadata['version']}", metadata["holdout_cumulative"])
+    logging.info(f"Model v{metadata['version']} has seen {metadata['examples_seen']} examples")
+
+
+if __name__ == "__main__":
+    setup_logging("train_model")
+    main()
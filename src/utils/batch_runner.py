@@ -0,0 +1,53 @@
+import logging
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterator, List
+
+from utils.run_budget import RunBudget
+
+
+def run_checkpointed_batches(
+    db,
+    stage: str,
+    iter_items: Callable[..., Iterator[Dict]],
+    update_batch: Callable[[List[Dict], RunBudget], None],
+    batch_size: int,
+    num_batches: int = None,
+    budget: RunBudget = None,
+) -> bool:
+    """Stream work for `stage` from its saved cursor and process it in batches.
+
+    `iter_items(after_id=...)` yields work items carrying an `id`;
+    `update_batch` is expected to checkpoint each item as it commits it.
+    Stops when the work runs out, after `num_batches`, or when the budget is
+    spent. Returns True if the stage reached the end of its work, in which
+    case the cursor is rewound so the next run starts a fresh pass.
+    """
+    budget = budget or RunBudget()
+    state = db.get_job_state(stage)
+    if state['last_cursor']:
+        logging.info(f"Resuming {stage} after id {state['last_cursor']} ({state['processed']} processed so far)")
+    db.set_job_status(stage, 'running')
+
+    items = iter_items(after_id=state['last_cursor'])
+    batch_number = 0
+    while num_batches is None or batch_number < num_batches:
+        if budget.exhausted():
+            logging.info(f"Budget exhausted ({budget.describe()}), stopping {stage}")
+            break
+
+        batch = list(islice(items, batch_size))
+        if not batch:
+            db.set_job_status(stage, 'complete', reset_cursor=True)
+            logging.info(f"Stage {stage} complete ({budget.describe()})")
+            return True
+
+        batch_number += 1
+        logging.info(f"\nProcessing batch {batch_number}" + (f" of {num_batches}" if num_batches else ""))
+        start_time = time.time()
+        update_batch(batch, budget)
+        logging.info(f"Batch completed in {time.time() - start_time:.2f} seconds")
+
+    db.set_job_status(stage, 'stopped')
+    logging.info(f"Stopped {stage}; the next run resumes from the saved cursor")
+    return False
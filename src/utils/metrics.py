@@ -0,0 +1,269 @@
+"""Process-wide counters and latency histograms.
+
+Everything records into the shared `metrics` registry: RiotClient and
+AsyncRiotClient (per endpoint and host latency, status codes, rate limit
+and backoff sleeps), the database connection (commit latency) and the
+stores (rows written per table). A run exports the registry as a
+Prometheus text file and/or JSON snapshots, rewritten every
+--metrics-interval seconds, and logs a summary when it finishes:
+
+    python src/run_pipeline.py --metrics-file metrics.prom --metrics-json metrics.json
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Upper bounds in seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _render_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with Prometheus semantics."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket, like histogram_quantile()."""
+        if not self.count:
+            return math.nan
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= target:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                low = self.buckets[i - 1] if i else 0.0
+                return low + (target - seen) / n * (self.buckets[i] - low)
+            seen += n
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": h.sum,
+                    "p50": h.quantile(0.5),
+                    "p99": h.quantile(0.99),
+                    "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts)),
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+        return {
+            "timestamp": time.time(),
+            "uptime": time.time() - self.started,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_render_labels(labels)} {value}")
+            for (name, labels), h in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, n in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_render_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_render_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_render_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """Human-readable end-of-run lines: where the time went, per endpoint and host."""
+        snapshot = self.snapshot()
+        elapsed = max(snapshot["uptime"], 1e-9)
+        counters = snapshot["counters"]
+        lines = []
+
+        for h in snapshot["histograms"]:
+            if h["name"] != "riot_api_request_seconds":
+                continue
+            endpoint, host = h["labels"]["endpoint"], h["labels"]["host"]
+            statuses = {
+                c["labels"]["status"]: c["value"] for c in counters
+                if c["name"] == "riot_api_responses_total"
+                and c["labels"]["endpoint"] == endpoint and c["labels"]["host"] == host
+            }
+            errors = sum(n for status, n in statuses.items() if status != "200")
+            lines.append(
+                f"{host} {endpoint}: {h['count']} requests ({h['count'] / elapsed:.1f}/s), "
+                f"p50 {h['p50'] * 1000:.0f} ms, p99 {h['p99'] * 1000:.0f} ms, "
+                f"{statuses.get('429', 0):.0f} rate limited, {errors:.0f} non-200"
+            )
+
+        waits = {}
+        for c in counters:
+            if c["name"] in ("riot_api_rate_limit_wait_seconds_total", "riot_api_backoff_seconds_total"):
+                waits.setdefault(c["labels"]["host"], {})[c["name"]] = c["value"]
+        for host, values in sorted(waits.items()):
+            lines.append(
+                f"{host}: {values.get('riot_api_rate_limit_wait_seconds_total', 0):.1f}s waiting on rate limits, "
+                f"{values.get('riot_api_backoff_seconds_total', 0):.1f}s in retry backoff"
+            )
+
+        for c in counters:
+            if c["name"] == "db_rows_written_total":
+                lines.append(f"{c['labels']['table']}: {c['value']:.0f} rows written ({c['value'] / elapsed:.1f}/s)")
+        for h in snapshot["histograms"]:
+            if h["name"] == "db_commit_seconds":
+                lines.append(
+                    f"DB commits: {h['count']}, p50 {h['p50'] * 1000:.1f} ms, "
+                    f"p99 {h['p99'] * 1000:.1f} ms, {h['sum']:.1f}s total"
+                )
+        return lines
+
+    def write_prometheus(self, path: str) -> None:
+        _atomic_write(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        _atomic_write(path, json.dumps(self.snapshot(), indent=2))
+
+
+def _atomic_write(path: str, text: str) -> None:
+    # Scrapers (e.g. node_exporter's textfile collector) never see a partial file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# Shared by everything in the process, like shared_rate_limiter
+metrics = MetricsRegistry()
+
+
+class MetricsExporter:
+    """Rewrites the metrics files every `interval` seconds until closed."""
+
+    def __init__(self, registry: MetricsRegistry = None, prometheus_path: str = None,
+                 json_path: str = None, interval: float = 30):
+        self.registry = registry or metrics
+        self.prometheus_path = prometheus_path
+        self.json_path = json_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        if prometheus_path or json_path:
+            self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+            self._thread.start()
+
+    def write(self) -> None:
+        if self.prometheus_path:
+            self.registry.write_prometheus(self.prometheus_path)
+        if self.json_path:
+            self.registry.write_json(self.json_path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logging.warning(f"Could not write metrics: {e}")
+
+    def close(self) -> None:
+        """Stop the writer, write the final values and log the run summary."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()
+        lines = self.registry.summary()
+        if lines:
+            logging.info("Run metrics:\n  " + "\n  ".join(lines))
+
+
+def add_metrics_arguments(parser) -> None:
+    """Add the shared --metrics-file/--metrics-json/--metrics-interval flags to a script's CLI."""
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write metrics in Prometheus text format to this file")
+    parser.add_argument("--metrics-json", default=None,
+                        help="Write metrics as a JSON snapshot to this file")
+    parser.add_argument("--metrics-interval", type=float, default=30,
+                        help="Seconds between metrics file updates")
+
+
+def start_metrics_export(args) -> MetricsExporter:
+    return MetricsExporter(metrics, args.metrics_file, args.metrics_json, args.metrics_interval)
@@ -0,0 +1,67 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RunBudget:
+    """Limits on how much one run may do: API calls and/or wall-clock seconds.
+
+    One budget can be shared by worker threads; spend() is locked.
+    """
+
+    def __init__(self, max_calls: int = None, time_budget: float = None):
+        self.max_calls = max_calls
+        self.time_budget = time_budget
+        self.calls = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(max_calls=args.max_calls, time_budget=args.time_budget)
+
+    def spend(self, calls: int = 1) -> None:
+        with self._lock:
+            self.calls += calls
+
+    @contextmanager
+    def charge(self, client):
+        """Spend every request `client` sends inside the block, failed and retried ones included.
+
+        Reads the client's per-thread request counter, so other threads
+        sharing the client are not charged to this block.
+        """
+        before = client.thread_requests()
+        try:
+            yield
+        finally:
+            self.spend(client.thread_requests() - before)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def exhausted(self) -> bool:
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            return True
+        if self.time_budget is not None and self.elapsed() >= self.time_budget:
+            return True
+        return False
+
+    def describe(self) -> str:
+        limits = []
+        if self.max_calls is not None:
+            limits.append(f"{self.calls}/{self.max_calls} calls")
+        if self.time_budget is not None:
+            limits.append(f"{self.elapsed():.0f}/{self.time_budget:.0f} seconds")
+        return ", ".join(limits) or "unlimited"
+
+
+def add_budget_arguments(parser, batches: bool = True) -> None:
+    """Add the shared --batches/--max-calls/--time-budget flags to a fetcher's CLI."""
+    if batches:
+        parser.add_argument("--batches", type=int, default=None,
+                            help="Number of batches to process (default: all)")
+    parser.add_argument("--max-calls", type=int, default=None,
+                        help="Stop after this many API calls")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Stop after this many seconds")
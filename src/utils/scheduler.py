@@ -0,0 +1,169 @@
+"""Per-host work scheduling for the fetch stages.
+
+Riot rate limits are tracked per host (platform hosts such as euw1 for
+summoner-v4, routing hosts such as europe for match-v5), so work is
+sharded by the host it will call. Every shard has its own worker
+threads and queues: a backlog on one host never holds up another, and
+each region we track adds its own quota to the total throughput.
+
+Inside a shard each kind of work (puuids, match_ids, metadata) has its
+own priority queue, lowest priority value first. Workers take from the
+non-empty kind that has used the smallest share of its weight so far,
+so no kind starves even when another has a huge backlog.
+"""
+import heapq
+import itertools
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Optional
+
+# Downstream work gets more turns, which keeps the in-flight backlog small
+DEFAULT_WEIGHTS = {"puuids": 1, "match_ids": 1, "metadata": 3}
+
+# Item priorities: work discovered during this run before older backlog
+FRESH = 0
+BACKLOG = 1
+
+
+class _Shard:
+    def __init__(self, host: str, kinds: Iterable[str]):
+        self.host = host
+        self.queues = {kind: [] for kind in kinds}
+        self.served = dict.fromkeys(self.queues, 0.0)
+        self.size = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.threads = []
+
+
+class RegionScheduler:
+    """Host-sharded priority queues with a worker pool per host."""
+
+    def __init__(self, handlers: Dict[str, Callable[[Dict], None]], workers_per_host: int = 4,
+                 queue_size: int = 500, weights: Dict[str, int] = None):
+        self.handlers = handlers
+        self.workers_per_host = workers_per_host
+        self.queue_size = queue_size
+        weights = weights or DEFAULT_WEIGHTS
+        self.weights = {kind: weights.get(kind, 1) for kind in handlers}
+
+        self._shards: Dict[str, _Shard] = {}
+        self._shards_lock = threading.Lock()
+        self._seq = itertools.count()
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"processed": 0, "errors": 0})  # (host, kind) -> counts
+
+    def _shard(self, host: str) -> _Shard:
+        with self._shards_lock:
+            shard = self._shards.get(host)
+            if shard is None:
+                shard = _Shard(host, self.handlers)
+                shard.threads = [
+                    threading.Thread(target=self._work, args=(shard,), name=f"{host}-{i}", daemon=True)
+                    for i in range(self.workers_per_host)
+                ]
+                for thread in shard.threads:
+                    thread.start()
+                self._shards[host] = shard
+            return shard
+
+    def submit(self, kind: str, host: str, item: Dict, priority: int = FRESH, block: bool = False) -> None:
+        """Queue an item for `host`.
+
+        With `block`, waits while the host's queues hold `queue_size` items;
+        seeders use this for backpressure. Workers submitting follow-up work
+        never block, so a full shard cannot deadlock on itself.
+        """
+        shard = self._shard(host)
+        with self._pending_cond:
+            self._pending += 1
+        with shard.cond:
+            while block and shard.size >= self.queue_size:
+                shard.cond.wait()
+            queue = shard.queues[kind]
+            if not queue:
+                # A kind that was idle rejoins at the current share, rather
+                # than claiming all the turns it "missed"
+                active = [shard.served[k] / self.weights[k] for k, q in shard.queues.items() if q]
+                if active:
+                    shard.served[kind] = max(shard.served[kind], min(active) * self.weights[kind])
+            heapq.heappush(queue, (priority, next(self._seq), item))
+            shard.size += 1
+            shard.cond.notify_all()
+
+    def seed(self, kind: str, items: Iterable[Dict], host_of: Callable[[Dict], str],
+             priority: int = BACKLOG) -> threading.Thread:
+        """Feed an iterator into the scheduler from a background thread."""
+        def feed():
+            for item in items:
+                self.submit(kind, host_of(item), item, priority, block=True)
+
+        thread = threading.Thread(target=feed, name=f"{kind}-seed", daemon=True)
+        thread.start()
+        return thread
+
+    def _next(self, shard: _Shard) -> Optional[tuple]:
+        with shard.cond:
+            while not shard.size and not shard.closed:
+                shard.cond.wait()
+            if not shard.size:
+                return None
+            kind = min(
+                (k for k, q in shard.queues.items() if q),
+                key=lambda k: shard.served[k] / self.weights[k]
+            )
+            _, _, item = heapq.heappop(shard.queues[kind])
+            shard.size -= 1
+            shard.served[kind] += 1
+            shard.cond.notify_all()
+            return kind, item
+
+    def _work(self, shard: _Shard) -> None:
+        while True:
+            task = self._next(shard)
+            if task is None:
+                return
+            kind, item = task
+            try:
+                self.handlers[kind](item)
+                with self._stats_lock:
+                    self.stats[(shard.host, kind)]["processed"] += 1
+            except Exception as e:
+                with self._stats_lock:
+                    self.stats[(shard.host, kind)]["errors"] += 1
+                logging.error(f"[{shard.host}/{kind}] Error processing {item}: {str(e)}")
+            finally:
+                with self._pending_cond:
+                    self._pending -= 1
+                    if not self._pending:
+                        self._pending_cond.notify_all()
+
+    def join(self) -> None:
+        """Wait until every submitted item, including follow-up work, has been handled."""
+        with self._pending_cond:
+            while self._pending:
+                self._pending_cond.wait()
+
+    def close(self) -> None:
+        """Stop the workers once their queues are empty."""
+        with self._shards_lock:
+            shards = list(self._shards.values())
+        for shard in shards:
+            with shard.cond:
+                shard.closed = True
+                shard.cond.notify_all()
+        for shard in shards:
+            for thread in shard.threads:
+                thread.join()
+
+    def totals(self) -> Dict[str, Dict[str, int]]:
+        """Processed/error counts per kind, summed over hosts."""
+        totals = {kind: {"processed": 0, "errors": 0} for kind in self.handlers}
+        with self._stats_lock:
+            for (_, kind), counts in self.stats.items():
+                totals[kind]["processed"] += counts["processed"]
+                totals[kind]["errors"] += counts["errors"]
+        return totals
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts import their packages from src/ (e.g. `from database.db_manager import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from database.db_manager import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database in a temporary directory, which is also the working directory (backups/)."""
+    monkeypatch.chdir(tmp_path)
+    manager = DatabaseManager(str(tmp_path / "riot_data.db"))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def make_match():
+    """Factory for minimal match-v5 responses: ten participants, blue side (teamId 100) first."""
+    def make(match_id="EUW1_1", puuids=None, blue_wins=True, duration=1800, version="14.1.550.1234",
+             start=1_700_000_000_000, champions=None):
+        puuids = puuids or [f"{match_id}-p{i}" for i in range(10)]
+        champions = champions or list(range(1, 11))
+        return {
+            "metadata": {"matchId": match_id, "participants": puuids},
+            "info": {
+                "gameDuration": duration,
+                "gameVersion": version,
+                "queueId": 420,
+                "gameStartTimestamp": start,
+                "teams": [{"teamId": 100, "win": blue_wins}, {"teamId": 200, "win": not blue_wins}],
+                "participants": [
+                    {
+                        "participantId": i + 1,
+                        "puuid": puuid,
+                        "championId": champions[i],
+                        "championName": f"Champion{champions[i]}",
+                        "teamId": 100 if i < 5 else 200,
+                        "teamPosition": ("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY")[i % 5],
+                        "win": blue_wins == (i < 5),
+                        "kills": i,
+                        "deaths": 2,
+                        "assists": 3,
+                        "goldEarned": 10_000 + i,
+                        "totalDamageDealtToChampions": 20_000 + i,
+                    }
+                    for i, puuid in enumerate(puuids)
+                ],
+            },
+        }
+    return make
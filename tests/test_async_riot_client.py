@@ -0,0 +1,125 @@
+import asyncio
+from argparse import Namespace
+
+import pytest
+from aiohttp import web
+
+from api.async_riot_client import AsyncRiotClient, RiotAPIError
+from api.riot_client import RateLimiter, RetryPolicy
+from fetch_async import Checkpoint, _run_stage
+from utils.run_budget import RunBudget
+
+
+async def serve(responses):
+    """Local server answering each request with the next (status, headers, body) and recording the paths."""
+    seen = []
+
+    async def handle(request):
+        seen.append(request.path)
+        status, headers, body = responses.pop(0)
+        return web.json_response(body, status=status, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}" + "/{host}", seen
+
+
+def fetch_summoner(responses, max_retries=3, budget=None):
+    """Run get_summoner_by_id against `responses`; returns (result or exception, client, paths seen)."""
+    async def run():
+        runner, base_url, seen = await serve(responses)
+        client = AsyncRiotClient(
+            rate_limiter=RateLimiter(), retry_policy=RetryPolicy(max_retries=max_retries, backoff_base=0),
+            base_url=base_url, budget=budget,
+        )
+        try:
+            async with client:
+                return await client.get_summoner_by_id("abc", "euw1"), client, seen
+        except Exception as e:
+            return e, client, seen
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("RIOT_API_KEY", "test")
+
+
+def test_retries_server_errors_and_rate_limits_until_success():
+    budget = RunBudget()
+    result, client, seen = fetch_summoner([
+        (503, {}, {}),
+        (429, {"Retry-After": "0", "X-Rate-Limit-Type": "method"}, {}),
+        (200, {}, {"puuid": "p1"}),
+    ], budget=budget)
+    assert result == {"puuid": "p1"}
+    assert seen == ["/euw1/lol/summoner/v4/summoners/abc"] * 3
+    assert client.stats == {"requests": 3, "retries": 2, "rate_limited": 1, "server_errors": 1, "timeouts": 0}
+    # Every request sent is spent, retries included
+    assert budget.calls == 3
+
+
+def test_client_errors_are_not_retried():
+    error, client, seen = fetch_summoner([(404, {}, {"status": "not found"})])
+    assert isinstance(error, RiotAPIError)
+    assert error.status == 404
+    assert len(seen) == 1
+
+
+def test_gives_up_after_max_retries():
+    error, client, seen = fetch_summoner([(500, {}, {})] * 3, max_retries=2)
+    assert isinstance(error, RiotAPIError)
+    assert error.status == 500
+    assert client.stats["retries"] == 2
+    assert len(seen) == 3
+
+
+def test_checkpoint_only_passes_items_whose_predecessors_finished():
+    checkpoint = Checkpoint(cursor=10)
+    for item_id in (11, 12, 15):
+        checkpoint.feed(item_id)
+
+    checkpoint.finish(12)
+    assert checkpoint.cursor == 10
+    checkpoint.finish(11)
+    assert checkpoint.cursor == 12
+    assert checkpoint.outstanding == 1
+    checkpoint.finish(15)
+    assert checkpoint.cursor == 15
+    assert checkpoint.outstanding == 0
+    assert checkpoint.fed == 3
+
+
+def test_stage_stops_when_budget_is_spent_and_resumes_from_cursor(db):
+    items = [{"id": item_id} for item_id in range(1, 11)]
+    written = []
+    args = Namespace(limit=None, commit_every=2, concurrency=2)
+
+    def run_stage(budget):
+        async def fetch(item):
+            budget.spend()
+            return item["id"]
+
+        return asyncio.run(_run_stage(
+            db, "test", lambda after_id: (item for item in items if item["id"] > after_id),
+            host_of=lambda item: "euw1", fetch=fetch,
+            write=lambda cursor, item, result: written.append(result), budget=budget, args=args,
+        ))
+
+    assert run_stage(RunBudget(max_calls=4)) is False
+    assert written == [1, 2, 3, 4]
+    state = db.get_job_state("test")
+    assert (state["last_cursor"], state["processed"], state["api_calls"], state["status"]) == (4, 4, 4, "stopped")
+
+    assert run_stage(RunBudget()) is True
+    assert written == list(range(1, 11))
+    state = db.get_job_state("test")
+    assert (state["last_cursor"], state["processed"], state["status"]) == (0, 10, "complete")
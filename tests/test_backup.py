@@ -0,0 +1,107 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from database.backup import BACKUP_PREFIX, LEGACY_TIMESTAMP_FORMAT, TIMESTAMP_FORMAT, BackupManager
+from database.db_manager import DatabaseManager
+
+
+def summoner_ids(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT summonerID FROM Summoners ORDER BY summonerID")]
+    finally:
+        conn.close()
+
+
+def insert_summoner(db, summoner_id):
+    conn = db.get_connection()
+    conn.execute("INSERT INTO Summoners (summonerID, rank, region) VALUES (?, 'Challenger', 'euw1')", (summoner_id,))
+    conn.commit()
+
+
+def touch_backup(backup_dir, taken, timestamp_format=TIMESTAMP_FORMAT, suffix=".db"):
+    path = backup_dir / f"{BACKUP_PREFIX}{taken.strftime(timestamp_format)}{suffix}"
+    path.write_bytes(b"")
+    return path
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_backup_and_restore_round_trip(db, tmp_path, compress):
+    manager = BackupManager(db.db_path, backup_dir=tmp_path / "backups", compress=compress)
+    insert_summoner(db, "a")
+    backup = manager.create_backup()
+    assert backup.name.endswith(".db.gz" if compress else ".db")
+    assert manager.list_backups() == [backup]
+
+    insert_summoner(db, "b")
+    manager.restore(backup)
+    assert summoner_ids(db.db_path) == ["a"]
+
+    # Restoring into another file leaves the database alone
+    manager.restore(backup, tmp_path / "copy.db")
+    assert summoner_ids(tmp_path / "copy.db") == ["a"]
+
+
+def test_backups_taken_in_the_same_second_get_distinct_names(db, tmp_path):
+    manager = BackupManager(db.db_path, backup_dir=tmp_path / "backups")
+    first, second = manager.create_backup(), manager.create_backup()
+    assert first != second
+    # Both fall in the same hour, so retention keeps only the newer one
+    assert manager.list_backups() == [second]
+
+
+def test_prune_keeps_newest_backup_per_hour_and_day(tmp_path):
+    backup_dir = tmp_path / "backups"
+    backup_dir.mkdir()
+    manager = BackupManager(tmp_path / "riot_data.db", backup_dir=backup_dir, keep_hourly=2, keep_daily=2)
+    newest = touch_backup(backup_dir, datetime(2026, 3, 3, 10, 30))
+    same_hour = touch_backup(backup_dir, datetime(2026, 3, 3, 10, 0))
+    previous_hour = touch_backup(backup_dir, datetime(2026, 3, 3, 9, 0))
+    previous_day = touch_backup(backup_dir, datetime(2026, 3, 2, 12, 0))
+    # Names from before microseconds were added still parse
+    oldest = touch_backup(backup_dir, datetime(2026, 3, 1, 8, 0), LEGACY_TIMESTAMP_FORMAT, ".db.gz")
+    interrupted = touch_backup(backup_dir, datetime(2026, 3, 3, 11, 0), suffix=".db.partial")
+
+    assert manager.list_backups() == [newest, same_hour, previous_hour, previous_day, oldest]
+    assert sorted(manager.prune()) == sorted([same_hour, oldest])
+    assert manager.list_backups() == [newest, previous_hour, previous_day]
+    assert not interrupted.exists()
+
+
+def test_backup_if_due_follows_schedule(db, tmp_path):
+    backup_dir = tmp_path / "backups"
+    hourly = BackupManager(db.db_path, backup_dir=backup_dir)
+    first = hourly.backup_if_due()
+    assert first is not None
+    # This hour is already covered (barring a clock hour ticking over between the calls)
+    if hourly.backup_time(first).hour == datetime.now().hour:
+        assert hourly.backup_if_due() is None
+
+    assert BackupManager(db.db_path, backup_dir=backup_dir, schedule="always").backup_if_due() is not None
+    assert BackupManager(db.db_path, backup_dir=backup_dir, schedule="never").backup_if_due() is None
+    with pytest.raises(ValueError):
+        BackupManager(db.db_path, schedule="weekly")
+
+
+def test_ladder_update_backs_up_per_schedule(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / "riot_data.db")
+    db = DatabaseManager(db_path, BackupManager(db_path, backup_dir=tmp_path / "backups", schedule="always"))
+    try:
+        entry = {
+            "summonerID": "a", "region": "euw1", "queue": "RANKED_SOLO_5x5", "rank": "Challenger",
+            "puuid": "pa", "league_points": 100, "wins": 10, "losses": 5,
+        }
+        db.update_summoners([entry])
+        [first] = db.backups.list_backups()
+        # The backup is taken before the update
+        assert summoner_ids(first) == []
+
+        db.update_summoners([entry])
+        [second] = db.backups.list_backups()
+        assert second != first
+        assert summoner_ids(second) == ["a"]
+    finally:
+        db.close()
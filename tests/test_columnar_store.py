@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pytest
+
+from analysis.duration_stats import load_summaries, update_duration_stats
+from data_processing.columnar_store import ColumnarStore, patch_of
+from data_processing.match_tables import derive_tables
+
+
+@pytest.fixture
+def add_matches(db, make_match):
+    """Store (match_id, region, game version, duration) matches in MatchIDs and the derived tables."""
+    def add(matches):
+        conn = db.get_connection()
+        conn.executemany("INSERT INTO MatchIDs (match_id, summoner_puuid, region) VALUES (?, 'p', ?)",
+                         [(match_id, region) for match_id, region, _, _ in matches])
+        derive_tables(conn.cursor(), [
+            (match_id, make_match(match_id, version=version, duration=duration))
+            for match_id, _, version, duration in matches
+        ])
+        conn.commit()
+    return add
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnarStore(tmp_path / "columnar")
+
+
+def test_patch_of():
+    assert patch_of("14.2.555.1234") == "14.2"
+    assert patch_of(None) == "unknown"
+
+
+def test_export_partitions_by_region_and_patch(db, store, add_matches):
+    add_matches([
+        ("EUW1_1", "euw1", "14.1.1.1", 1500),
+        ("KR_1", "kr", "14.1.2.2", 1600),
+        ("EUW1_2", "euw1", "14.2.1.1", 1700),
+        ("EUW1_3", "euw1", "14.1.3.3", 1800),
+    ])
+    assert store.export(db.get_connection(), "MatchMetadata", chunk_size=3) == 4
+    assert store.partitions("MatchMetadata") == [("euw1", "14.1", 2), ("euw1", "14.2", 1), ("kr", "14.1", 1)]
+    assert store.exported_rowid("MatchMetadata") == 4
+
+    euw = store.read("MatchMetadata", ["match_id", "game_duration"], regions=["euw1"], patches=["14.1"])
+    assert euw["match_id"].tolist() == [b"EUW1_1", b"EUW1_3"]
+    assert euw["game_duration"].tolist() == [1500, 1800]
+
+    participants = store.export(db.get_connection(), "MatchParticipants")
+    assert participants == 40
+    kr = store.read("MatchParticipants", ["puuid", "team_id"], regions=["kr"])
+    assert kr["puuid"][0] == b"KR_1-p0"
+    assert kr["team_id"].tolist() == [100] * 5 + [200] * 5
+
+
+def test_export_is_incremental_and_reads_can_skip_exported_rows(db, store, add_matches):
+    add_matches([("EUW1_1", "euw1", "14.1.1.1", 1500), ("EUW1_2", "euw1", "14.1.1.1", 1600)])
+    conn = db.get_connection()
+    store.export(conn, "MatchMetadata")
+    add_matches([("EUW1_3", "euw1", "14.1.1.1", 1700)])
+
+    assert store.export(conn, "MatchMetadata") == 1
+    assert store.export(conn, "MatchMetadata") == 0
+    assert store.read("MatchMetadata", ["game_duration"])["game_duration"].tolist() == [1500, 1600, 1700]
+    newer = store.read("MatchMetadata", ["rowid", "game_duration"], after_rowid=2)
+    assert (newer["rowid"].tolist(), newer["game_duration"].tolist()) == ([3], [1700])
+    assert store.read("MatchMetadata", ["match_id"], after_rowid=3)["match_id"].size == 0
+
+
+def test_export_truncates_tail_left_by_an_interrupted_export(db, store, add_matches):
+    add_matches([("EUW1_1", "euw1", "14.1.1.1", 1500)])
+    conn = db.get_connection()
+    store.export(conn, "MatchMetadata")
+    # Rows appended to a column file but never recorded in the manifest
+    with open(store.root / "MatchMetadata" / "region=euw1" / "patch=14.1" / "game_duration.bin", "ab") as f:
+        f.write(np.array([9999, 9999], dtype="<i4").tobytes())
+
+    add_matches([("EUW1_2", "euw1", "14.1.1.1", 1600)])
+    store.export(conn, "MatchMetadata")
+    assert store.read("MatchMetadata", ["game_duration"])["game_duration"].tolist() == [1500, 1600]
+
+
+def test_export_refuses_a_different_column_layout(db, store, add_matches):
+    add_matches([("EUW1_1", "euw1", "14.1.1.1", 1500)])
+    conn = db.get_connection()
+    store.export(conn, "MatchMetadata")
+    manifest_path = store.root / "MatchMetadata" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    del manifest["columns"]["rowid"]
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError):
+        store.export(conn, "MatchMetadata")
+    # Exports without a rowid column can't serve as a watermark
+    assert store.exported_rowid("MatchMetadata") == 0
+
+
+def test_duration_stats_from_export_match_sqlite(db, store, add_matches):
+    add_matches([
+        (f"M{i}", ("euw1", "kr")[i % 2], ("14.1.1.1", "14.2.1.1")[i % 3 == 0], 1200 + 37 * i) for i in range(40)
+    ])
+    conn = db.get_connection()
+    store.export(conn, "MatchMetadata")
+    add_matches([("M40", "euw1", "14.1.1.1", 2500)])  # Not exported yet: read from SQLite
+
+    assert update_duration_stats(db, store=store) == 41
+    from_export = {key: summary.to_json() for key, summary in load_summaries(conn).items()}
+    update_duration_stats(db, rebuild=True)
+    from_sqlite = {key: summary.to_json() for key, summary in load_summaries(conn).items()}
+    assert from_export == from_sqlite
+    assert set(from_export) == {("euw1", "14.1", 420), ("euw1", "14.2", 420), ("kr", "14.1", 420), ("kr", "14.2", 420)}
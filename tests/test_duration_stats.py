@@ -0,0 +1,62 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from analysis.duration_stats import BIN_SECONDS, MAX_SECONDS, DurationSummary
+
+
+def summary_of(durations):
+    summary = DurationSummary()
+    for seconds in durations:
+        summary.add(seconds)
+    return summary
+
+
+@pytest.fixture
+def durations():
+    rng = random.Random(7)
+    return [max(600, int(rng.gauss(1800, 360))) for _ in range(2000)]
+
+
+def test_merge_matches_summary_of_all_durations(durations):
+    merged = summary_of(durations[:700]).merge(summary_of(durations[700:])).merge(DurationSummary())
+    whole = summary_of(durations)
+
+    assert merged.to_json() == whole.to_json()
+    assert merged.count == len(durations)
+    assert merged.mean == pytest.approx(statistics.mean(durations))
+    assert merged.std == pytest.approx(statistics.stdev(durations))
+    assert (merged.min, merged.max) == (min(durations), max(durations))
+
+
+def test_merge_into_empty_summary(durations):
+    merged = DurationSummary().merge(summary_of(durations))
+    assert merged.to_json() == summary_of(durations).to_json()
+
+
+@pytest.mark.parametrize("q", [0.1, 0.25, 0.5, 0.75, 0.9])
+def test_quantile_is_within_one_bin(durations, q):
+    exact = sorted(durations)[int(q * len(durations))]
+    assert abs(summary_of(durations).quantile(q) - exact) < BIN_SECONDS
+
+
+def test_quantile_stays_within_min_and_max():
+    summary = summary_of([1805, 1807, 9000])
+    assert summary.quantile(0) >= 1805
+    assert summary.quantile(1) == 9000
+    # Longer games share the last bin but the top quantile is still the max
+    assert summary.bins[-1] == 1 and 9000 > MAX_SECONDS
+
+
+def test_empty_summary():
+    summary = DurationSummary()
+    assert math.isnan(summary.quantile(0.5))
+    assert math.isnan(summary.mean)
+    assert math.isnan(summary.pct_below(20))
+
+
+def test_json_round_trip(durations):
+    summary = summary_of(durations)
+    assert DurationSummary.from_json(summary.to_json()).to_json() == summary.to_json()
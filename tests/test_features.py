@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from data_processing.columnar_store import ColumnarStore
+from data_processing.features import (
+    CHAMPION_DIM, NUMERIC_FEATURES, RECENT_WINDOW_MS, REGIONS, FeatureBuilder, assemble_vector, build_part,
+    compute_numeric, feature_names, load_features,
+)
+from data_processing.match_tables import derive_tables
+
+DAY_MS = 86_400_000
+PLAYERS = [f"player{i}" for i in range(12)]
+START = 1_700_000_000_000
+
+
+@pytest.fixture
+def add_matches(db, make_match):
+    """Store matches as (match_id, region, puuids, blue wins, day) in MatchIDs and the derived tables."""
+    def add(matches):
+        conn = db.get_connection()
+        conn.executemany("INSERT INTO MatchIDs (match_id, summoner_puuid, region) VALUES (?, 'p', ?)",
+                         [(match_id, region) for match_id, region, _, _, _ in matches])
+        derive_tables(conn.cursor(), [
+            (match_id, make_match(match_id, puuids=puuids, blue_wins=blue_wins, start=START + day * DAY_MS,
+                                  champions=[10 * (i + 1) for i in range(10)]))
+            for match_id, _, puuids, blue_wins, day in matches
+        ])
+        conn.commit()
+    return add
+
+
+def numeric_column(numeric, name):
+    return numeric[:, NUMERIC_FEATURES.index(name)]
+
+
+def test_recent_win_rate_counts_only_earlier_games_in_window():
+    puuids = np.array([["a"] + [""] * 9], dtype="U78")
+    game_start = np.array([100 * DAY_MS])
+    history = (
+        np.array(["a", "a", "a", "a", "a", "b"]),
+        np.array([99 * DAY_MS, 98 * DAY_MS, 90 * DAY_MS, 100 * DAY_MS - RECENT_WINDOW_MS - 1, 100 * DAY_MS,
+                  99 * DAY_MS]),
+        np.array([1, 1, 0, 1, 1, 1], dtype=np.int8),
+    )
+    numeric = compute_numeric(puuids, game_start, history, {"a": ("Challenger", 1200)})
+
+    # Two wins in three games (Laplace-smoothed); the game outside the window and the match itself don't count
+    assert numeric_column(numeric, "p0_win_rate")[0] == pytest.approx(3 / 5)
+    assert numeric_column(numeric, "p0_log_games")[0] == pytest.approx(np.log1p(3))
+    assert numeric_column(numeric, "p1_win_rate")[0] == pytest.approx(0.5)
+    assert numeric_column(numeric, "blue_challenger")[0] == 1
+    assert numeric_column(numeric, "blue_unranked")[0] == 4
+    assert numeric_column(numeric, "red_unranked")[0] == 5
+    assert numeric_column(numeric, "blue_lp")[0] == pytest.approx(1.2 / 5)
+
+
+def test_assemble_vector_layout():
+    champions = np.array([[1, 2, 3, 4, 5, 6, 7, 8, 9, 1001], [0] * 10])
+    numeric = np.ones((2, len(NUMERIC_FEATURES)), dtype=np.float32)
+    X = assemble_vector(champions, numeric, [b"kr", "oc1"], [b"14.1", "14.2"])
+
+    names = feature_names()
+    assert X.shape == (2, len(names))
+    assert X[0, names.index("champion_1")] == 0  # Blue and red both picked champion 1 (1001 wraps around)
+    assert X[0, names.index("champion_2")] == 1
+    assert X[0, names.index("champion_9")] == -1
+    assert X[1, :CHAMPION_DIM].sum() == 0
+    assert X[0, names.index("region_kr")] == 1
+    assert X[1, names.index("region_other")] == 1
+    assert X[:, [names.index(f"region_{region}") for region in REGIONS]].sum() == 1
+    assert X[0, CHAMPION_DIM:CHAMPION_DIM + len(NUMERIC_FEATURES)].tolist() == [1] * len(NUMERIC_FEATURES)
+    assert (X[:, [i for i, name in enumerate(names) if name.startswith("patch_bucket_")]].sum(axis=1) == 1).all()
+
+
+def test_builder_is_incremental_and_uses_earlier_games(db, tmp_path, add_matches):
+    add_matches([
+        ("EUW1_1", "euw1", PLAYERS[:10], True, 0),
+        ("EUW1_2", "euw1", PLAYERS[2:12], False, 1),
+    ])
+    builder = FeatureBuilder(db, tmp_path / "features", workers=1, chunk_size=1, columnar_root=None)
+    assert builder.build() == 2
+    assert builder.build() == 0
+
+    add_matches([("EUW1_3", "euw1", PLAYERS[:10], True, 2)])
+    assert builder.build() == 1
+    assert db.get_job_state("features")["last_cursor"] == 3
+    assert len(list((tmp_path / "features").glob("part-*.npz"))) == 3
+
+    features = load_features(tmp_path / "features")
+    assert features["match_id"].tolist() == [b"EUW1_1", b"EUW1_2", b"EUW1_3"]
+    assert features["label"].tolist() == [1, 0, 1]
+    assert features["champions"][0].tolist() == [10 * (i + 1) for i in range(10)]
+    # Slot 2 of EUW1_2 is player4, who won EUW1_1; by EUW1_3 player2 has won EUW1_1 and lost EUW1_2
+    assert numeric_column(features["numeric"], "p2_win_rate").tolist() == pytest.approx([0.5, 2 / 3, 0.5])
+    assert numeric_column(features["numeric"], "p0_log_games")[2] == pytest.approx(np.log1p(1))
+
+    assert builder.build(rebuild=True) == 3
+    assert len(list((tmp_path / "features").glob("part-*.npz"))) == 3
+
+
+def test_exported_history_gives_the_same_features(db, tmp_path, add_matches):
+    add_matches([
+        (f"M{day}", ("euw1", "kr")[day % 2], PLAYERS[day % 3:day % 3 + 10], day % 4 != 0, day) for day in range(8)
+    ])
+    store = ColumnarStore(tmp_path / "columnar")
+    store.export(db.get_connection(), "MatchParticipants")
+    add_matches([("M8", "euw1", PLAYERS[1:11], True, 8)])  # Not exported yet: read from SQLite
+
+    for name in ("from_sqlite", "from_export"):
+        (tmp_path / name).mkdir()
+    build_part(db.db_path, str(tmp_path / "from_sqlite"), 1, 9)
+    build_part(db.db_path, str(tmp_path / "from_export"), 1, 9, columnar_root=str(tmp_path / "columnar"))
+
+    from_sqlite, from_export = load_features(tmp_path / "from_sqlite"), load_features(tmp_path / "from_export")
+    for name, array in from_sqlite.items():
+        assert np.array_equal(array, from_export[name]), name
+    assert numeric_column(from_export["numeric"], "p0_log_games").max() > 0
@@ -0,0 +1,84 @@
+import pytest
+
+from api.riot_client import RateLimiter, RiotClient, league_entry_to_summoner
+
+
+class LeagueResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {}
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+class LeagueSession:
+    """Serves league-v4 responses by URL path suffix in place of requests.Session."""
+
+    def __init__(self, leagues):
+        self.leagues = leagues
+
+    def get(self, url, params=None, timeout=None):
+        for suffix, entries in self.leagues.items():
+            if url.endswith(suffix):
+                return LeagueResponse(200, {"entries": entries})
+        return LeagueResponse(404, {})
+
+
+def league_entry(summoner_id, league_points, wins=30, losses=20):
+    return {"summonerId": summoner_id, "puuid": f"p-{summoner_id}", "leaguePoints": league_points,
+            "wins": wins, "losses": losses}
+
+
+def test_league_entry_maps_puuid_and_standing():
+    assert league_entry_to_summoner(league_entry("a", 812), "Challenger", "kr") == {
+        "summonerID": "a", "rank": "Challenger", "region": "kr", "queue": "RANKED_SOLO_5x5",
+        "puuid": "p-a", "league_points": 812, "wins": 30, "losses": 20,
+    }
+    # Newer entries can come without a summonerId
+    keyed_by_puuid = league_entry_to_summoner({"puuid": "p-x", "leaguePoints": 5}, "Grandmaster", "euw1")
+    assert keyed_by_puuid["summonerID"] == "p-x"
+    assert keyed_by_puuid["wins"] is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("RIOT_API_KEY", "test")
+    client = RiotClient(rate_limiter=RateLimiter(), base_url="http://riot.test/{host}")
+    client.regions = ["euw1"]
+    return client
+
+
+def test_ladder_standing_is_stored_without_summoner_lookups(db, client):
+    client.session = LeagueSession({
+        "/euw1/lol/league/v4/challengerleagues/by-queue/RANKED_SOLO_5x5": [league_entry("a", 900)],
+        "/euw1/lol/league/v4/grandmasterleagues/by-queue/RANKED_SOLO_5x5": [league_entry("b", 400, 12, 10)],
+    })
+    summoners = client.fetch_top_summoners()
+    assert client.stats["requests"] == 2
+    db.update_summoners(summoners)
+
+    stored = db.get_connection().execute(
+        "SELECT summonerID, rank, puuid, league_points, wins, losses FROM Summoners ORDER BY summonerID"
+    ).fetchall()
+    assert stored == [("a", "Challenger", "p-a", 900, 30, 20), ("b", "Grandmaster", "p-b", 400, 12, 10)]
+
+
+def test_standing_changes_update_rows(db):
+    summoners = [league_entry_to_summoner(league_entry("a", 900), "Challenger", "euw1")]
+    db.update_summoners(summoners)
+
+    summoners[0]["league_points"] = 925
+    summoners[0]["wins"] = 31
+    stats = db.update_summoners(summoners)
+    assert (stats["inserted"], stats["updated"], stats["deleted"]) == (0, 1, 0)
+    assert db.get_connection().execute("SELECT league_points, wins FROM Summoners").fetchone() == (925, 31)
+
+
+def test_failed_league_is_skipped(db, client):
+    client.session = LeagueSession({
+        "/euw1/lol/league/v4/challengerleagues/by-queue/RANKED_SOLO_5x5": [league_entry("a", 900)],
+    })
+    assert [summoner["summonerID"] for summoner in client.fetch_top_summoners()] == ["a"]
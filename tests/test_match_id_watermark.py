@@ -0,0 +1,128 @@
+from datetime import datetime
+
+import pytest
+
+from fetch_match_ids import MAX_PAGES, PAGE_SIZE, MatchIDFetcher, take_until_watermark
+from utils.run_budget import RunBudget
+
+
+class FakeMatchClient:
+    """Serves one newest-first match history, page by page, and counts requests like RiotClient."""
+
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+        self.stats = {"requests": 0}
+
+    def get_matches_by_puuid(self, puuid, region, start_time=None, start=0, count=100):
+        self.stats["requests"] += 1
+        self.calls.append((start_time, start, count))
+        return self.history[start:start + count]
+
+    def thread_requests(self):
+        return self.stats["requests"]
+
+
+def match_ids(first, last):
+    """EUW1_last ... EUW1_first, newest first."""
+    return [f"EUW1_{n}" for n in range(last, first - 1, -1)]
+
+
+@pytest.fixture
+def summoner():
+    return {
+        "id": 1, "puuid": "p1", "region": "euw1", "created_at": datetime(2024, 1, 1),
+        "listed_until": None, "last_match_id": None,
+    }
+
+
+def watermark(db, puuid="p1"):
+    return MatchIDFetcher(db, FakeMatchClient([])).get_watermark(puuid)
+
+
+def test_take_until_watermark():
+    full_page = match_ids(1, PAGE_SIZE)
+    assert take_until_watermark(["c", "b", "a"], "b") == (["c"], True)
+    assert take_until_watermark(full_page, "missing") == (full_page, False)
+    assert take_until_watermark(["c", "b"], None) == (["c", "b"], True)
+
+
+def test_first_crawl_pages_to_a_short_page_and_sets_watermark(db, summoner):
+    client = FakeMatchClient(match_ids(1, 150))
+    fetcher = MatchIDFetcher(db, client)
+
+    crawl = fetcher.crawl_match_ids(summoner)
+    assert crawl.done and crawl.pages == 2
+    assert [start for _, start, _ in client.calls] == [0, PAGE_SIZE]
+    # Without a watermark the crawl starts when the summoner was added
+    assert client.calls[0][0] == int(summoner["created_at"].timestamp())
+
+    new_ids = fetcher.store_match_ids(db.get_connection().cursor(), summoner, crawl)
+    assert len(new_ids) == 150
+    assert watermark(db) == {
+        "listed_until": crawl.started_at, "last_match_id": "EUW1_150", "resume_start": None, "resume_match_id": None,
+    }
+
+
+def test_next_crawl_stops_at_last_match_id(db, summoner):
+    client = FakeMatchClient(match_ids(1, 120))
+    fetcher = MatchIDFetcher(db, client)
+    fetcher.store_match_ids(db.get_connection().cursor(), summoner, fetcher.crawl_match_ids(summoner))
+
+    client.history = match_ids(1, 123)
+    client.calls.clear()
+    crawl = fetcher.crawl_match_ids({**summoner, **watermark(db)})
+    assert crawl.done and crawl.pages == 1
+    assert crawl.match_ids == ["EUW1_123", "EUW1_122", "EUW1_121"]
+
+
+def test_crawl_cut_short_by_max_pages_keeps_old_watermark(db, summoner):
+    client = FakeMatchClient(match_ids(1, 50))
+    fetcher = MatchIDFetcher(db, client)
+    cursor = db.get_connection().cursor()
+    fetcher.store_match_ids(cursor, summoner, fetcher.crawl_match_ids(summoner))
+    before = watermark(db)
+
+    client.history = match_ids(1, 50 + MAX_PAGES * PAGE_SIZE + 1)
+    crawl = fetcher.crawl_match_ids({**summoner, **before})
+    assert not crawl.done and crawl.pages == MAX_PAGES
+    new_ids = fetcher.store_match_ids(cursor, {**summoner, **before}, crawl)
+
+    assert len(new_ids) == MAX_PAGES * PAGE_SIZE
+    after = watermark(db)
+    assert (after["listed_until"], after["last_match_id"]) == (before["listed_until"], before["last_match_id"])
+    assert (after["resume_start"], after["resume_match_id"]) == (MAX_PAGES * PAGE_SIZE, "EUW1_1051")
+
+
+def test_next_crawl_resumes_after_pages_already_listed(db, summoner):
+    client = FakeMatchClient(match_ids(1, 50))
+    fetcher = MatchIDFetcher(db, client)
+    cursor = db.get_connection().cursor()
+    fetcher.store_match_ids(cursor, summoner, fetcher.crawl_match_ids(summoner))
+    client.history = match_ids(1, 50 + MAX_PAGES * PAGE_SIZE + 1)
+    fetcher.store_match_ids(cursor, summoner, fetcher.crawl_match_ids({**summoner, **watermark(db)}))
+
+    # Three games were played between the runs
+    client.history = match_ids(1, 1054)
+    client.calls.clear()
+    crawl = fetcher.crawl_match_ids({**summoner, **watermark(db)})
+
+    # Page one lists the new games up to the resume point, then the crawl jumps past the listed entries
+    assert [start for _, start, _ in client.calls] == [0, 3 + MAX_PAGES * PAGE_SIZE]
+    assert crawl.done
+    assert crawl.match_ids == ["EUW1_1054", "EUW1_1053", "EUW1_1052", "EUW1_51"]
+    fetcher.store_match_ids(cursor, summoner, crawl)
+    assert watermark(db) == {
+        "listed_until": crawl.started_at, "last_match_id": "EUW1_1054", "resume_start": None, "resume_match_id": None,
+    }
+    stored = {row[0] for row in cursor.execute("SELECT match_id FROM MatchIDs")}
+    assert stored == set(match_ids(1, 1054))
+
+
+def test_budget_is_checked_before_every_page(db, summoner):
+    client = FakeMatchClient(match_ids(1, 1000))
+    budget = RunBudget(max_calls=3)
+
+    crawl = MatchIDFetcher(db, client).crawl_match_ids(summoner, budget)
+    assert crawl.pages == 3 and not crawl.done
+    assert budget.calls == client.stats["requests"] == 3
@@ -0,0 +1,51 @@
+from data_processing.match_tables import derive_tables, parse_match_metadata, parse_match_participants
+
+
+def test_participant_rows_follow_info_participants(make_match):
+    match = make_match("EUW1_1", blue_wins=False)
+    rows = parse_match_participants("EUW1_1", match)
+
+    assert len(rows) == 10
+    assert rows[0] == (
+        "EUW1_1", 1, "EUW1_1-p0", 1, "Champion1", 100, "TOP", False, 0, 2, 3, 10_000, 20_000, 1_700_000_000_000,
+    )
+    assert [row[5] for row in rows] == [100] * 5 + [200] * 5
+    assert [row[7] for row in rows] == [False] * 5 + [True] * 5
+
+
+def test_participant_rows_fall_back_and_skip_unknown_players(make_match):
+    match = make_match("EUW1_1")
+    participants = match["info"]["participants"]
+    participants[0]["teamPosition"] = ""
+    participants[0]["individualPosition"] = "MIDDLE"
+    del participants[1]["puuid"]
+
+    rows = parse_match_participants("EUW1_1", match)
+    assert rows[0][6] == "MIDDLE"
+    assert [row[1] for row in rows] == [1] + list(range(3, 11))
+    assert parse_match_participants("EUW1_1", {"metadata": {}}) == []
+    assert parse_match_metadata("EUW1_1", None) is None
+
+
+def test_derive_tables_writes_and_refreshes_every_table(db, make_match):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    matches = [("EUW1_1", make_match("EUW1_1")), ("EUW1_2", make_match("EUW1_2", blue_wins=False))]
+    assert derive_tables(cursor, matches) == {"MatchMetadata": 2, "MatchParticipants": 20}
+    conn.commit()
+
+    assert conn.execute(
+        "SELECT match_id, winner_team_id, game_duration FROM MatchMetadata ORDER BY match_id"
+    ).fetchall() == [("EUW1_1", 100, 1800), ("EUW1_2", 200, 1800)]
+    assert conn.execute(
+        "SELECT COUNT(*), SUM(win) FROM MatchParticipants WHERE puuid LIKE 'EUW1_2-%'"
+    ).fetchone() == (10, 5)
+
+    # Re-deriving one table upserts its rows in place
+    refreshed = make_match("EUW1_1")
+    refreshed["info"]["participants"][0]["kills"] = 12
+    assert derive_tables(cursor, [("EUW1_1", refreshed)], ["MatchParticipants"]) == {"MatchParticipants": 10}
+    assert conn.execute("SELECT COUNT(*) FROM MatchParticipants").fetchone()[0] == 20
+    assert conn.execute(
+        "SELECT kills FROM MatchParticipants WHERE match_id = 'EUW1_1' AND participant_id = 1"
+    ).fetchone()[0] == 12
@@ -0,0 +1,77 @@
+import json
+import math
+
+import pytest
+
+from utils.metrics import Histogram, MetricsExporter, MetricsRegistry
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 0.2, 0.4))
+    for value in (0.05, 0.15, 0.15, 0.3, 5.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1, 1]
+    assert (histogram.count, histogram.sum) == (5, pytest.approx(5.65))
+    # The median (2.5th of 5 observations) lies three quarters of the way through (0.1, 0.2]
+    assert histogram.quantile(0.5) == pytest.approx(0.175)
+    # Values past the last bound report the last bound, like histogram_quantile()
+    assert histogram.quantile(1.0) == 0.4
+    assert math.isnan(Histogram().quantile(0.5))
+
+
+def test_counters_and_histograms_are_kept_per_label_set():
+    registry = MetricsRegistry()
+    registry.inc("riot_api_responses_total", endpoint="match-v5.match", host="europe", status=200)
+    registry.inc("riot_api_responses_total", endpoint="match-v5.match", status=200, host="europe")
+    registry.inc("riot_api_responses_total", endpoint="match-v5.match", host="europe", status=429)
+    registry.observe("riot_api_request_seconds", 0.02, endpoint="match-v5.match", host="europe")
+
+    snapshot = registry.snapshot()
+    assert [(c["labels"]["status"], c["value"]) for c in snapshot["counters"]] == [("200", 2), ("429", 1)]
+    [histogram] = snapshot["histograms"]
+    assert (histogram["count"], histogram["buckets"]["0.025"], histogram["buckets"]["+Inf"]) == (1, 1, 0)
+
+    registry.reset()
+    assert registry.snapshot()["counters"] == []
+
+
+def test_prometheus_text_has_cumulative_buckets_and_escaped_labels():
+    registry = MetricsRegistry()
+    registry.inc("db_rows_written_total", 3, table='Match"IDs')
+    registry.observe("db_commit_seconds", 0.003)
+    registry.observe("db_commit_seconds", 0.2)
+
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE db_rows_written_total counter" in lines
+    assert 'db_rows_written_total{table="Match\\"IDs"} 3' in lines
+    assert "# TYPE db_commit_seconds histogram" in lines
+    assert 'db_commit_seconds_bucket{le="0.005"} 1' in lines
+    assert 'db_commit_seconds_bucket{le="0.25"} 2' in lines
+    assert 'db_commit_seconds_bucket{le="+Inf"} 2' in lines
+    assert "db_commit_seconds_count 2" in lines
+
+
+def test_summary_reports_per_endpoint_latency_and_waits():
+    registry = MetricsRegistry()
+    for status in (200, 200, 429):
+        registry.observe("riot_api_request_seconds", 0.04, endpoint="summoner-v4.by-id", host="kr")
+        registry.inc("riot_api_responses_total", endpoint="summoner-v4.by-id", host="kr", status=status)
+    registry.inc("riot_api_rate_limit_wait_seconds_total", 1.5, host="kr")
+
+    lines = registry.summary()
+    assert lines[0].startswith("kr summoner-v4.by-id: 3 requests")
+    assert lines[0].endswith("1 rate limited, 1 non-200")
+    assert lines[1] == "kr: 1.5s waiting on rate limits, 0.0s in retry backoff"
+
+
+def test_exporter_writes_files_on_close(tmp_path):
+    registry = MetricsRegistry()
+    registry.inc("db_rows_written_total", 5, table="MatchIDs")
+    exporter = MetricsExporter(registry, str(tmp_path / "metrics.prom"), str(tmp_path / "metrics.json"), interval=60)
+    exporter.close()
+
+    assert 'db_rows_written_total{table="MatchIDs"} 5' in (tmp_path / "metrics.prom").read_text()
+    snapshot = json.loads((tmp_path / "metrics.json").read_text())
+    assert snapshot["counters"] == [{"name": "db_rows_written_total", "labels": {"table": "MatchIDs"}, "value": 5}]
+    assert not list(tmp_path.glob("*.tmp"))
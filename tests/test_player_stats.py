@@ -0,0 +1,98 @@
+import pytest
+
+from analysis.player_stats import DAY_MS, RECENT_GAMES, WINDOW_DAYS, PlayerSummary, player_form, update_player_stats
+from data_processing.match_tables import derive_tables
+
+PLAYERS = [f"player{i}" for i in range(12)]
+START = 1_700_000_000_000
+
+
+@pytest.fixture
+def add_matches(db, make_match):
+    """Store matches as (match_id, puuids, blue wins, day, duration) in the derived tables, uncommitted."""
+    def add(matches):
+        derive_tables(db.get_connection().cursor(), [
+            (match_id, make_match(match_id, puuids=puuids, blue_wins=blue_wins, start=START + day * DAY_MS,
+                                  duration=duration))
+            for match_id, puuids, blue_wins, day, duration in matches
+        ])
+    return add
+
+
+def stored_stats(db):
+    return db.get_connection().execute("""
+        SELECT puuid, games, wins, duration_total, last_game_start, streak, recent, daily
+        FROM PlayerStats
+        ORDER BY puuid
+    """).fetchall()
+
+
+def test_summary_keeps_recent_games_and_daily_window_sorted():
+    summary = PlayerSummary()
+    # Out of order, as history backfills deliver them
+    for day, win in [(40, True), (41, True), (5, False), (39, False)]:
+        summary.add(START + day * DAY_MS, win, 1800)
+
+    assert (summary.games, summary.wins, summary.duration_total) == (4, 2, 7200)
+    assert [game[1] for game in summary.recent] == [0, 0, 1, 1]
+    assert summary.streak == 2
+    # Day 5 is outside the WINDOW_DAYS days of buckets
+    assert len(summary.daily) == 3
+    assert summary.window(2, START + 41 * DAY_MS) == {"games": 2, "wins": 2, "duration": 3600}
+    with pytest.raises(ValueError):
+        summary.window(WINDOW_DAYS + 1, START)
+
+    for day in range(RECENT_GAMES + 5):
+        summary.add(START + (42 + day) * DAY_MS, False, None)
+    assert len(summary.recent) == RECENT_GAMES
+    assert summary.streak == -RECENT_GAMES
+
+
+def test_updates_are_incremental_and_match_a_rebuild(db, add_matches):
+    add_matches([
+        ("EUW1_1", PLAYERS[:10], True, 0, 1500),
+        ("EUW1_2", PLAYERS[2:12], False, 1, 2100),
+    ])
+    assert update_player_stats(db, chunk_size=7) == 20
+    assert db.get_job_state("player_stats")["last_cursor"] == 20
+    assert update_player_stats(db) == 0
+
+    add_matches([("EUW1_3", PLAYERS[:10], True, 2, 1800)])
+    assert update_player_stats(db, chunk_size=7) == 10
+    incremental = stored_stats(db)
+    assert len(incremental) == 12
+
+    assert update_player_stats(db, rebuild=True) == 30
+    assert stored_stats(db) == incremental
+
+
+def test_player_form(db, add_matches):
+    add_matches([
+        ("EUW1_1", PLAYERS[:10], True, 0, 1500),
+        ("EUW1_2", PLAYERS[2:12], False, 1, 2100),
+        ("EUW1_3", PLAYERS[:10], True, 9, 1800),
+    ])
+    update_player_stats(db)
+    conn = db.get_connection()
+
+    # player2 is blue in EUW1_1 and EUW1_3 and blue (slot 0) in EUW1_2, which blue lost
+    form = player_form(conn, "player2", days=7, now_ms=START + 9 * DAY_MS)
+    assert (form["games"], form["win_rate"], form["avg_duration"]) == (3, pytest.approx(2 / 3), 1800)
+    assert (form["recent"], form["streak"]) == ("WLW", 1)
+    assert (form["games_last_7d"], form["win_rate_last_7d"]) == (1, 1.0)
+    assert player_form(conn, "player11", days=3, now_ms=START + 9 * DAY_MS)["games_last_3d"] == 0
+    assert player_form(conn, "nobody") is None
+
+
+def test_uncommitted_update_rolls_back_with_the_matches(db, add_matches):
+    add_matches([("EUW1_1", PLAYERS[:10], True, 0, 1500)])
+    db.get_connection().commit()
+    update_player_stats(db)
+
+    add_matches([("EUW1_2", PLAYERS[2:12], False, 1, 2100)])
+    assert update_player_stats(db, commit=False) == 10
+    assert db.get_job_state("player_stats")["last_cursor"] == 20
+    db.get_connection().rollback()
+
+    assert db.get_job_state("player_stats")["last_cursor"] == 10
+    assert db.get_connection().execute("SELECT SUM(games) FROM PlayerStats").fetchone()[0] == 10
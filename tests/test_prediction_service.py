@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+import pytest
+
+from api.prediction_service import PlayerFeatureCache
+from data_processing.match_tables import derive_tables
+
+HOUR_MS = 3_600_000
+PLAYERS = [f"player{i}" for i in range(12)]
+
+
+@pytest.fixture
+def now_ms():
+    return int(time.time() * 1000)
+
+
+@pytest.fixture
+def add_matches(db, make_match, now_ms):
+    """Store matches as (match_id, puuids, blue wins, hours ago) in MatchIDs and the derived tables."""
+    def add(matches):
+        conn = db.get_connection()
+        conn.executemany("INSERT INTO MatchIDs (match_id, summoner_puuid, region) VALUES (?, 'p', 'euw1')",
+                         [(match_id,) for match_id, _, _, _ in matches])
+        derive_tables(conn.cursor(), [
+            (match_id, make_match(match_id, puuids=puuids, blue_wins=blue_wins, start=now_ms - hours * HOUR_MS))
+            for match_id, puuids, blue_wins, hours in matches
+        ])
+        conn.commit()
+    return add
+
+
+def standing(puuid, league_points):
+    return {"summonerID": puuid, "rank": "Challenger", "region": "euw1", "queue": "RANKED_SOLO_5x5",
+            "puuid": puuid, "league_points": league_points, "wins": 10, "losses": 5}
+
+
+@pytest.fixture
+def make_cache(db):
+    caches = []
+
+    def make(max_players=3):
+        caches.append(PlayerFeatureCache(db, max_players))
+        return caches[-1]
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_misses_are_loaded_and_least_recently_used_evicted(db, add_matches, make_cache, now_ms):
+    add_matches([("EUW1_1", PLAYERS[:10], True, 3), ("EUW1_2", PLAYERS[2:12], False, 2)])
+    db.update_summoners([standing("player0", 900)])
+    cache = make_cache()
+
+    players = cache.get_many(["player0", "player2", "player0", "player11"], now_ms)
+    assert (cache.hits, cache.misses) == (0, 3)
+    assert sorted(players["player2"].wins.tolist()) == [0, 1]
+    assert (players["player0"].rank, players["player0"].league_points) == ("Challenger", 900)
+    assert players["player11"].rank == ""
+
+    cache.get_many(["player0"], now_ms)
+    cache.get_many(["player5"], now_ms)
+    assert (cache.hits, cache.misses) == (1, 4)
+    # player2 and player11 were used least recently; one of them made room for player5
+    assert len(cache) == 3
+    assert {"player0", "player5"} <= set(cache._players)
+
+
+def test_refresh_follows_new_games_and_ladder_changes(db, add_matches, make_cache, now_ms):
+    add_matches([("EUW1_1", PLAYERS[:10], True, 3)])
+    db.update_summoners([standing("player0", 900)])
+    cache = make_cache()
+    cache.get_many(["player0", "player9"], now_ms)
+
+    add_matches([("EUW1_2", PLAYERS[2:12], True, 1)])
+    db.update_summoners([standing("player0", 950)])
+    # Only cached players are updated: player0 sat EUW1_2 out, player9 played it
+    assert cache.refresh(page_size=4) == 1
+    assert cache.watermark == db.get_connection().execute("SELECT MAX(rowid) FROM MatchParticipants").fetchone()[0]
+
+    players = cache.get_many(["player0", "player9"], now_ms)
+    assert players["player9"].wins.tolist() == [0, 0]
+    assert len(players["player0"].game_start) == 1
+    assert players["player0"].league_points == 950
+    assert cache.refresh() == 0
+
+
+def test_snapshot_round_trip_keeps_players_and_order(db, add_matches, make_cache, tmp_path, now_ms):
+    add_matches([("EUW1_1", PLAYERS[:10], True, 3), ("EUW1_2", PLAYERS[2:12], False, 2)])
+    db.update_summoners([standing("player2", 700)])
+    cache = make_cache()
+    cache.get_many(["player2"], now_ms)
+    cache.get_many(["player0"], now_ms)
+    cache.get_many(["player11"], now_ms)
+    cache.save_snapshot(str(tmp_path / "cache.npz"))
+    assert not list(tmp_path.glob("*.tmp.npz"))
+
+    # Loaded least recently used first, so a smaller cache keeps the newest two
+    small = make_cache(max_players=2)
+    assert small.load_snapshot(str(tmp_path / "cache.npz")) == 2
+    assert list(small._players) == ["player0", "player11"]
+
+    add_matches([("EUW1_3", PLAYERS[:10], True, 1)])
+    warm = make_cache()
+    assert warm.load_snapshot(str(tmp_path / "cache.npz")) == 3
+    assert (warm.watermark, warm.ranks_updated_at) == (cache.watermark, cache.ranks_updated_at)
+    for puuid, player in cache._players.items():
+        loaded = warm._players[puuid]
+        assert np.array_equal(loaded.game_start, player.game_start)
+        assert np.array_equal(loaded.wins, player.wins)
+        assert (loaded.rank, loaded.league_points) == (player.rank, player.league_points)
+    assert warm._players["player2"].league_points == 700
+    # Catching up from the snapshot's watermark applies only EUW1_3, to player0 and player2
+    assert warm.refresh() == 2
@@ -0,0 +1,86 @@
+import pytest
+
+from api import riot_client
+from api.riot_client import RateLimiter, RateWindow, parse_rate_limit_header
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(riot_client.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_parse_rate_limit_header():
+    assert parse_rate_limit_header("20:1,100:120") == [(20, 1), (100, 120)]
+    assert parse_rate_limit_header(None) == []
+    assert parse_rate_limit_header("20:1,oops") == [(20, 1)]
+
+
+def test_window_waits_for_oldest_request_to_leave():
+    window = RateWindow(limit=2, seconds=1, margin=0.1)
+    window.timestamps.extend([10.0, 10.5])
+    assert window.wait_time(10.6) == pytest.approx(0.5)
+    assert window.wait_time(11.1) == 0.0
+
+
+def test_reserve_blocks_on_fullest_window(clock):
+    limiter = RateLimiter(default_app_limits=[(2, 1), (3, 10)])
+    assert limiter.reserve("euw1", "m") == 0.0
+    assert limiter.reserve("euw1", "m") == 0.0
+    # The 1-second window is full
+    assert limiter.reserve("euw1", "m") == pytest.approx(1.1)
+
+    clock.now += 1.2
+    assert limiter.reserve("euw1", "m") == 0.0
+    # Now the 10-second window is full, counting from the first request
+    assert limiter.reserve("euw1", "m") == pytest.approx(10.1 - 1.2)
+
+
+def test_hosts_have_separate_app_windows(clock):
+    limiter = RateLimiter(default_app_limits=[(1, 1)])
+    assert limiter.reserve("euw1", "m") == 0.0
+    assert limiter.reserve("kr", "m") == 0.0
+    assert limiter.reserve("euw1", "m") > 0
+
+
+def test_headers_replace_limits_and_sync_counts(clock):
+    limiter = RateLimiter(default_app_limits=[(20, 1)])
+    limiter.update_from_headers("euw1", "match", {
+        "X-App-Rate-Limit": "5:1,100:120",
+        "X-App-Rate-Limit-Count": "5:1,7:120",
+        "X-Method-Rate-Limit": "50:10",
+        "X-Method-Rate-Limit-Count": "1:10",
+    })
+    # Another process already used the 1-second window
+    assert limiter.reserve("euw1", "match") == pytest.approx(1.1)
+    windows = {window.seconds: window for window in limiter._app_windows["euw1"]}
+    assert windows[1].limit == 5
+    assert len(windows[120].timestamps) == 7
+    assert len(limiter._method_windows[("euw1", "match")][0].timestamps) == 1
+
+
+def test_method_limit_only_holds_back_its_method(clock):
+    limiter = RateLimiter(default_app_limits=[(100, 1)])
+    limiter.update_from_headers("europe", "match", {"X-Method-Rate-Limit": "1:10"})
+    assert limiter.reserve("europe", "match") == 0.0
+    assert limiter.reserve("europe", "match") > 0
+    assert limiter.reserve("europe", "timeline") == 0.0
+
+
+def test_penalize_blocks_app_or_method_bucket(clock):
+    limiter = RateLimiter(default_app_limits=[(100, 1)])
+    limiter.penalize("kr", "summoner", 5, limit_type="method")
+    assert limiter.reserve("kr", "summoner") == pytest.approx(5)
+    assert limiter.reserve("kr", "league") == 0.0
+
+    limiter.penalize("kr", "summoner", 3, limit_type="application")
+    assert limiter.reserve("kr", "league") == pytest.approx(3)
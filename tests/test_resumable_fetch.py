@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from fetch_puuids import STAGE, PUUIDFetcher
+from utils import run_budget
+from utils.run_budget import RunBudget
+
+
+class FakeSummonerClient:
+    """Answers summoner-v4 lookups and counts requests per thread like RiotClient."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+        self._local = threading.local()
+
+    def thread_requests(self) -> int:
+        return getattr(self._local, "requests", 0)
+
+    def get_summoner_by_id(self, summoner_id, region):
+        self._local.requests = self.thread_requests() + 1
+        self.calls.append(summoner_id)
+        if summoner_id in self.failing:
+            raise RuntimeError("404 error")
+        return {"puuid": f"puuid-{summoner_id}"}
+
+
+@pytest.fixture
+def summoners(db):
+    conn = db.get_connection()
+    conn.executemany("INSERT INTO Summoners (summonerID, rank, region) VALUES (?, 'Challenger', 'euw1')",
+                     [(f"s{i}",) for i in range(1, 8)])
+    conn.commit()
+
+
+def make_fetcher(db, client, batch_size=2):
+    fetcher = PUUIDFetcher(db, client)
+    fetcher.batch_size = batch_size
+    return fetcher
+
+
+def puuids(db):
+    return dict(db.get_connection().execute("SELECT summonerID, puuid FROM Summoners WHERE puuid IS NOT NULL"))
+
+
+def test_budget_limits_calls_and_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(run_budget.time, "monotonic", lambda: now[0])
+
+    assert not RunBudget().exhausted()
+    calls = RunBudget(max_calls=2)
+    calls.spend(2)
+    assert calls.exhausted()
+
+    timed = RunBudget(time_budget=60)
+    now[0] += 59
+    assert not timed.exhausted()
+    now[0] += 1
+    assert timed.exhausted()
+    assert timed.describe() == "60/60 seconds"
+
+
+def test_charge_counts_only_the_calling_threads_requests():
+    client = FakeSummonerClient()
+    budget = RunBudget()
+    with budget.charge(client):
+        client.get_summoner_by_id("a", "euw1")
+        # Requests sent by another thread sharing the client are not charged to this block
+        other = threading.Thread(target=client.get_summoner_by_id, args=("b", "euw1"))
+        other.start()
+        other.join()
+    assert budget.calls == 1
+
+
+def test_stopped_run_resumes_after_last_checkpoint(db, summoners):
+    client = FakeSummonerClient()
+    assert make_fetcher(db, client).process_summoners(num_batches=2) is False
+
+    state = db.get_job_state(STAGE)
+    assert (state["last_cursor"], state["processed"], state["api_calls"], state["status"]) == (4, 4, 4, "stopped")
+    assert sorted(puuids(db)) == ["s1", "s2", "s3", "s4"]
+
+    # The next run picks up at s5 and, reaching the end, rewinds the cursor for a fresh pass
+    assert make_fetcher(db, client).process_summoners() is True
+    assert client.calls == [f"s{i}" for i in range(1, 8)]
+    state = db.get_job_state(STAGE)
+    assert (state["last_cursor"], state["processed"], state["status"]) == (0, 7, "complete")
+
+
+def test_budget_stops_mid_batch_and_failures_are_checkpointed(db, summoners):
+    client = FakeSummonerClient(failing={"s2"})
+    budget = RunBudget(max_calls=3)
+    assert make_fetcher(db, client, batch_size=5).process_summoners(budget=budget) is False
+
+    assert client.calls == ["s1", "s2", "s3"]
+    assert sorted(puuids(db)) == ["s1", "s3"]
+    state = db.get_job_state(STAGE)
+    # The failed lookup is passed over but still charged
+    assert (state["last_cursor"], state["processed"], state["api_calls"]) == (3, 2, 3)
@@ -0,0 +1,114 @@
+import pytest
+import requests
+
+from api import riot_client
+from api.riot_client import RateLimiter, RetryPolicy, RiotClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+class ScriptedSession:
+    """Stands in for requests.Session, answering each GET with the next scripted response or error."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.urls.append(url)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class FakeClock:
+    """monotonic() and sleep() for the client and its rate limiter; sleeping advances the clock."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    monkeypatch.setenv("RIOT_API_KEY", "test")
+    clock = FakeClock()
+    monkeypatch.setattr(riot_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(riot_client.time, "sleep", clock.sleep)
+    return clock.sleeps
+
+
+def make_client(responses, max_retries=3):
+    client = RiotClient(rate_limiter=RateLimiter(), retry_policy=RetryPolicy(max_retries=max_retries, backoff_base=0.5),
+                        base_url="http://riot.test/{host}")
+    client.session = ScriptedSession(responses)
+    return client
+
+
+def test_retries_timeouts_server_errors_and_rate_limits(sleeps):
+    client = make_client([
+        requests.Timeout(),
+        FakeResponse(502),
+        FakeResponse(429, headers={"Retry-After": "2", "X-Rate-Limit-Type": "application"}),
+        FakeResponse(200, {"puuid": "p1"}),
+    ])
+    assert client.get_summoner_by_id("abc", "euw1") == {"puuid": "p1"}
+    assert client.session.urls == ["http://riot.test/euw1/lol/summoner/v4/summoners/abc"] * 4
+    assert client.stats == {"requests": 4, "retries": 3, "rate_limited": 1, "server_errors": 1, "timeouts": 1}
+    assert client.thread_requests() == 4
+    # Timeouts and 5xx back off with jitter below backoff_base * 2 ** attempt, then the
+    # rate limiter holds the retry after a 429 for Retry-After
+    assert len(sleeps) == 3
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+    assert sleeps[2] == pytest.approx(2.0)
+
+
+def test_last_failed_response_is_returned_when_retries_run_out(sleeps):
+    client = make_client([FakeResponse(500)] * 3, max_retries=2)
+    with pytest.raises(requests.HTTPError):
+        client.get_summoner_by_id("abc", "euw1")
+    assert client.stats["requests"] == 3
+    assert client.stats["retries"] == 2
+
+
+def test_last_network_error_is_raised_when_retries_run_out(sleeps):
+    client = make_client([requests.ConnectionError()] * 2, max_retries=1)
+    with pytest.raises(requests.ConnectionError):
+        client.get_match_metadata("EUW1_1", "euw1")
+    assert client.session.urls == ["http://riot.test/europe/lol/match/v5/matches/EUW1_1"] * 2
+
+
+def test_client_errors_are_not_retried(sleeps):
+    client = make_client([FakeResponse(404)])
+    with pytest.raises(requests.HTTPError):
+        client.get_summoner_by_id("abc", "euw1")
+    assert client.stats["requests"] == 1
+    assert sleeps == []
+
+
+def test_retry_after_falls_back_to_default():
+    policy = RetryPolicy(default_retry_after=3)
+    assert policy.retry_after({"Retry-After": "7"}) == 7.0
+    assert policy.retry_after({"Retry-After": "soon"}) == 3.0
+    assert policy.retry_after({}) == 3.0
@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from utils.scheduler import BACKLOG, FRESH, RegionScheduler
+
+
+class Gate:
+    """Handler that holds its worker until released, so a shard's queues can be filled first."""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, item):
+        self.entered.set()
+        assert self.release.wait(5)
+
+
+@pytest.fixture
+def gate():
+    gate = Gate()
+    yield gate
+    gate.release.set()
+
+
+def run_gated(scheduler, gate, host, submit):
+    """Block the host's only worker, queue items with `submit`, then let the worker drain them."""
+    scheduler.submit("gate", host, {})
+    assert gate.entered.wait(5)
+    submit()
+    gate.release.set()
+    scheduler.join()
+    scheduler.close()
+
+
+def test_kinds_take_turns_by_weight(gate):
+    order = []
+    scheduler = RegionScheduler({
+        "gate": gate,
+        "puuids": lambda item: order.append(("puuids", item["n"])),
+        "metadata": lambda item: order.append(("metadata", item["n"])),
+    }, workers_per_host=1, weights={"puuids": 1, "metadata": 3})
+
+    def submit():
+        for n in range(3):
+            scheduler.submit("puuids", "euw1", {"n": n})
+        for n in range(9):
+            scheduler.submit("metadata", "euw1", {"n": n})
+
+    run_gated(scheduler, gate, "euw1", submit)
+    assert [kind for kind, _ in order] == ["puuids"] + (["metadata"] * 3 + ["puuids"]) * 2 + ["metadata"] * 3
+    assert scheduler.totals()["metadata"] == {"processed": 9, "errors": 0}
+
+
+def test_fresh_work_goes_before_backlog(gate):
+    order = []
+    scheduler = RegionScheduler({"gate": gate, "metadata": lambda item: order.append(item["n"])}, workers_per_host=1)
+
+    def submit():
+        scheduler.submit("metadata", "europe", {"n": 1}, priority=BACKLOG)
+        scheduler.submit("metadata", "europe", {"n": 2}, priority=FRESH)
+        scheduler.submit("metadata", "europe", {"n": 3}, priority=BACKLOG)
+        scheduler.submit("metadata", "europe", {"n": 4}, priority=FRESH)
+
+    run_gated(scheduler, gate, "europe", submit)
+    assert order == [2, 4, 1, 3]
+
+
+def test_blocked_host_does_not_hold_up_other_hosts(gate):
+    done = []
+    scheduler = RegionScheduler({"gate": gate, "puuids": lambda item: done.append(item["host"])}, workers_per_host=1)
+    scheduler.submit("gate", "euw1", {})
+    assert gate.entered.wait(5)
+    scheduler.submit("puuids", "euw1", {"host": "euw1"})
+    for host in ("kr", "na1"):
+        scheduler.submit("puuids", host, {"host": host})
+
+    # The euw1 worker is still held by the gate
+    for _ in range(500):
+        if len(done) == 2:
+            break
+        threading.Event().wait(0.01)
+    assert sorted(done) == ["kr", "na1"]
+
+    gate.release.set()
+    scheduler.join()
+    scheduler.close()
+    assert sorted(done) == ["euw1", "kr", "na1"]
+
+
+def test_join_waits_for_follow_up_work_and_counts_errors():
+    resolved = []
+
+    def resolve(item):
+        if item["n"] % 4 == 0:
+            raise RuntimeError("lookup failed")
+        # Handlers queue follow-up work on the routing host
+        scheduler.submit("match_ids", "europe", item)
+
+    scheduler = RegionScheduler({"puuids": resolve, "match_ids": resolved.append}, workers_per_host=2)
+    seeder = scheduler.seed("puuids", ({"n": n, "host": ("euw1", "eun1")[n % 2]} for n in range(20)),
+                            host_of=lambda item: item["host"])
+    seeder.join()
+    scheduler.join()
+    scheduler.close()
+
+    assert sorted(item["n"] for item in resolved) == [n for n in range(20) if n % 4]
+    assert scheduler.totals() == {
+        "puuids": {"processed": 15, "errors": 5},
+        "match_ids": {"processed": 15, "errors": 0},
+    }
+    assert scheduler.stats[("euw1", "puuids")]["errors"] == 5
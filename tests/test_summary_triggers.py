@@ -0,0 +1,92 @@
+from database.db_manager import DatabaseManager
+
+
+def summoner_counts(conn):
+    return {
+        (region, rank): (summoners, with_puuid)
+        for region, rank, summoners, with_puuid in conn.execute(
+            "SELECT region, rank, summoners, with_puuid FROM SummonerCounts WHERE summoners > 0"
+        )
+    }
+
+
+def scanned_summoner_counts(conn):
+    return {
+        (region, rank): (summoners, with_puuid)
+        for region, rank, summoners, with_puuid in conn.execute(
+            "SELECT region, rank, COUNT(*), COUNT(puuid) FROM Summoners GROUP BY region, rank"
+        )
+    }
+
+
+def match_coverage(conn):
+    return {region: (ids, with_metadata) for region, ids, with_metadata in conn.execute(
+        "SELECT region, match_ids, with_metadata FROM MatchCoverage WHERE match_ids > 0"
+    )}
+
+
+def scanned_match_coverage(conn):
+    return {region: (ids, with_metadata) for region, ids, with_metadata in conn.execute("""
+        SELECT m.region, COUNT(*), COUNT(mm.match_id)
+        FROM MatchIDs m LEFT JOIN MatchMetadata mm ON mm.match_id = m.match_id
+        GROUP BY m.region
+    """)}
+
+
+def test_summoner_counts_follow_inserts_updates_and_deletes(db):
+    conn = db.get_connection()
+    conn.executemany("INSERT INTO Summoners (summonerID, rank, region, puuid) VALUES (?, ?, ?, ?)", [
+        ("a", "Challenger", "euw1", "pa"),
+        ("b", "Challenger", "euw1", None),
+        ("c", "Grandmaster", "euw1", None),
+        ("d", "Challenger", "kr", "pd"),
+    ])
+    assert summoner_counts(conn) == {
+        ("euw1", "Challenger"): (2, 1),
+        ("euw1", "Grandmaster"): (1, 0),
+        ("kr", "Challenger"): (1, 1),
+    }
+
+    conn.execute("UPDATE Summoners SET puuid = 'pb' WHERE summonerID = 'b'")
+    conn.execute("UPDATE Summoners SET rank = 'Challenger' WHERE summonerID = 'c'")
+    conn.execute("UPDATE Summoners SET puuid = NULL WHERE summonerID = 'd'")
+    conn.execute("DELETE FROM Summoners WHERE summonerID = 'a'")
+    conn.commit()
+
+    assert summoner_counts(conn) == scanned_summoner_counts(conn) == {
+        ("euw1", "Challenger"): (2, 1),
+        ("kr", "Challenger"): (1, 0),
+    }
+    assert db.get_summoner_counts() == [("euw1", "Challenger", 2, 1), ("kr", "Challenger", 1, 0)]
+
+
+def test_match_coverage_follows_match_ids_and_metadata(db):
+    conn = db.get_connection()
+    conn.executemany("INSERT INTO MatchIDs (match_id, summoner_puuid, region) VALUES (?, ?, ?)", [
+        ("EUW1_1", "p", "euw1"), ("EUW1_2", "p", "euw1"), ("KR_1", "q", "kr"),
+    ])
+    conn.execute("INSERT INTO MatchMetadata (match_id, game_duration) VALUES ('EUW1_1', 1800)")
+    assert match_coverage(conn) == {"euw1": (2, 1), "kr": (1, 0)}
+
+    conn.execute("INSERT INTO MatchMetadata (match_id, game_duration) VALUES ('KR_1', 1500)")
+    conn.execute("DELETE FROM MatchMetadata WHERE match_id = 'EUW1_1'")
+    conn.execute("DELETE FROM MatchIDs WHERE match_id = 'EUW1_2'")
+    conn.commit()
+
+    assert match_coverage(conn) == scanned_match_coverage(conn) == {"euw1": (1, 0), "kr": (1, 1)}
+
+
+def test_counts_are_backfilled_for_existing_rows(db):
+    conn = db.get_connection()
+    conn.execute("INSERT INTO Summoners (summonerID, rank, region, puuid) VALUES ('a', 'Challenger', 'euw1', 'pa')")
+    conn.execute("INSERT INTO MatchIDs (match_id, summoner_puuid, region) VALUES ('EUW1_1', 'pa', 'euw1')")
+    conn.execute("DROP TABLE SummonerCounts")
+    conn.execute("DROP TABLE MatchCoverage")
+    conn.commit()
+
+    reopened = DatabaseManager(db.db_path)
+    try:
+        assert reopened.get_summoner_counts() == [("euw1", "Challenger", 1, 1)]
+        assert reopened.get_match_coverage() == [("euw1", 1, 0)]
+    finally:
+        reopened.close()
@@ -0,0 +1,147 @@
+import threading
+
+import numpy as np
+import pytest
+
+from data_processing.match_tables import derive_tables
+from data_processing.timeline_store import MAX_MINUTES, STATS, TimelineStore, parse_timeline
+from database.db_manager import DatabaseManager
+from fetch_timelines import STAGE, TimelineFetcher
+
+
+def make_timeline(minutes, base=0):
+    """A match-v5 timeline whose total gold is base + 100 * minute + participantId."""
+    return {"info": {"frames": [
+        {"participantFrames": {
+            str(pid): {"totalGold": base + 100 * minute + pid, "xp": 50 * minute, "minionsKilled": minute,
+                       "jungleMinionsKilled": 1, "level": 1 + minute // 3}
+            for pid in range(1, 11)
+        }}
+        for minute in range(minutes)
+    ]}}
+
+
+def blocks(value):
+    return np.full((MAX_MINUTES, 10, len(STATS)), value, dtype="<i4")
+
+
+def test_parse_timeline_pads_and_truncates():
+    frames, count = parse_timeline(make_timeline(25))
+    assert count == 25
+    assert frames.shape == (MAX_MINUTES, 10, len(STATS))
+    assert frames[10, 2].tolist() == [1003, 500, 11, 4]
+    # The final frame repeats after the game ends
+    assert (frames[40] == frames[24]).all()
+
+    assert parse_timeline(make_timeline(MAX_MINUTES + 5))[1] == MAX_MINUTES
+    assert parse_timeline(None) is None
+    assert parse_timeline({"info": {"frames": []}}) is None
+
+
+def test_append_spans_chunks_and_rewrites_in_place(db, tmp_path):
+    store = TimelineStore(db, tmp_path / "timelines", chunk_matches=4)
+    conn = db.get_connection()
+    assert store.append(conn.cursor(), [(f"M{i}", blocks(i), 30) for i in range(10)]) == 10
+    conn.commit()
+    assert len(list((tmp_path / "timelines").glob("chunk-*.bin"))) == 3
+
+    for i in range(10):
+        assert (store.get(f"M{i}") == i).all()
+    assert store.get("missing") is None
+
+    store.append(conn.cursor(), [("M5", blocks(55), 20), ("M10", blocks(10), 30)])
+    conn.commit()
+    assert (store.get("M5") == 55).all()
+    assert conn.execute("SELECT slot, frames FROM TimelineIndex WHERE match_id = 'M5'").fetchone() == (5, 20)
+    assert conn.execute("SELECT MAX(slot) FROM TimelineIndex").fetchone()[0] == 10
+
+
+def test_read_minute_and_gold_difference(db, tmp_path):
+    store = TimelineStore(db, tmp_path / "timelines", chunk_matches=2)
+    conn = db.get_connection()
+    store.append(conn.cursor(), [
+        (f"M{i}", parse_timeline(make_timeline(minutes, base=1000 * i))[0], minutes)
+        for i, minutes in enumerate((30, 12, 25))
+    ])
+    conn.commit()
+
+    minute = store.read_minute(10, ["total_gold", "cs"])
+    assert minute["match_id"].tolist() == [b"M0", b"M1", b"M2"]
+    assert minute["frames"].tolist() == [30, 12, 25]
+    assert minute["total_gold"][2].tolist() == [2000 + 100 * 10 + pid for pid in range(1, 11)]
+    assert (minute["cs"] == 11).all()
+    with pytest.raises(ValueError):
+        store.read_minute(MAX_MINUTES)
+
+    # Blue (participants 1-5) trails red (6-10) by 25 gold; M1 ended before minute 15
+    match_ids, difference = store.gold_difference(15)
+    assert match_ids.tolist() == [b"M0", b"M2"]
+    assert difference.tolist() == [-25, -25]
+
+
+def test_other_layout_is_rejected(db, tmp_path):
+    store = TimelineStore(db, tmp_path / "timelines", chunk_matches=4)
+    store.append(db.get_connection().cursor(), [("M0", blocks(0), 30)])
+    with pytest.raises(ValueError):
+        TimelineStore(db, tmp_path / "timelines", chunk_matches=8)
+
+
+def test_concurrent_writers_get_distinct_slots(db, tmp_path):
+    def write(worker):
+        manager = DatabaseManager(db.db_path)
+        store = TimelineStore(manager, tmp_path / "timelines", chunk_matches=16)
+        conn = manager.get_connection()
+        for i in range(25):
+            store.append(conn.cursor(), [(f"W{worker}_{i}", blocks(1000 * worker + i), 30)])
+            conn.commit()
+        manager.close()
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = db.get_connection().execute("SELECT match_id, slot FROM TimelineIndex").fetchall()
+    assert sorted(slot for _, slot in rows) == list(range(100))
+    store = TimelineStore(db, tmp_path / "timelines", chunk_matches=16)
+    for match_id, _ in rows:
+        worker, i = match_id[1:].split("_")
+        assert (store.get(match_id) == 1000 * int(worker) + int(i)).all()
+
+
+class FakeTimelineClient:
+    """Serves generated timelines and counts requests per thread like RiotClient."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self._local = threading.local()
+
+    def thread_requests(self) -> int:
+        return getattr(self._local, "requests", 0)
+
+    def get_match_timeline(self, match_id, region):
+        self._local.requests = self.thread_requests() + 1
+        if match_id in self.failing:
+            raise RuntimeError("404 error")
+        return make_timeline(20)
+
+
+def test_fetcher_stores_batch_and_checkpoint(db, tmp_path, make_match):
+    conn = db.get_connection()
+    match_ids = [f"EUW1_{i}" for i in range(1, 5)]
+    conn.executemany("INSERT INTO MatchIDs (match_id, summoner_puuid, region) VALUES (?, 'p', 'euw1')",
+                     [(match_id,) for match_id in match_ids])
+    derive_tables(conn.cursor(), [(match_id, make_match(match_id)) for match_id in match_ids])
+    conn.commit()
+
+    fetcher = TimelineFetcher(db, FakeTimelineClient(failing={"EUW1_2"}), root=tmp_path / "timelines")
+    matches = list(fetcher.iter_matches_needing_timeline(page_size=3))
+    assert [match["match_id"] for match in matches] == match_ids
+
+    fetcher.update_timeline_batch(matches)
+    state = db.get_job_state(STAGE)
+    assert (state["last_cursor"], state["processed"], state["api_calls"]) == (matches[-1]["id"], 3, 4)
+    assert fetcher.store.get("EUW1_3")[19, 0, 0] == 1901
+    # The failed match is passed by the checkpoint but still lacks a timeline
+    assert [match["match_id"] for match in fetcher.iter_matches_needing_timeline()] == ["EUW1_2"]
@@ -0,0 +1,116 @@
+from database.db_manager import DatabaseManager
+
+
+def entry(summoner_id, region="euw1", rank="Challenger", puuid=None, league_points=100, wins=10, losses=5,
+          queue="RANKED_SOLO_5x5"):
+    return {
+        "summonerID": summoner_id, "region": region, "queue": queue, "rank": rank,
+        "puuid": puuid or f"p-{summoner_id}", "league_points": league_points, "wins": wins, "losses": losses,
+    }
+
+
+def counts(stats):
+    return stats["inserted"], stats["updated"], stats["deleted"]
+
+
+def stored(db):
+    return {
+        (summoner_id, region): (rank, puuid, league_points)
+        for summoner_id, region, rank, puuid, league_points in db.get_connection().execute(
+            "SELECT summonerID, region, rank, puuid, league_points FROM Summoners"
+        )
+    }
+
+
+def test_first_snapshot_inserts_everything(db):
+    stats = db.update_summoners([entry("a"), entry("b"), entry("c", region="kr")])
+    assert counts(stats) == (3, 0, 0)
+    assert (stats["before"], stats["after"]) == (0, 3)
+
+
+def test_unchanged_snapshot_touches_nothing(db):
+    snapshot = [entry("a"), entry("b")]
+    db.update_summoners(snapshot)
+    stats = db.update_summoners(snapshot)
+    assert counts(stats) == (0, 0, 0)
+    assert (stats["before"], stats["after"]) == (2, 2)
+
+
+def test_changed_new_and_dropped_rows_are_counted(db):
+    db.update_summoners([entry("a"), entry("b"), entry("c")])
+    stats = db.update_summoners([entry("a", league_points=250), entry("b"), entry("d")])
+
+    assert counts(stats) == (1, 1, 1)
+    assert (stats["before"], stats["after"]) == (3, 3)
+    assert stored(db)[("a", "euw1")] == ("Challenger", "p-a", 250)
+    assert ("c", "euw1") not in stored(db)
+
+
+def test_rank_change_moves_row_without_delete(db):
+    db.update_summoners([entry("a"), entry("b", rank="Grandmaster")])
+    stats = db.update_summoners([entry("a", rank="Grandmaster"), entry("b", rank="Grandmaster")])
+    assert counts(stats) == (0, 1, 0)
+    assert db.get_summoner_counts() == [("euw1", "Grandmaster", 2, 2)]
+
+
+def test_deletes_are_limited_to_fetched_scopes(db):
+    db.update_summoners([entry("a"), entry("b", rank="Grandmaster"), entry("c", region="kr")])
+
+    # Only euw1 Challenger came back: the other leagues keep their rows
+    stats = db.update_summoners([entry("a")])
+    assert counts(stats) == (0, 0, 0)
+    assert len(stored(db)) == 3
+
+    # An explicitly listed scope that came back empty is cleared
+    stats = db.update_summoners([entry("a")], scopes=[
+        ("euw1", "RANKED_SOLO_5x5", "Challenger"), ("kr", "RANKED_SOLO_5x5", "Challenger"),
+    ])
+    assert counts(stats) == (0, 0, 1)
+    assert set(stored(db)) == {("a", "euw1"), ("b", "euw1")}
+
+
+def test_missing_puuid_keeps_stored_one(db):
+    db.update_summoners([entry("a")])
+    snapshot = entry("a")
+    snapshot["puuid"] = None
+    stats = db.update_summoners([snapshot])
+    assert counts(stats) == (0, 0, 0)
+    assert stored(db)[("a", "euw1")][1] == "p-a"
+
+
+def test_queues_are_separate_ladders(db):
+    db.update_summoners([entry("a"), entry("b"), entry("a", queue="RANKED_FLEX_SR", league_points=40)])
+    stats = db.update_summoners([entry("a", queue="RANKED_FLEX_SR", league_points=60)])
+    assert counts(stats) == (0, 1, 0)
+
+    # Dropping out of the flex ladder leaves the solo queue rows alone
+    stats = db.update_summoners([], scopes=[("euw1", "RANKED_FLEX_SR", "Challenger")])
+    assert counts(stats) == (0, 0, 1)
+    assert db.get_connection().execute(
+        "SELECT summonerID, queue, league_points FROM Summoners ORDER BY summonerID"
+    ).fetchall() == [("a", "RANKED_SOLO_5x5", 100), ("b", "RANKED_SOLO_5x5", 100)]
+
+
+def test_table_without_queue_is_rebuilt_keeping_ids(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = DatabaseManager(path).get_connection()
+    conn.executescript("""
+        DROP TABLE Summoners;
+        CREATE TABLE Summoners (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, summonerID TEXT NOT NULL, rank TEXT NOT NULL,
+            region TEXT NOT NULL, puuid TEXT, created_at TIMESTAMP, updated_at TIMESTAMP,
+            UNIQUE(summonerID, region)
+        );
+        INSERT INTO Summoners (id, summonerID, rank, region, puuid) VALUES (7, 'a', 'Challenger', 'euw1', 'p-a');
+        DROP TABLE SummonerCounts;
+    """)
+    conn.close()
+
+    db = DatabaseManager(path)
+    try:
+        assert db.get_connection().execute("SELECT id, queue FROM Summoners").fetchall() == [(7, "RANKED_SOLO_5x5")]
+        stats = db.update_summoners([entry("a"), entry("a", queue="RANKED_FLEX_SR")])
+        assert counts(stats) == (1, 1, 0)
+        assert db.get_summoner_counts() == [("euw1", "Challenger", 2, 2)]
+    finally:
+        db.close()
@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+import pytest
+
+from data_processing.features import NUMERIC_FEATURES
+from ml.win_model import ModelRegistry, accumulate, is_holdout, new_model, parts_after, train_incremental
+
+
+def write_part(root, first_rowid, last_rowid, seed):
+    """A feature part like build_part's, with blue wins driven by the first numeric feature."""
+    rng = np.random.default_rng(seed)
+    n = last_rowid - first_rowid + 1
+    numeric = rng.random((n, len(NUMERIC_FEATURES)), dtype=np.float32)
+    root.mkdir(exist_ok=True)
+    np.savez_compressed(
+        root / f"part-{first_rowid:012d}-{last_rowid:012d}.npz",
+        match_id=np.array([f"EUW1_{rowid}" for rowid in range(first_rowid, last_rowid + 1)], dtype="S24"),
+        region=np.full(n, b"euw1", dtype="S8"),
+        patch=np.array([(b"14.1", b"14.2")[rowid % 2] for rowid in range(n)], dtype="S8"),
+        game_start=np.arange(n, dtype=np.int64),
+        label=(numeric[:, 0] > 0.5).astype(np.int8),
+        champions=rng.integers(1, 200, size=(n, 10), dtype=np.int16),
+        numeric=numeric,
+    )
+
+
+def test_registry_versions_and_latest_pointer(tmp_path):
+    registry = ModelRegistry(tmp_path / "models")
+    assert registry.latest_version() is None
+    assert registry.load() == (None, None)
+
+    assert registry.save(new_model(), {"trained_through": 10}) == 1
+    assert registry.save(new_model(seed=1), {"trained_through": 20}) == 2
+    # A version directory without metadata is an unfinished save
+    (tmp_path / "models" / "v0003").mkdir()
+
+    assert registry.versions() == [1, 2]
+    assert registry.latest_version() == 2
+    model, metadata = registry.load(1)
+    assert metadata == {"trained_through": 10, "version": 1}
+    assert model.random_state == 0
+    assert registry.metadata()["trained_through"] == 20
+
+
+def test_holdout_split_is_stable():
+    match_ids = np.array([f"EUW1_{i}".encode() for i in range(20_000)])
+    holdout = is_holdout(match_ids)
+    assert np.array_equal(holdout, is_holdout([m.decode() for m in match_ids]))
+    assert 0.08 < holdout.mean() < 0.12
+
+
+def test_accumulate_sums_counts_per_patch():
+    previous = {"14.1": {"matches": 10, "correct": 6, "log_loss_sum": 6.0}}
+    run = {
+        "14.1": {"matches": 10, "correct": 8, "log_loss_sum": 4.0},
+        "14.2": {"matches": 5, "correct": 5, "log_loss_sum": 1.0},
+    }
+    totals = accumulate(previous, run)
+    assert totals["14.1"]["accuracy"] == pytest.approx(0.7)
+    assert totals["14.1"]["log_loss"] == pytest.approx(0.5)
+    assert totals["14.2"]["matches"] == 5
+    assert previous["14.1"]["matches"] == 10
+
+
+def test_training_continues_from_the_latest_version(tmp_path):
+    features, models = tmp_path / "features", tmp_path / "models"
+    write_part(features, 1, 2000, seed=1)
+    write_part(features, 2001, 4000, seed=2)
+
+    first = train_incremental(str(features), str(models), batch_size=512)
+    assert (first["version"], first["parent"], first["trained_through"]) == (1, None, 4000)
+    held_out = sum(values["matches"] for values in first["holdout_this_run"].values())
+    assert first["examples_seen"] + held_out == 4000
+    assert set(first["holdout_this_run"]) == {"14.1", "14.2"}
+    assert first["holdout_cumulative"]["14.1"]["accuracy"] > 0.6
+
+    assert train_incremental(str(features), str(models)) is None
+
+    write_part(features, 4001, 5000, seed=3)
+    assert [rowid for rowid, _ in parts_after(str(features), 4000)] == [5000]
+    second = train_incremental(str(features), str(models), batch_size=512)
+    assert (second["version"], second["parent"], second["trained_through"]) == (2, 1, 5000)
+    assert second["examples_seen"] == first["examples_seen"] + second["examples_this_run"]
+    assert second["holdout_cumulative"]["14.1"]["matches"] == (
+        first["holdout_this_run"]["14.1"]["matches"] + second["holdout_this_run"]["14.1"]["matches"]
+    )
+
+
+def test_feature_layout_change_requires_retraining(tmp_path):
+    features, models = tmp_path / "features", tmp_path / "models"
+    write_part(features, 1, 500, seed=1)
+    train_incremental(str(features), str(models))
+    metadata_path = models / "v0001" / "metadata.json"
+    metadata = json.loads(metadata_path.read_text())
+    metadata["n_features"] -= 1
+    metadata_path.write_text(json.dumps(metadata))
+
+    write_part(features, 501, 1000, seed=2)
+    with pytest.raises(ValueError):
+        train_incremental(str(features), str(models))
+    assert train_incremental(str(features), str(models), from_scratch=True)["parent"] is None
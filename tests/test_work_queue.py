@@ -0,0 +1,111 @@
+import pytest
+
+from database import work_queue
+from database.work_queue import WorkQueue
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(work_queue.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def queue(db, clock):
+    queue = WorkQueue(db, lease_seconds=60, max_attempts=3, retry_delay=30)
+    conn = db.get_connection()
+    queue.enqueue(conn, "metadata", [(f"M{i}", {"match_id": f"M{i}"}) for i in range(5)])
+    conn.commit()
+    return queue
+
+
+def keys(jobs):
+    return [job["key"] for job in jobs]
+
+
+def test_enqueue_ignores_known_keys(db, queue):
+    conn = db.get_connection()
+    assert queue.enqueue(conn, "metadata", [("M0", {}), ("M5", {"match_id": "M5"})]) == 1
+    # The same key under another kind is a different job
+    assert queue.enqueue(conn, "match_ids", [("M0", {})]) == 1
+
+
+def test_workers_claim_disjoint_batches_oldest_first(queue):
+    first = queue.claim("metadata", "w1", 2)
+    second = queue.claim("metadata", "w2", 10)
+    assert keys(first) == ["M0", "M1"]
+    assert keys(second) == ["M2", "M3", "M4"]
+    assert first[0]["payload"] == {"match_id": "M0"}
+    assert first[0]["attempts"] == 1
+    assert queue.claim("metadata", "w3", 10) == []
+
+
+def test_expired_lease_is_claimable_again(db, queue, clock):
+    queue.claim("metadata", "crashed", 5)
+    clock.now += 59
+    assert queue.claim("metadata", "w2", 1) == []
+
+    clock.now += 2
+    reclaimed = queue.claim("metadata", "w3", 1)
+    assert keys(reclaimed) == ["M0"]
+    assert reclaimed[0]["attempts"] == 2
+
+    # The crashed worker no longer holds the job
+    conn = db.get_connection()
+    assert not queue.complete(conn, "metadata", "M0", "crashed")
+    assert queue.complete(conn, "metadata", "M0", "w3")
+    conn.commit()
+
+
+def test_heartbeat_extends_leases(queue, clock):
+    queue.claim("metadata", "w1", 5)
+    clock.now += 50
+    assert queue.heartbeat("w1") == 5
+    clock.now += 50
+    assert queue.claim("metadata", "w2", 5) == []
+
+
+def test_failed_job_is_retried_after_delay_then_left_dead(db, queue, clock):
+    conn = db.get_connection()
+    queue.enqueue(conn, "puuids", [("euw1:s1", {"summonerID": "s1"})])
+    conn.commit()
+
+    for attempt in range(1, 4):
+        job, = queue.claim("puuids", "w1", 1)
+        assert job["attempts"] == attempt
+        queue.fail("puuids", "euw1:s1", "w1", "boom")
+        assert queue.stats()["puuids"]["retrying"] == 1
+        clock.now += 29
+        assert queue.claim("puuids", "w2", 1) == []
+        clock.now += 2
+
+    assert queue.claim("puuids", "w1", 1) == []
+    assert queue.stats()["puuids"]["dead"] == 1
+    assert conn.execute("SELECT last_error FROM WorkQueue WHERE kind = 'puuids'").fetchone()[0] == "boom"
+
+
+def test_release_hands_jobs_back_without_an_attempt(queue):
+    queue.claim("metadata", "w1", 2)
+    assert queue.stats()["metadata"]["leased"] == 2
+    assert queue.release("w1") == 2
+
+    jobs = queue.claim("metadata", "w2", 2)
+    assert keys(jobs) == ["M0", "M1"]
+    assert [job["attempts"] for job in jobs] == [1, 1]
+
+
+def test_completed_job_is_removed(db, queue):
+    queue.claim("metadata", "w1", 1)
+    conn = db.get_connection()
+    assert queue.complete(conn, "metadata", "M0", "w1")
+    conn.commit()
+    assert queue.stats()["metadata"] == {"ready": 4, "leased": 0, "retrying": 0, "dead": 0}